@@ -5,11 +5,13 @@ load_dotenv()
 from langtrace_python_sdk import langtrace
 langtrace.init(os.getenv("LANGTRACE_API_KEY"))"""
 
+import os
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, agent, before_kickoff, crew, task
 from crewai_tools import ScrapeWebsiteTool
-from .tools.divide_topics_into_txt import TopicsDivider
-from .tools.txt_to_questions import TxtToQuestionsTool
+from .tools.divide_topics_into_txt import AnchoredTopicsDivider, TopicsDivider
+from .tools.main_content_extractor import read_main_content
+from .tools.txt_to_questions import TopicQuestions, TxtToQuestionsTool
 
 @CrewBase
 class ThemeExtractorCrew:
@@ -18,6 +20,34 @@ class ThemeExtractorCrew:
 	agents_config = 'config/agents.yaml'
 	tasks_config = 'config/tasks.yaml'
 
+	# segmentation modes: the model returns topic titles and anchors and the text is sliced locally,
+	# or the model rewrites the whole text with numbered topic headers
+	SEGMENTATION_ANCHORS = 'anchors'
+	SEGMENTATION_REWRITE = 'rewrite'
+
+	def __init__(
+		self,
+		use_llm_cleaner: bool = False,
+		segmentation: str = SEGMENTATION_ANCHORS,
+		fan_out_questions: bool = False,
+		output_dir: str = 'output'
+	):
+		"""Initialize the crew
+
+		Args:
+			use_llm_cleaner (bool): scrape and clean the page with the web_scraper and content_cleaner agents,
+				instead of organizing the main content extracted without llm calls (the "content" input)
+			segmentation (str): "anchors" or "rewrite", see SEGMENTATION_ANCHORS and SEGMENTATION_REWRITE
+			fan_out_questions (bool): stop once the topic files are created, the questions of every topic
+				are then generated concurrently with TopicQuizCrew
+			output_dir (str): directory of the files of the run, relative to the working directory,
+				the path of a RunWorkspace so that crews running at the same time do not share files
+		"""
+		self.use_llm_cleaner = use_llm_cleaner
+		self.segmentation = segmentation
+		self.fan_out_questions = fan_out_questions
+		self.output_dir = output_dir
+
 	@agent
 	def web_scraper(self) -> Agent:
 		return Agent(
@@ -44,7 +74,15 @@ class ThemeExtractorCrew:
 	def topics_divider(self) -> Agent:
 		return Agent(
 			config=self.agents_config['topics_divider'],
-			tools=[TopicsDivider()],
+			tools=[TopicsDivider(output_dir=self.output_dir)],
+			verbose=True
+		)
+  
+	@agent
+	def topics_segmenter(self) -> Agent:
+		return Agent(
+			config=self.agents_config['topics_segmenter'],
+			tools=[AnchoredTopicsDivider(output_dir=self.output_dir)],
 			verbose=True
 		)
   
@@ -52,7 +90,7 @@ class ThemeExtractorCrew:
 	def quiz_maker(self) -> Agent:
 		return Agent(
 			config=self.agents_config['quiz_maker'],
-			tools=[TxtToQuestionsTool()],
+			tools=[TxtToQuestionsTool(output_dir=self.output_dir)],
 			verbose=True
 		)
 
@@ -75,6 +113,7 @@ class ThemeExtractorCrew:
 		return Task(
 			config=self.tasks_config['clean_web_content'],
 			agent=self.content_cleaner(),
+			output_file=os.path.join(self.output_dir, 'cleaned_content.txt'),
 			depends_on=[self.analyze_webpage()]
 		)
 
@@ -83,10 +122,33 @@ class ThemeExtractorCrew:
 		return Task(
 			config=self.tasks_config['organize_content'],
 			agent=self.content_organizer(),
-			output_file='output/original_content.txt',
+			output_file=os.path.join(self.output_dir, 'original_content.txt'),
 			depends_on=[self.clean_web_content()]
 		)
+
+	@task
+	def organize_extracted_content(self) -> Task:
+		return Task(
+			config=self.tasks_config['organize_extracted_content'],
+			agent=self.content_organizer(),
+			output_file=os.path.join(self.output_dir, 'original_content.txt')
+		)
   
+	@task
+	def segment_content(self) -> Task:
+		return Task(
+			config=self.tasks_config['segment_content'],
+			agent=self.topics_segmenter(),
+			depends_on=[self.clean_web_content()]
+		)
+
+	@task
+	def segment_extracted_content(self) -> Task:
+		return Task(
+			config=self.tasks_config['segment_extracted_content'],
+			agent=self.topics_segmenter()
+		)
+
 	@task
 	def divide_topics(self) -> Task:
 		return Task(
@@ -102,19 +164,88 @@ class ThemeExtractorCrew:
 			depends_on=[self.divide_topics()]
 		)
 
+	@before_kickoff
+	def save_extracted_content(self, inputs):
+		"""Save the extracted main content, the text the anchored topics divider slices
+
+		The main content is extracted here when only the "url" input is given.
+		"""
+		if self.use_llm_cleaner:
+			return inputs
+		if not inputs.get('content'):
+			if not inputs.get('url'):
+				raise ValueError("the 'content' or 'url' input is required unless use_llm_cleaner=True")
+			try:
+				content = read_main_content(inputs['url'])
+			except Exception as e:
+				raise ValueError(
+					"the 'content' input is required unless use_llm_cleaner=True, "
+					f"and the main content of the 'url' input could not be extracted: {str(e)}"
+				) from e
+			inputs = {**inputs, 'content': content}
+		if self.segmentation == self.SEGMENTATION_ANCHORS:
+			os.makedirs(self.output_dir, exist_ok=True)
+			with open(os.path.join(self.output_dir, 'cleaned_content.txt'), 'w', encoding='utf-8') as f:
+				f.write(inputs['content'])
+		return inputs
+
 	@crew
 	def crew(self) -> Crew:
 		"""Creates the ThemeExtractorCrew crew"""
+		anchors = self.segmentation == self.SEGMENTATION_ANCHORS
+		if self.use_llm_cleaner:
+			agents = [self.web_scraper(), self.content_cleaner()]
+			tasks = [self.analyze_webpage(), self.clean_web_content()]
+			tasks.append(self.segment_content() if anchors else self.organize_content())
+		else:
+			# the main content was extracted with heuristics, no llm round trip over the whole page
+			agents = []
+			tasks = [self.segment_extracted_content() if anchors else self.organize_extracted_content()]
+		if anchors:
+			# only topic titles and anchors are generated, the text is sliced locally
+			agents.append(self.topics_segmenter())
+		else:
+			agents += [self.content_organizer(), self.topics_divider()]
+			tasks.append(self.divide_topics())
+		if not self.fan_out_questions:
+			agents.append(self.quiz_maker())
+			tasks.append(self.create_quiz_questions())
 		return Crew(
-			agents=[
-				self.web_scraper(),
-				self.content_cleaner(),
-				self.content_organizer(),
-				self.topics_divider(),
-				self.quiz_maker()
-			],
-			tasks=self.tasks,
+			agents=agents,
+			tasks=tasks,
 			#manager_agent=self.get_manager(),
 			process=Process.sequential,
 			verbose=True
-		)
\ No newline at end of file
+		)
+
+@CrewBase
+class TopicQuizCrew:
+	"""TopicQuizCrew for creating the questions of a single topic, run once per topic file"""
+
+	agents_config = 'config/agents.yaml'
+	tasks_config = 'config/topic_tasks.yaml'
+
+	@agent
+	def quiz_maker(self) -> Agent:
+		return Agent(
+			config=self.agents_config['quiz_maker'],
+			verbose=True
+		)
+
+	@task
+	def create_topic_questions(self) -> Task:
+		return Task(
+			config=self.tasks_config['create_topic_questions'],
+			agent=self.quiz_maker(),
+			output_pydantic=TopicQuestions
+		)
+
+	@crew
+	def crew(self) -> Crew:
+		"""Creates the TopicQuizCrew crew"""
+		return Crew(
+			agents=self.agents,
+			tasks=self.tasks,
+			process=Process.sequential,
+			verbose=True
+		)
@@ -1,28 +1,224 @@
 #!/usr/bin/env python
 import os
+import re
+import glob
+import json
+import asyncio
+import argparse
 import warnings
 from dotenv import load_dotenv
-from quiz_maker.crew import ThemeExtractorCrew
+from quiz_maker.crew import ThemeExtractorCrew, TopicQuizCrew
+from quiz_maker.tools.txt_to_questions import save_topic_questions
+from quiz_maker.tools.main_content_extractor import scrape_main_content
+from quiz_maker.workspace import RunWorkspace
 
 load_dotenv()
 warnings.filterwarnings("ignore")
 
+# set to "true" to always scrape and clean pages with llm agents
+USE_LLM_CLEANER = os.getenv("QUIZ_LLM_CLEANER", "false").lower() == "true"
+
+# "anchors" slices the text at the topic anchors returned by the model, "rewrite" has the model rewrite it with topic headers
+SEGMENTATION = os.getenv("QUIZ_SEGMENTATION", ThemeExtractorCrew.SEGMENTATION_ANCHORS)
+
+# topics whose questions are generated at the same time, 0 keeps the single sequential quiz_maker task
+QUESTION_WORKERS = int(os.getenv("QUIZ_QUESTION_WORKERS", "4"))
+
+# pages processed at the same time by batch runs
+URL_WORKERS = int(os.getenv("QUIZ_URL_WORKERS", "3"))
+
 def ensure_output_dir():
     """Ensure the output directory exists"""
     output_dir = os.path.join(os.path.dirname(__file__), 'outputs')
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+def prepare_crew(url: str, output_dir: str = 'output'):
+    """Extract the main content of a page and build the crew that turns it into a quiz
+
+    The llm cleaner is only used when the heuristic extraction finds too little text.
+
+    Args:
+        url (str): The URL of the page
+        output_dir (str): directory of the files of the run
+
+    Returns:
+        Tuple[Crew, dict]: the crew and its kickoff inputs
+    """
+    content = None if USE_LLM_CLEANER else scrape_main_content(url)
+    settings = {'segmentation': SEGMENTATION, 'fan_out_questions': QUESTION_WORKERS > 0, 'output_dir': output_dir}
+    if content is None:
+        return ThemeExtractorCrew(use_llm_cleaner=True, **settings).crew(), {'url': url}
+    return ThemeExtractorCrew(**settings).crew(), {'url': url, 'content': content}
+
+def topic_number(topic_path: str) -> int:
+    """Number of a topic file, e.g. 3 for output/divided_topics/topic_3.txt"""
+    return int(re.search(r"topic_(\d+)", os.path.basename(topic_path)).group(1))
+
+async def generate_topic_questions(output_dir: str = 'output', max_workers: int = QUESTION_WORKERS) -> dict:
+    """Create the questions of every topic file concurrently, one TopicQuizCrew per topic
+
+    The questions of each topic are saved to questions/questions_topic_N.json as with the
+    sequential quiz_maker task.
+
+    Args:
+        output_dir (str): directory of the files of the run
+        max_workers (int): maximum number of topics processed at the same time
+
+    Returns:
+        dict: the status of every topic file, "done" or the error
+    """
+    topic_paths = sorted(glob.glob(os.path.join(output_dir, 'divided_topics', 'topic_*.txt')), key=topic_number)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    statuses = {}
+
+    async def process(topic_path: str):
+        topic_file = os.path.basename(topic_path)
+        async with semaphore:
+            try:
+                with open(topic_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                result = await TopicQuizCrew().crew().kickoff_async(inputs={'topic_file': topic_file, 'content': content})
+                # the file name of the topic, whatever the model answered
+                save_topic_questions(output_dir, result.pydantic.model_copy(update={'topic_file': topic_file}))
+                statuses[topic_file] = 'done'
+            except Exception as e:
+                statuses[topic_file] = f'error: {str(e)}'
+            print(f"[{len(statuses)}/{len(topic_paths)}] {topic_file}: {statuses[topic_file]}")
+
+    await asyncio.gather(*(process(topic_path) for topic_path in topic_paths))
+    return statuses
+
+def collect_questions(output_dir: str) -> list:
+    """Merge the questions of every topic of a run, in topic order, into its questions.json
+
+    Args:
+        output_dir (str): directory of the files of the run
+
+    Returns:
+        list: the topics with their content and questions
+    """
+    questions_paths = glob.glob(os.path.join(output_dir, 'questions', 'questions_topic_*.json'))
+    topics = []
+    for questions_path in sorted(questions_paths, key=topic_number):
+        with open(questions_path, 'r', encoding='utf-8') as f:
+            topics.append(json.load(f))
+    with open(os.path.join(output_dir, 'questions.json'), 'w', encoding='utf-8') as f:
+        json.dump(topics, f, indent=2, ensure_ascii=False)
+    return topics
+
+async def run_url(url: str) -> dict:
+    """Run the crew for one page in its own workspace
+
+    Args:
+        url (str): The URL of the page
+
+    Returns:
+        dict: the "url", "run_id" and "status" ("done" or "failed") of the run, with the "error"
+        of failed runs and the "topics" and their questions
+    """
+    workspace = RunWorkspace().create(url=url)
+    print(f"run {workspace.run_id}: {url}, files in {workspace.path}")
+    result = {'url': url, 'run_id': workspace.run_id, 'status': 'failed', 'error': None, 'topics': []}
+    try:
+        # the page is downloaded and parsed outside the event loop
+        crew, inputs = await asyncio.to_thread(prepare_crew, url, workspace.path)
+        await crew.kickoff_async(inputs=inputs)
+        if QUESTION_WORKERS > 0:
+            statuses = await generate_topic_questions(workspace.path)
+            failed_topics = [topic_file for topic_file, status in statuses.items() if status != 'done']
+            if failed_topics:
+                result['error'] = f"no questions for {', '.join(failed_topics)}"
+        result['topics'] = collect_questions(workspace.path)
+        if not result['topics']:
+            result['error'] = result['error'] or 'no questions created'
+        elif not result['error']:
+            result['status'] = 'done'
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        workspace.finish(result['status'] == 'done', error=result['error'])
+    return result
+
+async def run_urls(urls: list, max_workers: int = URL_WORKERS) -> list:
+    """Run the crew for many pages concurrently
+
+    Args:
+        urls (list): The URLs of the pages
+        max_workers (int): maximum number of pages processed at the same time
+
+    Returns:
+        list: the result of every page, see run_url, in the order of the URLs
+    """
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    completed = 0
+
+    async def process(url: str) -> dict:
+        nonlocal completed
+        async with semaphore:
+            result = await run_url(url)
+        completed += 1
+        print(f"[{completed}/{len(urls)}] {result['status']}: {url}" + (f" ({result['error']})" if result['error'] else ""))
+        return result
+
+    return await asyncio.gather(*(process(url) for url in urls))
+
+def read_urls(sources: list) -> list:
+    """List the URLs of a batch
+
+    Args:
+        sources (list): URLs, or text files with one URL per line (lines starting with # are ignored)
+
+    Returns:
+        list: the URLs, without duplicates, in order
+    """
+    urls = []
+    for source in sources:
+        if os.path.isfile(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                urls += [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+        else:
+            urls.append(source)
+    return list(dict.fromkeys(urls))
+
 def run():
     """
     Run the crew.
     """
     ensure_output_dir()
     url = "YOUR_URL_HERE"
-    inputs = {
-        'url': url,
-    }
-    ThemeExtractorCrew().crew().kickoff(inputs=inputs)
+    # every run gets its own workspace, so that several crews can run on the same host
+    RunWorkspace.prune()
+    asyncio.run(run_url(url))
+
+def run_batch():
+    """
+    Run the crew for a list of URLs and merge their questions in a single file.
+    """
+    parser = argparse.ArgumentParser(description="Create the quizzes of many web pages in one process.")
+    parser.add_argument("sources", nargs="+", help="URLs, or text files with one URL per line")
+    parser.add_argument("--workers", type=int, default=URL_WORKERS, help=f"pages processed at the same time (default: {URL_WORKERS})")
+    parser.add_argument("--output", help="consolidated questions file (default: questions.json in the workspace of the batch)")
+    args = parser.parse_args()
+
+    ensure_output_dir()
+    RunWorkspace.prune()
+    urls = read_urls(args.sources)
+    # the batch has a workspace too, for its status and its consolidated questions
+    batch = RunWorkspace().create(urls=urls)
+    print(f"batch {batch.run_id}: {len(urls)} pages, {args.workers} at a time")
+    results = asyncio.run(run_urls(urls, args.workers))
+
+    output_path = args.output or os.path.join(batch.path, 'questions.json')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    failed = sum(1 for result in results if result['status'] != 'done')
+    batch.finish(
+        failed == 0,
+        pages=[{key: result[key] for key in ('url', 'run_id', 'status', 'error')} for result in results]
+    )
+    print(f"{len(results) - failed} pages done, {failed} failed, questions saved in {output_path}")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
@@ -1,17 +1,24 @@
 import os
 import re
+import glob
+import bisect
+import unicodedata
+from typing import List, Type
 from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
 
 class TopicsDivider(BaseTool):
     name: str = "Topics Divider"
     description: str = (
         "A tool for dividing topics into individual text files."
     )
+    # directory of the files of the run, the workspace of the run when several crews run at the same time
+    output_dir: str = "output"
 
     def _run(self):
         try:
-            input_file = "output/original_content.txt"
-            output_dir = "output/divided_topics"
+            input_file = os.path.join(self.output_dir, "original_content.txt")
+            output_dir = os.path.join(self.output_dir, "divided_topics")
 
             os.makedirs(output_dir, exist_ok=True)
 
@@ -51,4 +58,93 @@ class TopicsDivider(BaseTool):
         """Helper function to save a topic to a separate text file."""
         topic_filename = os.path.join(output_dir, f"topic_{topic_number[1:]}.txt")  # remove # from filename
         with open(topic_filename, "w", encoding="utf-8") as f:
-            f.write(content)
\ No newline at end of file
+            f.write(content)
+
+class TopicAnchor(BaseModel):
+    title: str = Field(..., description="The title of the topic")
+    anchor: str = Field(..., description="The first words of the topic, copied exactly from the text")
+
+class AnchoredTopics(BaseModel):
+    topics: List[TopicAnchor] = Field(..., description="The topics, in the order they appear in the text")
+
+class AnchoredTopicsDivider(TopicsDivider):
+    name: str = "Anchored Topics Divider"
+    description: str = (
+        "A tool for dividing the cleaned content into individual topic files without rewriting it. "
+        "Input must be the list of topics in the order they appear in the text, each with a short title "
+        "and an anchor: the first 8 to 12 words of the topic, copied exactly from the text, e.g.\n"
+        "{'topics': [{'title': 'Photosynthesis', 'anchor': 'Photosynthesis is the process used by plants to'}]}"
+    )
+    args_schema: Type[BaseModel] = AnchoredTopics
+
+    def _run(self, topics: List[dict] = None):
+        try:
+            input_file = os.path.join(self.output_dir, "cleaned_content.txt")
+            output_dir = os.path.join(self.output_dir, "divided_topics")
+            organized_file = os.path.join(self.output_dir, "original_content.txt")
+
+            input_data = AnchoredTopics(topics=topics or [])
+            with open(input_file, "r", encoding="utf-8") as f:
+                content = f.read()
+
+            # locate every anchor after the previous one, the text of topics whose anchor is not found stays in a neighbouring topic
+            folded, offsets = self._fold(content)
+            starts = []
+            missing = []
+            position = 0
+            for topic in input_data.topics:
+                start = self._find_anchor(folded, offsets, topic.anchor, position)
+                if start is None:
+                    missing.append(topic.title)
+                    continue
+                starts.append((start, topic.title))
+                position = start + 1
+
+            if not starts:
+                return "No topic anchors found in the text, copy the first words of each topic exactly."
+
+            # the text before the first anchor belongs to the first topic
+            starts[0] = (0, starts[0][1])
+            os.makedirs(output_dir, exist_ok=True)
+            # topic files of a previous page are not part of this one
+            for stale_file in glob.glob(os.path.join(output_dir, "topic_*.txt")):
+                os.remove(stale_file)
+            organized = []
+            for number, (start, title) in enumerate(starts, start=1):
+                end = starts[number][0] if number < len(starts) else len(content)
+                text = content[start:end].strip()
+                self._save_topic_file(output_dir, f"#{number}", f"{title}\n{text}")
+                organized.append(f"#{number} {title}\n{text}")
+
+            # the same numbered document the content organizer writes in rewrite mode
+            with open(organized_file, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(organized))
+
+            result = f"{len(starts)} topics successfully divided and saved in '{output_dir}' directory."
+            if missing:
+                result += f" Anchors not found, their text stays in the neighbouring topic: {', '.join(missing)}."
+            return result
+
+        except Exception as e:
+            return f"Error processing topics: {str(e)}"
+
+    @staticmethod
+    def _fold(text: str):
+        """Lowercase a text without accents, with the offset in the original text of every character"""
+        folded = []
+        offsets = []
+        for index, char in enumerate(text):
+            for folded_char in unicodedata.normalize("NFKD", char.lower()):
+                if not unicodedata.combining(folded_char):
+                    folded.append(folded_char)
+                    offsets.append(index)
+        return "".join(folded), offsets
+
+    def _find_anchor(self, folded: str, offsets: List[int], anchor: str, position: int):
+        """Find an anchor in the folded text from a position, ignoring case, accents, whitespace and punctuation differences"""
+        words = re.findall(r"\w+", self._fold(anchor)[0])
+        if not words:
+            return None
+        start = bisect.bisect_left(offsets, position)
+        match = re.compile(r"\W+".join(re.escape(word) for word in words)).search(folded, start)
+        return offsets[match.start()] if match else None
@@ -0,0 +1,166 @@
+import re
+import logging
+from typing import Any, List, Optional
+import requests
+from bs4 import BeautifulSoup, NavigableString, Tag
+from crewai_tools import ScrapeWebsiteTool
+
+# elements that never hold the main text of a page
+NOISE_TAGS = [
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas", "form", "button",
+    "input", "select", "textarea", "nav", "header", "footer", "aside", "menu", "dialog"
+]
+
+# elements whose text is read as one block
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "td", "th", "dd", "dt", "blockquote",
+    "pre", "h1", "h2", "h3", "h4", "h5", "h6", "figcaption", "caption", "address"
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+# blocks with more words than this are content, if they are not mostly links
+MIN_BLOCK_WORDS = 12
+
+# share of the characters of a block inside links above which it is navigation
+MAX_LINK_DENSITY = 0.33
+
+# below this many words of main text, the page is left to the llm cleaner
+MIN_CONTENT_WORDS = 80
+
+class _Block:
+    """A block of text with its link density and classification"""
+
+    def __init__(self, text: str, link_chars: int, heading: bool):
+        self.text = text
+        self.words = len(text.split())
+        self.link_density = link_chars / len(text) if text else 1.0
+        self.heading = heading
+        if self.link_density > MAX_LINK_DENSITY:
+            self.kind = "boilerplate"
+        elif self.words >= MIN_BLOCK_WORDS:
+            self.kind = "content"
+        else:
+            self.kind = "short"
+
+def _collect_blocks(node: Tag, blocks: List[_Block]) -> None:
+    """Split the text of a node into blocks, in document order
+
+    Text directly inside a block element forms a block, nested block elements form their own.
+    """
+    parts = []
+    link_chars = 0
+
+    def flush():
+        nonlocal parts, link_chars
+        text = re.sub(r"\s+", " ", "".join(parts)).strip()
+        if text:
+            blocks.append(_Block(text, link_chars, node.name in HEADING_TAGS))
+        parts, link_chars = [], 0
+
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            parts.append(str(child))
+        elif isinstance(child, Tag):
+            if child.name in BLOCK_TAGS:
+                flush()
+                _collect_blocks(child, blocks)
+            else:
+                parts.append(" " if child.name == "br" else child.get_text(" "))
+                links = [child] if child.name == "a" else child.find_all("a")
+                link_chars += sum(len(link.get_text(" ").strip()) for link in links)
+    flush()
+
+def _nearest_kind(blocks: List[_Block], start: int, step: int) -> Optional[str]:
+    """Classification of the nearest block that is not short, looking forward or backward"""
+    index = start + step
+    while 0 <= index < len(blocks):
+        if blocks[index].kind != "short":
+            return blocks[index].kind
+        index += step
+    return None
+
+def extract_main_content(html: str) -> str:
+    """Extract the main text of a web page with content and link density heuristics
+
+    Noise elements are removed, the remaining text is split into blocks and every block is
+    classified: blocks that are mostly links are boilerplate, long blocks are content. Short
+    blocks (headings, captions, list items) are kept when they sit between content blocks,
+    headings when the next block is content.
+
+    Args:
+        html (str): The HTML of the page
+
+    Returns:
+        str: the main text, one block per paragraph
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup.find_all(NOISE_TAGS):
+        element.decompose()
+    body = soup.body or soup
+
+    blocks: List[_Block] = []
+    _collect_blocks(body, blocks)
+
+    kept = []
+    for index, block in enumerate(blocks):
+        if block.kind == "content":
+            kept.append(block.text)
+        elif block.kind == "short":
+            previous_kind = _nearest_kind(blocks, index, -1)
+            next_kind = _nearest_kind(blocks, index, 1)
+            if next_kind == "content" and (block.heading or previous_kind == "content"):
+                kept.append(block.text)
+    return "\n\n".join(kept)
+
+class MainContentScraperTool(ScrapeWebsiteTool):
+    name: str = "Read website main content"
+    description: str = (
+        "A tool that reads the main text of a web page, without navigation, buttons and other boilerplate."
+    )
+
+    def _run(self, **kwargs: Any) -> Any:
+        website_url = kwargs.get("website_url", self.website_url)
+        page = requests.get(
+            website_url,
+            timeout=15,
+            headers=self.headers,
+            cookies=self.cookies if self.cookies else {},
+        )
+        page.raise_for_status()
+        page.encoding = page.apparent_encoding
+        return extract_main_content(page.text)
+
+def read_main_content(url: str) -> str:
+    """Read the main text of a web page without any llm call
+
+    Args:
+        url (str): The URL of the page
+
+    Returns:
+        str: the main text
+
+    Raises:
+        ValueError: when too little text is found, so that the llm cleaner can be used instead
+        requests.RequestException: when the page cannot be downloaded
+    """
+    content = MainContentScraperTool().run(website_url=url)
+    words = len(content.split())
+    if words < MIN_CONTENT_WORDS:
+        raise ValueError(f"only {words} words of main content found in {url}, at least {MIN_CONTENT_WORDS} are needed")
+    return content
+
+def scrape_main_content(url: str) -> Optional[str]:
+    """Read the main text of a web page without any llm call, see read_main_content
+
+    Args:
+        url (str): The URL of the page
+
+    Returns:
+        Optional[str]: the main text, None when the page cannot be read or too little text is found,
+        so that the llm cleaner can be used instead
+    """
+    try:
+        return read_main_content(url)
+    except Exception as e:
+        logging.warning(f"main content of {url} not extracted: {str(e)}")
+        return None
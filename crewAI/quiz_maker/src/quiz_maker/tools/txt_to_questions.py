@@ -2,7 +2,7 @@ import os
 from crewai.tools import BaseTool
 import json
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 class QuestionOptions(BaseModel):
     A: str = Field(..., description="First option")
@@ -19,6 +19,41 @@ class TopicQuestions(BaseModel):
     topic_file: str = Field(..., description="The filename of the topic (e.g., 'topic_1.txt')")
     questions: List[Question] = Field(..., description="List of questions for this topic")
 
+def save_topic_questions(run_dir: str, topic_questions: TopicQuestions) -> str:
+    """Save the questions of a topic with its content to questions/questions_topic_N.json
+
+    Args:
+        run_dir (str): directory of the files of the run, containing divided_topics/
+        topic_questions (TopicQuestions): the topic file name and its questions
+
+    Returns:
+        str: the topic number
+    """
+    # read the content of the topic file
+    input_path = os.path.join(run_dir, "divided_topics", topic_questions.topic_file)
+    with open(input_path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    # create output directory for questions if it doesn't exist
+    output_dir = os.path.join(run_dir, "questions")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # get topic number from filename
+    topic_num = topic_questions.topic_file.split("_")[1].split(".")[0]
+    
+    # questions data structure
+    data = {
+        "topic": topic_num,
+        "content": content,
+        "questions": [q.model_dump() for q in topic_questions.questions] # creates a json for each question
+    }
+    
+    # save questions to a json
+    output_file = os.path.join(output_dir, f"questions_topic_{topic_num}.json")
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return topic_num
+
 class TxtToQuestionsTool(BaseTool):
     name: str = "Text to Questions Converter"
     description: str = (
@@ -41,6 +76,8 @@ class TxtToQuestionsTool(BaseTool):
         "}\n"
         "IMPORTANT: Use the exact filename format 'topic_X.txt' where X is the topic number."
     )
+    # directory of the files of the run, the output directory of the project by default
+    output_dir: Optional[str] = None
 
     def _run(self, topic_file: str = None, questions: List[dict] = None):
         try:
@@ -52,33 +89,10 @@ class TxtToQuestionsTool(BaseTool):
             
             current_dir = os.path.dirname(os.path.abspath(__file__))
             project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+            run_dir = self.output_dir or os.path.join(project_root, "output")
             
-            # read the content of the topic file
-            input_path = os.path.join(project_root, "output", "divided_topics", input_data.topic_file)
-            with open(input_path, "r", encoding="utf-8") as f:
-                content = f.read()
-
-            # create output directory for questions if it doesn't exist
-            output_dir = os.path.join(project_root, "output", "questions")
-            os.makedirs(output_dir, exist_ok=True)
-
-            # get topic number from filename
-            topic_num = input_data.topic_file.split("_")[1].split(".")[0]
-            
-            # save questions to a json
-            output_file = os.path.join(output_dir, f"questions_topic_{topic_num}.json")
-            
-            # questions data structure
-            data = {
-                "topic": topic_num,
-                "content": content,
-                "questions": [q.model_dump() for q in input_data.questions] # creates a json for each question
-            }
-            
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-
+            topic_num = save_topic_questions(run_dir, input_data)
             return f"Successfully saved questions for topic {topic_num}"
 
         except Exception as e:
-            return f"Error: {str(e)}" 
\ No newline at end of file
+            return f"Error: {str(e)}"
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from typing import List, Optional
+
+# directory of the run workspaces, relative to the project root the crew is run from
+RUNS_DIR = os.path.join("output", "runs")
+
+# workspaces older than this many days are deleted when a new run starts, 0 to keep them
+RUN_RETENTION_DAYS = float(os.getenv("QUIZ_RUN_RETENTION_DAYS", "7"))
+
+# only this many of the most recent finished workspaces are kept, 0 for no limit
+MAX_RUNS = int(os.getenv("QUIZ_MAX_RUNS", "50"))
+
+# "none" keeps every file of a run, "intermediate" deletes the cleaned text and the topic files of successful runs
+CLEANUP_POLICY = os.getenv("QUIZ_RUN_CLEANUP", "none")
+
+# files of a workspace
+RUN_INFO_FILE = "run.json"
+RUNNING_MARKER = ".running"
+
+class RunWorkspace:
+    """Directory holding every file of one crew run, so that crews running at the same time never share paths
+
+    A workspace contains the same files as the legacy output directory: cleaned_content.txt,
+    original_content.txt, divided_topics/, questions/ and questions.json, plus run.json with the
+    status of the run.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, runs_dir: str = RUNS_DIR):
+        """Initialize the workspace
+
+        Args:
+            run_id (str, optional): The id of the run, a timestamped random one by default
+            runs_dir (str): The directory of the run workspaces
+        """
+        self.run_id = run_id or f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.runs_dir = runs_dir
+        self.path = os.path.join(runs_dir, self.run_id)
+
+    @property
+    def topics_dir(self) -> str:
+        return os.path.join(self.path, "divided_topics")
+
+    @property
+    def questions_dir(self) -> str:
+        return os.path.join(self.path, "questions")
+
+    def create(self, **info) -> "RunWorkspace":
+        """Create the workspace directory, marked as running
+
+        Args:
+            **info: details of the run saved in run.json, e.g. the url
+
+        Returns:
+            RunWorkspace: the workspace itself
+        """
+        os.makedirs(self.path, exist_ok=True)
+        open(os.path.join(self.path, RUNNING_MARKER), "w").close()
+        self._write_info({"run_id": self.run_id, "status": "running", "started_at": time.time(), **info})
+        return self
+
+    def finish(self, succeeded: bool, cleanup_policy: str = CLEANUP_POLICY, **info) -> None:
+        """Record the end of the run and apply the cleanup policy
+
+        Args:
+            succeeded (bool): whether the run produced its questions
+            cleanup_policy (str): "none" or "intermediate", files of failed runs are always kept
+            **info: details of the run added to run.json
+        """
+        if succeeded and cleanup_policy == "intermediate":
+            shutil.rmtree(self.topics_dir, ignore_errors=True)
+            cleaned_content_path = os.path.join(self.path, "cleaned_content.txt")
+            if os.path.exists(cleaned_content_path):
+                os.remove(cleaned_content_path)
+        self._write_info({**self.info(), "status": "done" if succeeded else "failed", "finished_at": time.time(), **info})
+        marker_path = os.path.join(self.path, RUNNING_MARKER)
+        if os.path.exists(marker_path):
+            os.remove(marker_path)
+
+    def info(self) -> dict:
+        """The content of run.json, empty if the run was not created"""
+        try:
+            with open(os.path.join(self.path, RUN_INFO_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_info(self, info: dict) -> None:
+        with open(os.path.join(self.path, RUN_INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2, ensure_ascii=False)
+
+    @staticmethod
+    def prune(runs_dir: str = RUNS_DIR, retention_days: float = RUN_RETENTION_DAYS, max_runs: int = MAX_RUNS) -> List[str]:
+        """Delete the workspaces that the retention policy no longer keeps
+
+        Workspaces older than the retention period are deleted, then the oldest finished ones
+        beyond max_runs. Running workspaces are only deleted once older than the retention period,
+        when their run has certainly crashed.
+
+        Args:
+            runs_dir (str): The directory of the run workspaces
+            retention_days (float): maximum age of a workspace in days, 0 for no limit
+            max_runs (int): maximum number of finished workspaces, 0 for no limit
+
+        Returns:
+            List[str]: the run ids of the deleted workspaces
+        """
+        if not os.path.isdir(runs_dir):
+            return []
+        now = time.time()
+        workspaces = []
+        for run_id in os.listdir(runs_dir):
+            path = os.path.join(runs_dir, run_id)
+            if os.path.isdir(path):
+                workspaces.append((os.path.getmtime(path), run_id, os.path.exists(os.path.join(path, RUNNING_MARKER))))
+
+        removed = []
+        finished = []
+        for modified_at, run_id, running in sorted(workspaces, reverse=True):
+            if retention_days and now - modified_at > retention_days * 86400:
+                removed.append(run_id)
+            elif not running:
+                finished.append(run_id)
+        if max_runs:
+            removed += finished[max_runs:]
+        for run_id in removed:
+            shutil.rmtree(os.path.join(runs_dir, run_id), ignore_errors=True)
+        return removed
@@ -1,32 +1,434 @@
 import logging
 import traceback
 import os
-from typing import Tuple, Optional
-from agents import Agent, Runner
-from models import Quiz
-from utils import save_text_to_file
+import time
+import asyncio
+from typing import Callable, Dict, List, Tuple, Optional
+from models import Question, Quiz, SummarizedQuiz
+from cache import AgentResultCache
+from artifact_store import ArtifactStore, KIND_SUMMARY, KIND_QUIZ
+from metrics import MetricsRecorder, current_document
+from scheduler import RateLimitScheduler, get_scheduler
+from stream_parser import QuestionStreamParser
+from question_bank import QuestionBank
+from utils import save_text_to_file, estimate_tokens, split_text_into_chunks
+
+SUMMARIZER_INSTRUCTIONS = """
+                you are an expert at creating detailed summaries of text.
+                create a comprehensive summary that capture all important information.
+                all summaries must be in {language}.
+                maintain the original meaning while making the content more concise.
+                """
+
+CHUNK_SUMMARIZER_INSTRUCTIONS = """
+                you are an expert at creating detailed summaries of text.
+                the provided text is one part of a longer document.
+                create a comprehensive summary of this part that capture all important information.
+                all summaries must be in {language}.
+                do not add introductions or conclusions about the rest of the document.
+                """
+
+REDUCE_SUMMARIES_INSTRUCTIONS = """
+                you are an expert at creating detailed summaries of text.
+                the provided text is a sequence of summaries of consecutive parts of one document.
+                merge them into a single comprehensive summary that capture all important information.
+                all summaries must be in {language}.
+                remove repetitions while keeping every distinct concept.
+                """
+
+# maximum number of times partial summaries are chunked and summarized again
+MAX_REDUCE_DEPTH = 2
+
+QUIZ_GENERATOR_INSTRUCTIONS = """
+                you are an expert at creating educational quizzes.
+                create exactly {question_count} multiple choice questions based on the provided text.
+                
+                for each question:
+                1. identify a specific theme from the text
+                2. create a clear question about that theme
+                3. provide exactly 4 answers with these scores:
+                   - one correct answer (5 points)
+                   - one wrong answer (0 points)
+                   - one wrong answer (0 points)
+                   - one wrong and potentially harmful answer (-5 points)
+                
+                assign these values also according to your knowledge on the argument.
+                all questions and answers must be in {language}.
+                do not make silly questions.
+                make sure each question has exactly 4 answers.
+                """
+
+DIRECT_QUIZ_INSTRUCTIONS = """
+                you are an expert at summarizing text and creating educational quizzes.
+                first, create a comprehensive summary of the provided text that capture all important information.
+                then create exactly {question_count} multiple choice questions based on the provided text.
+                
+                for each question:
+                1. identify a specific theme from the text
+                2. create a clear question about that theme
+                3. provide exactly 4 answers with these scores:
+                   - one correct answer (5 points)
+                   - one wrong answer (0 points)
+                   - one wrong answer (0 points)
+                   - one wrong and potentially harmful answer (-5 points)
+                
+                assign these values also according to your knowledge on the argument.
+                the summary, the questions and the answers must be in {language}.
+                do not make silly questions.
+                make sure each question has exactly 4 answers.
+                """
+
+# questions of every quiz, banked questions on covered themes count towards it
+QUESTION_COUNT = 10
+
+COVERED_THEMES_INSTRUCTIONS = """
+                these themes are already covered by existing questions, do not create questions about them:
+{themes}
+                """
+
+# pipeline modes: summary then quiz, one call for both, or direct for short texts only
+PIPELINE_TWO_STAGE = "two_stage"
+PIPELINE_DIRECT = "direct"
+PIPELINE_AUTO = "auto"
+PIPELINES = [PIPELINE_AUTO, PIPELINE_TWO_STAGE, PIPELINE_DIRECT]
+
+# expected output tokens of an agent run, reserved from the token quota before the request
+ESTIMATED_OUTPUT_TOKENS = 1500
 
 class QuizGenerator:
     """Class for generating quizzes using AI agents"""
     
-    def __init__(self, model: str, summary_dir: str):
+    def __init__(
+        self,
+        model: str,
+        summary_dir: Optional[str] = None,
+        cache: Optional[AgentResultCache] = None,
+        chunk_tokens: int = 12000,
+        chunk_concurrency: int = 4,
+        metrics: Optional[MetricsRecorder] = None,
+        max_validation_retries: int = 1,
+        pipeline: str = PIPELINE_AUTO,
+        direct_max_tokens: int = 6000,
+        scheduler: Optional[RateLimitScheduler] = None,
+        store: Optional[ArtifactStore] = None,
+        run_id: Optional[str] = None,
+        question_bank: Optional[QuestionBank] = None
+    ):
         """Initialize the quiz generator
         
         Args:
             model (str): The OpenAI model to use
-            summary_dir (str): Directory to save summaries
+            summary_dir (str, optional): Directory to save summaries as text files, when no store is given
+            cache (AgentResultCache, optional): cache for summaries and quizzes of already processed inputs
+            chunk_tokens (int): texts longer than this many tokens are summarized chunk by chunk
+            chunk_concurrency (int): maximum number of chunks of one document summarized at the same time
+            metrics (MetricsRecorder, optional): recorder of the latency, tokens and errors of every agent run
+            max_validation_retries (int): number of times a structured output that fails validation is requested again
+            pipeline (str): "two_stage" summarizes then generates the quiz from the summary, "direct" produces
+                the summary and the quiz from the source in one call, "auto" uses "direct" for short texts
+            direct_max_tokens (int): texts up to this many tokens use the direct pipeline in "auto" mode
+            scheduler (RateLimitScheduler, optional): paces, limits and retries the model requests,
+                by default the scheduler shared by every generator using the same model
+            store (ArtifactStore, optional): store receiving the summary and quiz of every document
+            run_id (str, optional): the run recorded with the stored artifacts, the metrics batch id by default
+            question_bank (QuestionBank, optional): bank receiving every generated question, its questions on
+                themes covered by a document are reused and only the missing questions are generated
         """
         self.model = model
         self.summary_dir = summary_dir
-        os.makedirs(self.summary_dir, exist_ok=True)
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.chunk_concurrency = chunk_concurrency
+        self.metrics = metrics
+        self.max_validation_retries = max_validation_retries
+        self.pipeline = pipeline
+        self.direct_max_tokens = direct_max_tokens
+        self.scheduler = scheduler
+        self.store = store
+        self.run_id = run_id or (metrics.batch_id if metrics else None)
+        self.question_bank = question_bank
+        if self.summary_dir:
+            os.makedirs(self.summary_dir, exist_ok=True)
+    
+    async def _run_agent(
+        self,
+        stage: str,
+        name: str,
+        instructions: str,
+        text: str,
+        language: str,
+        output_type=None,
+        on_question: Optional[Callable[[int, Question], None]] = None
+    ):
+        """Run an agent on a text, reusing the cached output of identical runs
+        
+        Args:
+            stage (str): The pipeline stage, used as part of the cache key
+            name (str): The name of the agent
+            instructions (str): The agent instructions
+            text (str): The input text
+            language (str): The output language
+            output_type (type, optional): The pydantic model of a structured output
+            on_question (Callable, optional): streams the run and is called with (index, question) as soon
+                as each question of a quiz output_type is complete. A retried run calls it again from index 0
+
+        Returns:
+            the agent output, as a string or as an instance of output_type
+        """
+        # the agents SDK is imported on the first run, it dominates the start time of the app
+        from agents import Agent, Runner, ModelBehaviorError
+        
+        key = AgentResultCache.make_key(stage, text, self.model, language, instructions)
+        started_at = time.time()
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            if self.metrics:
+                self.metrics.record(stage, self.model, started_at, cached=True)
+            output = output_type.model_validate_json(cached) if output_type else cached
+            if on_question:
+                for index, question in enumerate(output.questions):
+                    on_question(index, question)
+            return output
+        
+        agent = Agent(
+            name=name,
+            instructions=instructions,
+            output_type=output_type,
+            model=self.model
+        )
+        
+        scheduler = self.scheduler or get_scheduler(self.model)
+        estimated_tokens = estimate_tokens(instructions) + estimate_tokens(text) + ESTIMATED_OUTPUT_TOKENS
+        usage = {"input_tokens": 0, "output_tokens": 0, "requests": 0}
+        stats = {}
+        attempt = 0
+        validation_failures = 0
+
+        async def run_streamed():
+            # the stream is consumed inside the scheduler call, so that its errors are retried too
+            result = Runner.run_streamed(agent, text)
+            parser = QuestionStreamParser()
+            async for event in result.stream_events():
+                if event.type != "raw_response_event" or event.data.type != "response.output_text.delta":
+                    continue
+                stats.setdefault("time_to_first_token_s", time.time() - started_at)
+                for question in parser.feed(event.data.delta):
+                    stats.setdefault("time_to_first_question_s", time.time() - started_at)
+                    on_question(len(parser.questions) - 1, question)
+            return result
+
+        try:
+            while True:
+                # tokens used by this attempt, the reservation is released if the request failed
+                actual_tokens = 0
+                try:
+                    call = run_streamed if on_question else lambda: Runner.run(agent, text)
+                    result = await scheduler.run(call, estimated_tokens, stats)
+                    self._add_usage(usage, result)
+                    actual_tokens = result.context_wrapper.usage.total_tokens
+                    output = result.final_output_as(output_type) if output_type else result.final_output
+                    break
+                except ModelBehaviorError as e:
+                    # the structured output did not match output_type, ask again
+                    if e.run_data:
+                        actual_tokens = e.run_data.context_wrapper.usage.total_tokens
+                    validation_failures += 1
+                    if attempt >= self.max_validation_retries:
+                        raise
+                    attempt += 1
+                finally:
+                    scheduler.settle_tokens(estimated_tokens, actual_tokens)
+        except Exception as e:
+            if self.metrics:
+                self.metrics.record(
+                    stage, self.model, started_at, retries=attempt + stats.get("retries", 0),
+                    validation_failures=validation_failures, rate_limited=stats.get("rate_limited", 0),
+                    wait_time_s=stats.get("wait_time_s", 0.0), time_to_first_token_s=stats.get("time_to_first_token_s"),
+                    time_to_first_question_s=stats.get("time_to_first_question_s"),
+                    error=f"{type(e).__name__}: {str(e)}", **usage
+                )
+            raise
+        
+        if self.metrics:
+            self.metrics.record(
+                stage, self.model, started_at, retries=attempt + stats.get("retries", 0),
+                validation_failures=validation_failures, rate_limited=stats.get("rate_limited", 0),
+                wait_time_s=stats.get("wait_time_s", 0.0), time_to_first_token_s=stats.get("time_to_first_token_s"),
+                time_to_first_question_s=stats.get("time_to_first_question_s"), **usage
+            )
+        if self.cache:
+            self.cache.set(key, stage, output.model_dump_json() if output_type else output)
+        return output
+    
+    @staticmethod
+    def _add_usage(usage: dict, result) -> None:
+        """Add the token usage of an agent run to a running total
+        
+        Args:
+            usage (dict): The running total of input_tokens, output_tokens and requests
+            result (RunResult): The result of the agent run
+        """
+        run_usage = result.context_wrapper.usage
+        usage["input_tokens"] += run_usage.input_tokens
+        usage["output_tokens"] += run_usage.output_tokens
+        usage["requests"] += run_usage.requests
+    
+    async def summarize_text(self, text: str, language: str, depth: int = 0) -> str:
+        """Summarize a text, splitting it into chunks summarized concurrently when it is too long
+        
+        Args:
+            text (str): The text to summarize
+            language (str): The language of the summary
+            depth (int): The current reduce level, used to stop recursion
+
+        Returns:
+            str: the summary of the text
+        """
+        if estimate_tokens(text) <= self.chunk_tokens:
+            return await self._run_agent(
+                "summary", "text summarizer", SUMMARIZER_INSTRUCTIONS.format(language=language), text, language
+            )
+        
+        # map: summarize every chunk concurrently
+        chunks = split_text_into_chunks(text, self.chunk_tokens)
+        semaphore = asyncio.Semaphore(max(1, self.chunk_concurrency))
+        chunk_instructions = CHUNK_SUMMARIZER_INSTRUCTIONS.format(language=language)
+        
+        async def summarize_chunk(chunk: str) -> str:
+            async with semaphore:
+                return await self._run_agent("chunk_summary", "chunk summarizer", chunk_instructions, chunk, language)
+        
+        chunk_summaries = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        combined = "\n\n".join(chunk_summaries)
+        
+        # reduce: merge the partial summaries, chunking again if they are still too long
+        if estimate_tokens(combined) > self.chunk_tokens and depth < MAX_REDUCE_DEPTH:
+            return await self.summarize_text(combined, language, depth + 1)
+        return await self._run_agent(
+            "reduce_summary", "summary merger", REDUCE_SUMMARIES_INSTRUCTIONS.format(language=language), combined, language
+        )
     
-    async def create_quiz_from_text(self, text: str, filename: str, language: str) -> Tuple[Optional[Quiz], Optional[str]]:
+    def uses_direct_pipeline(self, text: str) -> bool:
+        """Check whether a text is processed with a single direct quiz call
+        
+        Args:
+            text (str): The text to process
+
+        Returns:
+            bool: True for the direct pipeline, False for summary then quiz
+        """
+        if self.pipeline == PIPELINE_DIRECT:
+            # texts that need chunked summaries do not fit in a single call
+            return estimate_tokens(text) <= self.chunk_tokens
+        if self.pipeline == PIPELINE_AUTO:
+            return estimate_tokens(text) <= self.direct_max_tokens
+        return False
+    
+    def banked_questions(self, text: str, language: str) -> List[Question]:
+        """Find the banked questions on themes covered by a text
+        
+        Args:
+            text (str): The text the quiz is generated from
+            language (str): The language of the quiz
+
+        Returns:
+            List[Question]: at most QUESTION_COUNT questions, one per theme
+        """
+        if not self.question_bank:
+            return []
+        banked = self.question_bank.find_covered(text, language, QUESTION_COUNT)
+        if banked:
+            logging.info(f"{len(banked)} questions of {current_document.get()} reused from the question bank")
+        return banked
+    
+    @staticmethod
+    def quiz_instructions(template: str, language: str, banked: List[Question]) -> str:
+        """Format quiz instructions asking only for the questions missing from the bank
+        
+        Args:
+            template (str): QUIZ_GENERATOR_INSTRUCTIONS or DIRECT_QUIZ_INSTRUCTIONS
+            language (str): The language of the quiz
+            banked (List[Question]): The banked questions reused for the quiz
+
+        Returns:
+            str: the instructions of the quiz generator agent
+        """
+        instructions = template.format(language=language, question_count=QUESTION_COUNT - len(banked))
+        if banked:
+            themes = "\n".join(f"                - {question.theme}" for question in banked)
+            instructions += COVERED_THEMES_INSTRUCTIONS.format(themes=themes)
+        return instructions
+    
+    @staticmethod
+    def _send_banked(
+        banked: List[Question],
+        on_question: Optional[Callable[[int, Question], None]]
+    ) -> Optional[Callable[[int, Question], None]]:
+        """Send the banked questions to a streaming callback
+        
+        Returns:
+            Optional[Callable]: the callback for the generated questions, numbered after the banked ones
+        """
+        if not on_question:
+            return None
+        for index, question in enumerate(banked):
+            on_question(index, question)
+        return lambda index, question: on_question(len(banked) + index, question)
+    
+    async def _generate_questions(
+        self,
+        summary: str,
+        language: str,
+        banked: List[Question],
+        on_question: Optional[Callable[[int, Question], None]] = None
+    ) -> List[Question]:
+        """Generate the questions of a quiz from a summary, except those found in the bank
+        
+        Args:
+            summary (str): The summary of the document
+            language (str): The language of the quiz
+            banked (List[Question]): The banked questions reused for this quiz
+            on_question (Callable, optional): streaming callback, see create_quiz_from_text
+
+        Returns:
+            List[Question]: the generated questions
+        """
+        on_generated = self._send_banked(banked, on_question)
+        if len(banked) >= QUESTION_COUNT:
+            return []
+        quiz = await self._run_agent(
+            "quiz", "quiz generator", self.quiz_instructions(QUIZ_GENERATOR_INSTRUCTIONS, language, banked), summary, language,
+            output_type=Quiz, on_question=on_generated
+        )
+        return quiz.questions
+    
+    def bank_questions(self, questions: List[Question], text: str, base_filename: str, language: str) -> None:
+        """Add generated questions to the question bank, if any
+        
+        Args:
+            questions (List[Question]): The generated questions, without the banked ones
+            text (str): The text of the document the quiz was generated from
+            base_filename (str): The base filename of the document
+            language (str): The language of the quiz
+        """
+        if self.question_bank and questions:
+            self.question_bank.add(questions, language, self.model, ArtifactStore.source_hash(text), base_filename)
+    
+    async def create_quiz_from_text(
+        self,
+        text: str,
+        filename: str,
+        language: str,
+        on_question: Optional[Callable[[int, Question], None]] = None
+    ) -> Tuple[Optional[Quiz], Optional[str]]:
         """Process a single text document through the agent pipeline
         
         Args:
             text (str): The text to process
             filename (str): The name of the file to process
             language (str): The language to generate the quiz in
+            on_question (Callable, optional): streams the quiz and is called with (index, question)
+                as soon as each question is generated, the same index can be sent again after a retry
 
         Returns:
             Tuple[Optional[Quiz], Optional[str]]: A tuple containing the quiz and the filename
@@ -34,53 +436,157 @@ class QuizGenerator:
         try:
             # remove .pdf extension from filename
             base_filename = filename.replace('.pdf', '')
+            current_document.set(base_filename)
             
-            # processing with summarizer agent
-            summarizer = Agent(
-                name="text summarizer",
-                instructions=f"""
-                you are an expert at creating detailed summaries of text.
-                create a comprehensive summary that capture all important information.
-                all summaries must be in {language}.
-                maintain the original meaning while making the content more concise.
-                """,
-                model=self.model
-            )
-            summary_result = await Runner.run(summarizer, text)
-            
-            # save summary
-            summary_path = os.path.join(self.summary_dir, f"{base_filename}_summary.txt")
-            save_text_to_file(summary_result.final_output, summary_path)
-            
-            # quiz generation
-            quiz_generator = Agent(
-                name="quiz generator",
-                instructions=f"""
-                you are an expert at creating educational quizzes.
-                create exactly 10 multiple choice questions based on the provided text.
+            if self.uses_direct_pipeline(text):
+                banked = self.banked_questions(text, language)
+                if len(banked) < QUESTION_COUNT:
+                    # summary and quiz from the source text in a single call
+                    result = await self._run_agent(
+                        "direct_quiz", "quiz generator", self.quiz_instructions(DIRECT_QUIZ_INSTRUCTIONS, language, banked),
+                        text, language, output_type=SummarizedQuiz, on_question=self._send_banked(banked, on_question)
+                    )
+                    summary, questions = result.summary, result.questions
+                else:
+                    # every question comes from the bank, only the summary is needed
+                    self._send_banked(banked, on_question)
+                    summary, questions = await self.summarize_text(text, language), []
+            else:
+                # processing with summarizer agent
+                summary = await self.summarize_text(text, language)
                 
-                for each question:
-                1. identify a specific theme from the text
-                2. create a clear question about that theme
-                3. provide exactly 4 answers with these scores:
-                   - one correct answer (5 points)
-                   - one wrong answer (0 points)
-                   - one wrong answer (0 points)
-                   - one wrong and potentially harmful answer (-5 points)
-                
-                assign these values also according to your knowledge on the argument.
-                all questions and answers must be in {language}.
-                do not make silly questions.
-                make sure each question has exactly 4 answers.
-                """,
-                output_type=Quiz,
-                model=self.model
-            )
-            quiz_result = await Runner.run(quiz_generator, summary_result.final_output)
+                # quiz generation
+                banked = self.banked_questions(summary, language)
+                questions = await self._generate_questions(summary, language, banked, on_question)
+            quiz = Quiz(questions=banked + questions)
+            self.bank_questions(questions, text, base_filename, language)
+            
+            # save summary and quiz
+            if self.store:
+                source_hash = ArtifactStore.source_hash(text)
+                stored = {
+                    "source_hash": source_hash,
+                    "filename": base_filename,
+                    "model": self.model,
+                    "language": language,
+                    "run_id": self.run_id
+                }
+                self.store.add(KIND_SUMMARY, summary, **stored)
+                self.store.add(KIND_QUIZ, quiz.model_dump_json(), metadata={"banked_questions": len(banked)}, **stored)
+            elif self.summary_dir:
+                summary_path = os.path.join(self.summary_dir, f"{base_filename}_summary.txt")
+                save_text_to_file(summary, summary_path)
             
-            return quiz_result.final_output_as(Quiz), base_filename  
+            return quiz, base_filename  
             
         except Exception as e:
             logging.error(f"error processing {filename}: {str(e)}")
             logging.error(traceback.format_exc())
-            return None, None 
\ No newline at end of file
+            return None, None 
+    
+    async def create_quizzes_in_languages(
+        self,
+        text: str,
+        filename: str,
+        languages: List[str],
+        pivot_language: Optional[str] = None
+    ) -> Tuple[Dict[str, Optional[Quiz]], Optional[str]]:
+        """Process a single text document into quizzes in several languages
+        
+        The text is summarized once in the pivot language, then the quiz of every language is
+        generated concurrently from that summary. A single language without a different pivot
+        language uses the regular pipeline.
+        
+        Args:
+            text (str): The text to process
+            filename (str): The name of the file to process
+            languages (List[str]): The languages to generate the quizzes in
+            pivot_language (str, optional): The language of the shared summary, the first language by default
+
+        Returns:
+            Tuple[Dict[str, Optional[Quiz]], Optional[str]]: the quiz of each language (None for the failed ones)
+            and the filename
+        """
+        if len(languages) == 1 and pivot_language in (None, languages[0]):
+            quiz, base_filename = await self.create_quiz_from_text(text, filename, languages[0])
+            return {languages[0]: quiz}, base_filename
+        
+        pivot_language = pivot_language or languages[0]
+        try:
+            # remove .pdf extension from filename
+            base_filename = filename.replace('.pdf', '')
+            current_document.set(base_filename)
+            
+            # one summary for every language
+            summary = await self.summarize_text(text, pivot_language)
+            if self.store:
+                self.store.add(
+                    KIND_SUMMARY, summary, ArtifactStore.source_hash(text), base_filename,
+                    model=self.model, language=pivot_language, run_id=self.run_id
+                )
+            elif self.summary_dir:
+                summary_path = os.path.join(self.summary_dir, f"{base_filename}_summary.txt")
+                save_text_to_file(summary, summary_path)
+        
+        except Exception as e:
+            logging.error(f"error summarizing {filename}: {str(e)}")
+            logging.error(traceback.format_exc())
+            return {language: None for language in languages}, None
+        
+        async def generate(language: str) -> Optional[Quiz]:
+            try:
+                banked = self.banked_questions(summary, language)
+                questions = await self._generate_questions(summary, language, banked)
+            except Exception as e:
+                logging.error(f"error generating the {language} quiz of {filename}: {str(e)}")
+                logging.error(traceback.format_exc())
+                return None
+            quiz = Quiz(questions=banked + questions)
+            self.bank_questions(questions, text, base_filename, language)
+            if self.store:
+                self.store.add(
+                    KIND_QUIZ, quiz.model_dump_json(), ArtifactStore.source_hash(text), base_filename, model=self.model,
+                    language=language, run_id=self.run_id, metadata={"pivot_language": pivot_language, "banked_questions": len(banked)}
+                )
+            return quiz
+        
+        quizzes = await asyncio.gather(*(generate(language) for language in languages))
+        return dict(zip(languages, quizzes)), base_filename
+    
+    async def create_quizzes_from_texts(
+        self,
+        documents: List[Tuple[str, str]],
+        language: str,
+        max_concurrency: int = 4,
+        on_complete: Optional[Callable[[int, Tuple[Optional[Quiz], Optional[str]]], None]] = None,
+        on_question: Optional[Callable[[int, int, Question], None]] = None
+    ) -> List[Tuple[Optional[Quiz], Optional[str]]]:
+        """Process many text documents through the agent pipeline concurrently
+        
+        Args:
+            documents (List[Tuple[str, str]]): list of (text, filename) tuples to process
+            language (str): The language to generate the quizzes in
+            max_concurrency (int): maximum number of documents processed at the same time
+            on_complete (Callable, optional): called with (index, result) each time a document finishes
+            on_question (Callable, optional): streams the quizzes and is called with
+                (document index, question index, question) as soon as each question is generated
+
+        Returns:
+            List[Tuple[Optional[Quiz], Optional[str]]]: one (quiz, filename) tuple per document, in input order
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def process(index: int, text: str, filename: str) -> Tuple[Optional[Quiz], Optional[str]]:
+            async with semaphore:
+                result = await self.create_quiz_from_text(
+                    text, filename, language,
+                    on_question=(lambda q_index, question: on_question(index, q_index, question)) if on_question else None
+                )
+            if on_complete:
+                on_complete(index, result)
+            return result
+        
+        # gather keeps results in input order regardless of completion order
+        return await asyncio.gather(
+            *(process(index, text, filename) for index, (text, filename) in enumerate(documents))
+        )
\ No newline at end of file
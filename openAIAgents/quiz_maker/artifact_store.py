@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+# kinds of artifacts stored for each document
+KIND_RAW_TEXT = "raw_text"
+KIND_SUMMARY = "summary"
+KIND_QUIZ = "quiz"
+ARTIFACT_KINDS = [KIND_RAW_TEXT, KIND_SUMMARY, KIND_QUIZ]
+
+# pending artifacts are written in one transaction when there are this many, or when the oldest is this old
+WRITE_BATCH_SIZE = 256
+WRITE_BATCH_MAX_AGE_S = 2.0
+
+# zlib level of the stored blobs, a balance between size and the cost on the event loop thread
+COMPRESSION_LEVEL = 6
+
+class ArtifactInfo(NamedTuple):
+    id: int
+    kind: str
+    source_hash: str
+    filename: str
+    model: Optional[str]
+    language: Optional[str]
+    run_id: Optional[str]
+    created_at: float
+    size: int
+    metadata: Dict
+
+class ArtifactStore:
+    """Class for storing raw texts, summaries, quizzes and run metadata in one SQLite file
+
+    Contents are zlib-compressed blobs, indexed by source hash, filename, model and date.
+    Artifacts are never overwritten: every write adds a row, so concurrent sessions processing
+    files with the same name keep their own results and lookups return the latest one.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = WRITE_BATCH_SIZE, batch_max_age_s: float = WRITE_BATCH_MAX_AGE_S):
+        """Initialize the store
+
+        Args:
+            db_path (str): The path of the SQLite database file
+            batch_size (int): number of pending artifacts that triggers a write
+            batch_max_age_s (float): age of the oldest pending artifact that triggers a write
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch_max_age_s = batch_max_age_s
+        self._pending: List[tuple] = []
+        self._pending_since = 0.0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # durable at checkpoints, commits do not wait for a disk sync
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                model TEXT,
+                language TEXT,
+                run_id TEXT,
+                created_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                metadata TEXT,
+                content BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_artifacts_source_hash ON artifacts (source_hash, kind, created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_filename ON artifacts (filename, kind, created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_model ON artifacts (model, created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_created_at ON artifacts (created_at);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_run_id ON artifacts (run_id);
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                metadata TEXT
+            );
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def source_hash(text: str) -> str:
+        """Hash the text of a source document
+
+        Args:
+            text (str): The extracted text
+
+        Returns:
+            str: the sha256 hex digest of the text
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def add(
+        self,
+        kind: str,
+        content: str,
+        source_hash: str,
+        filename: str,
+        model: Optional[str] = None,
+        language: Optional[str] = None,
+        run_id: Optional[str] = None,
+        metadata: Optional[Dict] = None
+    ) -> None:
+        """Queue an artifact, written with the next batch
+
+        Args:
+            kind (str): "raw_text", "summary" or "quiz"
+            content (str): The text or JSON content
+            source_hash (str): The hash of the source text
+            filename (str): The base filename of the source
+            model (str, optional): The model that produced the artifact
+            language (str, optional): The language of the artifact
+            run_id (str, optional): The run that produced the artifact
+            metadata (Dict, optional): additional values, stored as JSON
+        """
+        encoded = content.encode("utf-8")
+        # compressed outside the lock, adds from many tasks do not wait on each other
+        row = (
+            kind, source_hash, filename, model, language, run_id, time.time(), len(encoded),
+            json.dumps(metadata) if metadata else None, zlib.compress(encoded, COMPRESSION_LEVEL)
+        )
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._pending_since >= self.batch_max_age_s:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO artifacts (kind, source_hash, filename, model, language, run_id, created_at, size, metadata, content)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                self._pending
+            )
+        self._pending = []
+
+    def flush(self) -> None:
+        """Write the pending artifacts in a single transaction"""
+        with self._lock:
+            self._flush_locked()
+
+    def start_run(self, run_id: str, **metadata) -> None:
+        """Record the start of a run
+
+        Args:
+            run_id (str): The id of the run
+            **metadata: values describing the run (model, language, pipeline...)
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, started_at, metadata) VALUES (?, ?, ?)",
+                (run_id, time.time(), json.dumps(metadata))
+            )
+
+    def finish_run(self, run_id: str, **metadata) -> None:
+        """Record the end of a run, writing its pending artifacts
+
+        Args:
+            run_id (str): The id of the run
+            **metadata: values merged into the run metadata (document counts, metrics summary...)
+        """
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute("SELECT metadata FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            merged = {**(json.loads(row[0]) if row and row[0] else {}), **metadata}
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO runs (run_id, started_at, finished_at, metadata) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (run_id) DO UPDATE SET finished_at = excluded.finished_at, metadata = excluded.metadata
+                    """,
+                    (run_id, time.time(), time.time(), json.dumps(merged))
+                )
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """Get the metadata of a run
+
+        Args:
+            run_id (str): The id of the run
+
+        Returns:
+            Optional[Dict]: the run metadata with its "started_at" and "finished_at", None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT started_at, finished_at, metadata FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if not row:
+            return None
+        return {"run_id": run_id, "started_at": row[0], "finished_at": row[1], **(json.loads(row[2]) if row[2] else {})}
+
+    def find(
+        self,
+        kind: Optional[str] = None,
+        source_hash: Optional[str] = None,
+        filename: Optional[str] = None,
+        model: Optional[str] = None,
+        language: Optional[str] = None,
+        run_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100
+    ) -> List[ArtifactInfo]:
+        """Find artifacts, newest first, without loading their content
+
+        Args:
+            kind (str, optional): "raw_text", "summary" or "quiz"
+            source_hash (str, optional): The hash of the source text
+            filename (str, optional): The base filename of the source
+            model (str, optional): The model that produced the artifacts
+            language (str, optional): The language of the artifacts
+            run_id (str, optional): The run that produced the artifacts
+            since (float, optional): minimum creation time, as a unix timestamp
+            until (float, optional): maximum creation time, as a unix timestamp
+            limit (int): maximum number of results
+
+        Returns:
+            List[ArtifactInfo]: the matching artifacts
+        """
+        conditions, params = [], []
+        for column, value in (("kind", kind), ("source_hash", source_hash), ("filename", filename), ("model", model), ("language", language), ("run_id", run_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            # pending artifacts are visible to lookups
+            self._flush_locked()
+            rows = self._conn.execute(
+                f"""
+                SELECT id, kind, source_hash, filename, model, language, run_id, created_at, size, metadata
+                FROM artifacts {where} ORDER BY created_at DESC, id DESC LIMIT ?
+                """,
+                (*params, limit)
+            ).fetchall()
+        return [ArtifactInfo(*row[:9], json.loads(row[9]) if row[9] else {}) for row in rows]
+
+    def get(self, artifact_id: int) -> Optional[str]:
+        """Load the content of an artifact
+
+        Args:
+            artifact_id (int): The id of the artifact
+
+        Returns:
+            Optional[str]: the decompressed content, None if the artifact does not exist
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def latest(self, kind: str, **filters) -> Optional[str]:
+        """Load the content of the newest matching artifact
+
+        Args:
+            kind (str): "raw_text", "summary" or "quiz"
+            **filters: the other find() filters
+
+        Returns:
+            Optional[str]: the content, None if no artifact matches
+        """
+        found = self.find(kind=kind, limit=1, **filters)
+        return self.get(found[0].id) if found else None
+
+    def export(self, directory: str, **filters) -> List[str]:
+        """Write matching artifacts to files, for tools that expect the former directory layout
+
+        Args:
+            directory (str): The output directory
+            **filters: the find() filters
+
+        Returns:
+            List[str]: the paths of the written files, named after the source, kind and artifact id
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for info in self.find(**filters):
+            extension = "json" if info.kind == KIND_QUIZ else "txt"
+            path = os.path.join(directory, f"{info.filename}_{info.kind}_{info.id}.{extension}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.get(info.id))
+            paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="List or export the artifacts of the quiz maker store.")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "artifacts.sqlite"), help="the store file")
+    parser.add_argument("--kind", choices=ARTIFACT_KINDS, help="only artifacts of this kind")
+    parser.add_argument("--filename", help="only artifacts of this source filename")
+    parser.add_argument("--source-hash", help="only artifacts of this source text hash")
+    parser.add_argument("--model", help="only artifacts produced by this model")
+    parser.add_argument("--run-id", help="only artifacts produced by this run")
+    parser.add_argument("--since", type=datetime.date.fromisoformat, help="only artifacts created from this date (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, default=100, help="maximum number of artifacts (default: 100)")
+    parser.add_argument("--export", metavar="DIR", help="write the artifacts to files in this directory instead of listing them")
+    args = parser.parse_args(argv)
+
+    store = ArtifactStore(args.db)
+    filters = {
+        "kind": args.kind,
+        "filename": args.filename,
+        "source_hash": args.source_hash,
+        "model": args.model,
+        "run_id": args.run_id,
+        "since": time.mktime(args.since.timetuple()) if args.since else None,
+        "limit": args.limit
+    }
+    if args.export:
+        for path in store.export(args.export, **filters):
+            print(path)
+    else:
+        for info in store.find(**filters):
+            created_at = datetime.datetime.fromtimestamp(info.created_at).isoformat(timespec="seconds")
+            print(f"{info.id}\t{created_at}\t{info.kind}\t{info.filename}\t{info.model or ''}\t{info.language or ''}\t{info.size}")
+    store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,500 @@
+import os
+import sys
+import json
+import glob
+import asyncio
+import logging
+import argparse
+import datetime
+import traceback
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from excel_converter import QuizExcelConverter
+from ai_agent import QuizGenerator, PIPELINES, PIPELINE_AUTO
+from cache import AgentResultCache
+from metrics import MetricsRecorder
+from scheduler import configure_openai_client
+from dedup import DocumentFingerprint, DuplicateDetector, fingerprint_texts, deduplicate_questions
+from artifact_store import ArtifactStore, KIND_RAW_TEXT, KIND_QUIZ
+from question_bank import QuestionBank
+from models import Quiz
+from url_fetcher import UrlFetcher
+from utils import (
+    setup_logging,
+    extract_text_from_pdf,
+    get_filename_from_url
+)
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MANIFEST_PATH = os.path.join(BASE_DIR, "batch_manifest.jsonl")
+
+class BatchManifest:
+    """Class for recording the status of every document of a batch run in an append-only JSON lines file
+
+    Statuses are recorded per document, model, pipeline and language, so that a run with other
+    settings or more languages only processes what previous runs did not generate.
+    """
+
+    def __init__(self, path: str):
+        """Initialize the manifest, loading the entries of previous runs
+
+        Args:
+            path (str): The path of the manifest file
+        """
+        self.path = path
+        self.entries: Dict[Tuple[str, str, str, str], dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # last line of an interrupted write
+                        continue
+                    self._index(entry)
+
+    def _index(self, entry: dict) -> None:
+        for language in entry["languages"]:
+            self.entries[(entry["id"], entry["model"], entry["pipeline"], language)] = entry
+
+    def entry(self, document_id: str, model: str, pipeline: str, language: str) -> Optional[dict]:
+        """Get the last recorded entry of a document for some generation settings
+
+        Args:
+            document_id (str): The document id
+            model (str): The model of the quizzes
+            pipeline (str): The pipeline of the quizzes
+            language (str): The language of the quizzes
+
+        Returns:
+            Optional[dict]: the entry, None if the document was never processed with these settings
+        """
+        return self.entries.get((document_id, model, pipeline, language))
+
+    def status(self, document_id: str, model: str, pipeline: str, language: str) -> Optional[str]:
+        """Get the last recorded status of a document for some generation settings
+
+        Args:
+            document_id (str): The document id
+            model (str): The model of the quizzes
+            pipeline (str): The pipeline of the quizzes
+            language (str): The language of the quizzes
+
+        Returns:
+            Optional[str]: "done", "failed" or None if the document was never processed with these settings
+        """
+        entry = self.entry(document_id, model, pipeline, language)
+        return entry["status"] if entry else None
+
+    def record(self, document_id: str, status: str, model: str, pipeline: str, languages: List[str], **fields) -> None:
+        """Append the status of a document, flushing it to disk immediately
+
+        Args:
+            document_id (str): The document id
+            status (str): "done" or "failed"
+            model (str): The model of the quizzes
+            pipeline (str): The pipeline of the quizzes
+            languages (List[str]): The languages the status applies to
+            **fields: additional values to store (paths, error message...)
+        """
+        entry = {
+            "id": document_id,
+            "status": status,
+            "model": model,
+            "pipeline": pipeline,
+            "languages": languages,
+            "timestamp": datetime.datetime.now().isoformat(),
+            **fields
+        }
+        self._index(entry)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+def stored_quiz(store: ArtifactStore, entry: Optional[dict], language: str) -> Optional[Quiz]:
+    """Load the quiz a manifest entry points to
+
+    Args:
+        store (ArtifactStore): The store of the quizzes
+        entry (dict, optional): The manifest entry of the document
+        language (str): The language of the quiz
+
+    Returns:
+        Optional[Quiz]: the quiz, None if the document is not done in this language
+    """
+    if not entry or entry["status"] != "done":
+        return None
+    quiz_json = store.latest(KIND_QUIZ, source_hash=entry["source_hash"], run_id=entry["run_id"], language=language)
+    return Quiz.model_validate_json(quiz_json) if quiz_json else None
+
+def collect_documents(pdf_dir: Optional[str], urls_file: Optional[str]) -> List[dict]:
+    """List the documents of a batch
+
+    Args:
+        pdf_dir (str, optional): Directory containing the PDF files
+        urls_file (str, optional): Text file with one URL per line, lines starting with # are ignored
+
+    Returns:
+        List[dict]: the documents, each with an "id", a "kind" ("pdf" or "url") and a "source"
+    """
+    documents = []
+    if pdf_dir:
+        for pdf_path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+            pdf_path = os.path.abspath(pdf_path)
+            documents.append({"id": f"pdf:{pdf_path}", "kind": "pdf", "source": pdf_path})
+    if urls_file:
+        with open(urls_file, "r", encoding="utf-8") as f:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith("#"):
+                    documents.append({"id": f"url:{url}", "kind": "url", "source": url})
+    return documents
+
+async def run_batch(args: argparse.Namespace) -> int:
+    """Generate quizzes for every pending document of the batch
+
+    Args:
+        args (argparse.Namespace): The command line arguments
+
+    Returns:
+        int: the number of documents that failed
+    """
+    manifest = BatchManifest(args.manifest)
+    store = ArtifactStore(args.store)
+    excel_converter = QuizExcelConverter(BASE_DIR)
+    cache = AgentResultCache(
+        os.path.join(BASE_DIR, "cache", "agent_results.sqlite"),
+        max_size_mb=float(os.getenv("QUIZ_CACHE_MAX_MB", "256")),
+        bypass=args.no_cache
+    )
+    metrics = MetricsRecorder(args.metrics)
+    question_bank = None if args.no_question_bank else QuestionBank(args.question_bank)
+    languages = args.languages or [args.language]
+    store.start_run(
+        metrics.batch_id, source="batch_cli", model=args.model, language=languages[0], languages=languages,
+        pivot_language=args.pivot_language, pipeline=args.pipeline
+    )
+    # the run is closed and its pending artifacts are written even when the batch is interrupted
+    pending: List[dict] = []
+    failures = 0
+    try:
+        quiz_generator = QuizGenerator(
+            args.model,
+            cache=cache,
+            chunk_tokens=int(os.getenv("QUIZ_CHUNK_TOKENS", "12000")),
+            metrics=metrics,
+            pipeline=args.pipeline,
+            direct_max_tokens=int(os.getenv("QUIZ_DIRECT_MAX_TOKENS", "6000")),
+            store=store,
+            question_bank=question_bank
+        )
+        duplicate_detector = DuplicateDetector(
+            os.path.join(BASE_DIR, "cache", "fingerprints.sqlite"),
+            threshold=float(os.getenv("QUIZ_DUPLICATE_THRESHOLD", "0.8"))
+        )
+        url_fetcher = UrlFetcher(
+            os.path.join(BASE_DIR, "cache", "http"),
+            max_connections=int(os.getenv("QUIZ_URL_MAX_CONNECTIONS", "16"))
+        )
+
+        documents = collect_documents(args.pdf_dir, args.urls_file)
+        skipped_statuses = {"done"} if args.retry_failed else {"done", "failed"}
+        # each document is processed in the languages previous runs did not generate with the same model and pipeline
+        for document in documents:
+            missing = [
+                language for language in languages
+                if manifest.status(document["id"], args.model, args.pipeline, language) not in skipped_statuses
+            ]
+            if missing:
+                pending.append({**document, "languages": missing})
+        print(f"{len(documents)} documents, {len(documents) - len(pending)} already processed, {len(pending)} to process")
+
+        semaphore = asyncio.Semaphore(max(1, args.concurrency))
+        completed = 0
+        # generations in progress by content hash, identical documents of the batch wait for them instead of
+        # generating again, the other duplicates find the finished quizzes in the duplicate detector
+        in_flight: Dict[str, asyncio.Future] = {}
+
+        def record_failure(document: dict, error: Exception) -> None:
+            nonlocal failures, completed
+            failures += 1
+            completed += 1
+            logging.error(f"error processing {document['source']}: {str(error)}")
+            logging.error(traceback.format_exc())
+            manifest.record(
+                document["id"], "failed", args.model, args.pipeline, document["languages"], source=document["source"], error=str(error)
+            )
+            print(f"[{completed}/{len(pending)}] failed: {document['source']}")
+
+        async def generate(
+            text: str,
+            filename: str,
+            fingerprint: DocumentFingerprint,
+            document_languages: List[str]
+        ) -> Tuple[Dict[str, Quiz], Dict[str, str]]:
+            # reuse the quizzes of a document processed earlier, by a previous run or by this one
+            quizzes = {}
+            duplicate_of = {}
+            for language in document_languages:
+                previous = None if args.no_cache else duplicate_detector.find_previous(
+                    fingerprint, language, args.model, args.pipeline
+                )
+                if previous:
+                    duplicate_of[language], quizzes[language] = previous
+            missing = [language for language in document_languages if language not in quizzes]
+            if missing:
+                # process text with agents, several languages share one summary
+                generated, generated_filename = await quiz_generator.create_quizzes_in_languages(
+                    text, filename, missing, pivot_language=args.pivot_language or languages[0]
+                )
+                for language, quiz in generated.items():
+                    if not quiz:
+                        raise ValueError(f"error generating the {language} quiz for {filename}")
+                    duplicate_detector.add(fingerprint, language, args.model, args.pipeline, generated_filename, quiz)
+                quizzes.update(generated)
+            return quizzes, duplicate_of
+
+        async def process(document: dict, client) -> None:
+            nonlocal completed
+            async with semaphore:
+                try:
+                    # extract text
+                    if document["kind"] == "pdf":
+                        filename = os.path.basename(document["source"])
+                        base_filename = filename.replace('.pdf', '')
+                        text = await asyncio.to_thread(extract_text_from_pdf, document["source"])
+                    else:
+                        base_filename = filename = get_filename_from_url(document["source"])
+                        text = await url_fetcher.fetch_text(client, document["source"])
+                    if not text:
+                        raise ValueError(f"impossible to extract text from {document['source']}")
+                    source_hash = ArtifactStore.source_hash(text)
+                    store.add(KIND_RAW_TEXT, text, source_hash, base_filename, run_id=metrics.batch_id)
+                    fingerprint = fingerprint_texts([text])[0]
+
+                    quizzes = {}
+                    duplicate_of = {}
+                    original = in_flight.get(fingerprint.content_hash)
+                    if original:
+                        # an identical document of this run is being generated, its quizzes are reused
+                        original_result = await original
+                        if original_result:
+                            original_filename, original_quizzes = original_result
+                            for language in document["languages"]:
+                                if language in original_quizzes:
+                                    quizzes[language] = original_quizzes[language]
+                                    duplicate_of[language] = original_filename
+                    missing = [language for language in document["languages"] if language not in quizzes]
+                    if missing:
+                        generation = asyncio.get_running_loop().create_future()
+                        in_flight[fingerprint.content_hash] = generation
+                        try:
+                            generated, generated_duplicate_of = await generate(text, filename, fingerprint, missing)
+                            generation.set_result((base_filename, generated))
+                        finally:
+                            if not generation.done():
+                                # the documents waiting for this one generate their quizzes themselves
+                                generation.set_result(None)
+                            if in_flight.get(fingerprint.content_hash) is generation:
+                                del in_flight[fingerprint.content_hash]
+                        quizzes.update(generated)
+                        duplicate_of.update(generated_duplicate_of)
+
+                    # save outputs, the artifacts are written before the manifest points to them
+                    for language, reused_from in duplicate_of.items():
+                        store.add(
+                            KIND_QUIZ, quizzes[language].model_dump_json(), source_hash, base_filename, model=args.model,
+                            language=language, run_id=metrics.batch_id, metadata={"reused_from": reused_from}
+                        )
+                    store.flush()
+                    if len(languages) == 1:
+                        excel_path, _ = excel_converter.export_quiz(quizzes[languages[0]], base_filename)
+                    else:
+                        # the quizzes of every language of a document are grouped in one file, with those of previous runs
+                        document_quizzes = {}
+                        for language in languages:
+                            if language in document["languages"]:
+                                document_quizzes[language] = quizzes[language]
+                            else:
+                                quiz = stored_quiz(store, manifest.entry(document["id"], args.model, args.pipeline, language), language)
+                                if quiz:
+                                    document_quizzes[language] = quiz
+                        excel_path, _ = excel_converter.export_quiz_languages(document_quizzes, base_filename)
+                    manifest.record(
+                        document["id"], "done", args.model, args.pipeline, document["languages"],
+                        source=document["source"],
+                        base_filename=base_filename,
+                        source_hash=source_hash,
+                        run_id=metrics.batch_id,
+                        excel_path=excel_path,
+                        duplicate_of=duplicate_of.get(languages[0]) if len(languages) == 1 else duplicate_of
+                    )
+                except Exception as e:
+                    record_failure(document, e)
+                    return
+                completed += 1
+                print(f"[{completed}/{len(pending)}] done: {document['source']}")
+
+        async with url_fetcher.client() as client:
+            await asyncio.gather(*(process(document, client) for document in pending))
+
+        # per-stage summary of the agent runs of this batch
+        for row in metrics.summary():
+            print(json.dumps(row, ensure_ascii=False))
+        if metrics.runs:
+            print(f"agent run metrics of batch {metrics.batch_id} saved in: {args.metrics}")
+
+        if args.combine:
+            # one combined file per language
+            for language in languages:
+                combine_quizzes(
+                    documents, manifest, store, excel_converter, args.model, args.pipeline, language, len(languages) > 1,
+                    args.dedupe_questions
+                )
+    finally:
+        store.finish_run(metrics.batch_id, documents=len(pending), failures=failures, metrics=metrics.summary())
+        store.close()
+        if question_bank:
+            question_bank.close()
+    return failures
+
+def combine_quizzes(
+    documents: List[dict],
+    manifest: BatchManifest,
+    store: ArtifactStore,
+    excel_converter: QuizExcelConverter,
+    model: str,
+    pipeline: str,
+    language: str,
+    per_language: bool,
+    dedupe_questions: bool
+) -> None:
+    """Write a single Excel file with the quizzes of the batch in one language
+
+    Args:
+        documents (List[dict]): The documents of the batch
+        manifest (BatchManifest): The manifest recording where the quiz of each document is stored
+        store (ArtifactStore): The store of the quizzes
+        excel_converter (QuizExcelConverter): The converter used for excel outputs
+        model (str): The model of the quizzes
+        pipeline (str): The pipeline of the quizzes
+        language (str): The language of the quizzes
+        per_language (bool): whether the file name includes the language, when a batch has several
+        dedupe_questions (bool): whether near-duplicate questions are kept only once
+    """
+    # every quiz recorded as done for the documents of this batch, including previous runs
+    quizzes = []
+    for document in documents:
+        entry = manifest.entry(document["id"], model, pipeline, language)
+        quiz = stored_quiz(store, entry, language)
+        if quiz:
+            quizzes.append((quiz, entry["base_filename"]))
+    combined_name = f"quiz_{language}.xlsx" if per_language else "quiz.xlsx"
+    if not quizzes:
+        print(f"warning: no {language} quiz is stored for the documents of this batch, {combined_name} not written")
+        return
+    if len(quizzes) < len(documents):
+        print(f"warning: {len(documents) - len(quizzes)} of {len(documents)} documents have no {language} quiz in {combined_name}")
+    if dedupe_questions:
+        quizzes, dropped = deduplicate_questions(quizzes, float(os.getenv("QUIZ_QUESTION_DUPLICATE_THRESHOLD", "0.7")))
+        for item in dropped:
+            print(
+                f"duplicate question removed ({item.similarity:.2f}): {item.source}: {item.question.question_text} "
+                f"-> kept {item.kept_source}: {item.kept_question.question_text}"
+            )
+        print(f"{len(dropped)} duplicate questions removed from the combined file")
+    combined_buffer = excel_converter.combine_quizzes_to_excel(quizzes)
+    combined_path = os.path.join(excel_converter.excel_output_dir, combined_name)
+    with open(combined_path, "wb") as f:
+        f.write(combined_buffer.getbuffer())
+    print(f"Sequential numbered quiz saved in: {combined_path}")
+
+def _language_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments
+
+    Args:
+        argv (List[str], optional): The arguments, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate quizzes for a directory of PDFs and/or a list of URLs without the Streamlit UI. "
+                    "Interrupted runs resume from the manifest."
+    )
+    parser.add_argument("--pdf-dir", help="directory containing the PDF files to process")
+    parser.add_argument("--urls-file", help="text file with one URL per line")
+    parser.add_argument("--model", default="gpt-4o-mini", help="the OpenAI model to use (default: gpt-4o-mini)")
+    parser.add_argument("--language", default="English", help="the language of the quizzes (default: English)")
+    parser.add_argument(
+        "--languages",
+        type=_language_list,
+        help="comma separated languages, overrides --language: each document is summarized once and "
+             "its quizzes in every language are generated from that summary"
+    )
+    parser.add_argument(
+        "--pivot-language",
+        help="with --languages, the language of the shared summary (default: the first language)"
+    )
+    parser.add_argument(
+        "--pipeline",
+        choices=PIPELINES,
+        default=PIPELINE_AUTO,
+        help="two_stage, direct (summary and quiz in one call) or auto (direct for short documents, the default)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("QUIZ_MAX_CONCURRENCY", "4")),
+        help="number of documents processed at the same time (default: QUIZ_MAX_CONCURRENCY or 4)"
+    )
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="path of the manifest recording each document's status")
+    parser.add_argument(
+        "--store",
+        default=os.path.join(BASE_DIR, "cache", "artifacts.sqlite"),
+        help="SQLite file storing raw texts, summaries, quizzes and run metadata (default: cache/artifacts.sqlite)"
+    )
+    parser.add_argument(
+        "--question-bank",
+        default=os.path.join(BASE_DIR, "cache", "question_bank.sqlite"),
+        help="SQLite file indexing every generated question, reused on documents covering the same themes "
+             "(default: cache/question_bank.sqlite)"
+    )
+    parser.add_argument("--no-question-bank", action="store_true", help="generate every question, without reusing banked ones")
+    parser.add_argument(
+        "--metrics",
+        default=os.path.join("logs", "agent_metrics.jsonl"),
+        help="JSON lines file the agent run metrics are appended to (default: logs/agent_metrics.jsonl)"
+    )
+    parser.add_argument("--retry-failed", action="store_true", help="process again the documents that failed in previous runs")
+    parser.add_argument("--combine", action="store_true", help="also create a single Excel file with all quizzes of the batch")
+    parser.add_argument(
+        "--dedupe-questions",
+        action="store_true",
+        help="with --combine, keep near-duplicate questions only once (QUIZ_QUESTION_DUPLICATE_THRESHOLD, default 0.7)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="do not reuse cached summaries and quizzes, nor the quizzes of duplicate documents")
+    args = parser.parse_args(argv)
+    if not args.pdf_dir and not args.urls_file:
+        parser.error("at least one of --pdf-dir and --urls-file is required")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not os.getenv("OPENAI_API_KEY"):
+        print("set OPENAI_API_KEY", file=sys.stderr)
+        return 2
+    configure_openai_client()
+    log_filename = setup_logging()
+    print(f"logging to {log_filename}")
+    failures = asyncio.run(run_batch(args))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
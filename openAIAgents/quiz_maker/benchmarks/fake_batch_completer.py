@@ -0,0 +1,57 @@
+import sys
+import json
+import uuid
+import random
+import argparse
+from typing import List, Optional
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+def complete_batch(requests_path: str, results_path: str, server: FakeOpenAIServer, invalid_probability: float = 0.0, seed: int = 0) -> int:
+    """Write the result file of a batch request file, like the Batch API does once a batch is completed
+
+    Args:
+        requests_path (str): The JSON lines request file
+        results_path (str): The JSON lines result file to write
+        server (FakeOpenAIServer): generates the responses, without serving them
+        invalid_probability (float): probability of a result with an output that does not validate
+        seed (int): seed of the invalid results
+
+    Returns:
+        int: the number of results written
+    """
+    rng = random.Random(seed)
+    results = 0
+    with open(requests_path, "r", encoding="utf-8") as requests_file, open(results_path, "w", encoding="utf-8") as results_file:
+        for line in requests_file:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            response = server.create_response(request["body"])
+            if rng.random() < invalid_probability:
+                # a truncated output, as when the model stops early
+                content = response["output"][0]["content"][0]
+                content["text"] = content["text"][:len(content["text"]) // 2]
+            result = {
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": response},
+                "error": None
+            }
+            results_file.write(json.dumps(result) + "\n")
+            results += 1
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Complete a batch request file offline with the fake OpenAI server.")
+    parser.add_argument("requests", help="the JSON lines request file")
+    parser.add_argument("results", help="the JSON lines result file to write")
+    parser.add_argument("--invalid-probability", type=float, default=0.0, help="probability of an output that does not validate (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated outputs (default: 0)")
+    args = parser.parse_args(argv)
+
+    results = complete_batch(args.requests, args.results, FakeOpenAIServer(seed=args.seed), args.invalid_probability, args.seed)
+    print(f"{results} results written to {args.results}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
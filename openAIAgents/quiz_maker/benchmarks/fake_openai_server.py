@@ -0,0 +1,286 @@
+import re
+import json
+import time
+import uuid
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+
+# rough number of characters per token of the usage reported by the fake server
+CHARS_PER_TOKEN = 4
+
+# streamed responses: share of the latency before the first token, and characters per text delta
+FIRST_TOKEN_SHARE = 0.2
+STREAM_CHUNK_CHARS = 16
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Handler answering Responses API requests with generated summaries and quizzes, streamed on request"""
+
+    def log_message(self, format, *args):
+        # keep the benchmark output clean
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/responses"):
+            self._send_json(404, {"error": {"message": f"unsupported endpoint {self.path}", "type": "invalid_request_error"}})
+            return
+
+        server: FakeOpenAIServer = self.server.owner
+        retry_after = server.check_rate_limit()
+        if retry_after is not None:
+            # rejected immediately, like the real API
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"retry-after-ms": str(int(retry_after * 1000))}
+            )
+            return
+
+        latency = server.sample_latency()
+        response = server.create_response(body)
+        text = response["output"][0]["content"][0]["text"]
+
+        if body.get("stream"):
+            self._stream_response(response, text, latency)
+        else:
+            time.sleep(latency)
+            self._send_json(200, response)
+        server.count_request(response["usage"]["input_tokens"], response["usage"]["output_tokens"])
+
+    def _stream_response(self, response: dict, text: str, latency: float) -> None:
+        """Send a response as server-sent events, spreading the output text over the latency"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        sequence_number = 0
+
+        def send_event(event: dict) -> None:
+            nonlocal sequence_number
+            event["sequence_number"] = sequence_number
+            sequence_number += 1
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        message = response["output"][0]
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        in_progress = {**response, "status": "in_progress", "output": [], "usage": None}
+        send_event({"type": "response.created", "response": in_progress})
+        time.sleep(latency * FIRST_TOKEN_SHARE)
+        send_event({
+            "type": "response.output_item.added", "output_index": 0,
+            "item": {**message, "status": "in_progress", "content": []}
+        })
+        send_event({
+            "type": "response.content_part.added", "item_id": message["id"], "output_index": 0, "content_index": 0,
+            "part": {"type": "output_text", "text": "", "annotations": []}
+        })
+        for chunk in chunks:
+            send_event({
+                "type": "response.output_text.delta", "item_id": message["id"], "output_index": 0,
+                "content_index": 0, "delta": chunk, "logprobs": []
+            })
+            time.sleep(latency * (1 - FIRST_TOKEN_SHARE) / len(chunks))
+        send_event({
+            "type": "response.output_text.done", "item_id": message["id"], "output_index": 0,
+            "content_index": 0, "text": text, "logprobs": []
+        })
+        send_event({
+            "type": "response.content_part.done", "item_id": message["id"], "output_index": 0, "content_index": 0,
+            "part": message["content"][0]
+        })
+        send_event({"type": "response.output_item.done", "output_index": 0, "item": message})
+        send_event({"type": "response.completed", "response": response})
+
+class FakeOpenAIServer:
+    """Local stand-in for the OpenAI Responses API with configurable latency
+
+    Summaries are returned for plain text requests, quizzes (with a summary when the
+    schema asks for one) for structured output requests. A request quota and random
+    rate limit errors can be enabled to exercise the retry and pacing logic.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        questions: int = 10,
+        seed: int = 0,
+        requests_per_minute: float = 0,
+        rate_limit_probability: float = 0.0
+    ):
+        """Initialize the server
+
+        Args:
+            latency (float): mean response time of each request, in seconds
+            jitter (float): standard deviation of the response time, in seconds
+            questions (int): number of questions of each generated quiz, unless the instructions ask for another number
+            seed (int): seed of the latency and content generator
+            requests_per_minute (float): request quota, requests over it get a 429 with a retry-after
+                delay, 0 for no quota. Bursts of at most one second of quota are accepted
+            rate_limit_probability (float): probability of a random 429 for any request
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.questions = questions
+        self.requests_per_minute = requests_per_minute
+        self.rate_limit_probability = rate_limit_probability
+        self.rate_limited = 0
+        self._quota = max(1.0, requests_per_minute / 60)
+        self._quota_updated_at = time.monotonic()
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def sample_latency(self) -> float:
+        """Draw the response time of a request
+
+        Returns:
+            float: the response time, in seconds
+        """
+        with self._lock:
+            return max(0.0, self._random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+
+    def check_rate_limit(self) -> Optional[float]:
+        """Take one request from the quota
+
+        Returns:
+            Optional[float]: None if the request is accepted, else the seconds to wait before retrying
+        """
+        with self._lock:
+            if self.rate_limit_probability and self._random.random() < self.rate_limit_probability:
+                self.rate_limited += 1
+                return 1.0
+            if not self.requests_per_minute:
+                return None
+            now = time.monotonic()
+            rate = self.requests_per_minute / 60
+            self._quota = min(max(1.0, rate), self._quota + (now - self._quota_updated_at) * rate)
+            self._quota_updated_at = now
+            if self._quota < 1:
+                self.rate_limited += 1
+                return (1 - self._quota) / rate
+            self._quota -= 1
+            return None
+
+    def count_request(self, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def generate_output(self, body: dict) -> str:
+        """Generate the output text of a request
+
+        Args:
+            body (dict): The Responses API request
+
+        Returns:
+            str: a plain text summary, or the JSON of a quiz for structured output requests
+        """
+        words = json.dumps(body.get("input", "")).split()
+        # the number of questions asked for, when only the questions missing from a bank are requested
+        requested = re.search(r"create exactly (\d+) multiple choice", body.get("instructions") or "")
+        count = int(requested.group(1)) if requested else self.questions
+        with self._lock:
+            picks = [self._random.choice(words) if words else "word" for _ in range(count * 12)]
+
+        output_format = (body.get("text") or {}).get("format") or {}
+        if output_format.get("type") != "json_schema":
+            return "summary: " + " ".join(words[:200])
+
+        questions = []
+        for i in range(count):
+            sample = picks[i * 12:(i + 1) * 12]
+            questions.append({
+                "theme": " ".join(sample[:2]),
+                "question_text": f"what does {' '.join(sample[:6])} mean?",
+                "answers": [
+                    {"text": f"{' '.join(sample[6:9])}", "score": 5},
+                    {"text": f"{' '.join(sample[9:12])}", "score": 0},
+                    {"text": f"not {' '.join(sample[6:9])}", "score": 0},
+                    {"text": f"never {' '.join(sample[9:12])}", "score": -5}
+                ]
+            })
+        output = {"questions": questions}
+        if "summary" in output_format.get("schema", {}).get("properties", {}):
+            output = {"summary": "summary: " + " ".join(words[:200]), **output}
+        return json.dumps(output)
+
+    def create_response(self, body: dict) -> dict:
+        """Build the completed response of a request
+
+        Args:
+            body (dict): The Responses API request
+
+        Returns:
+            dict: the Responses API response, with its output text and usage
+        """
+        text = self.generate_output(body)
+        input_tokens = len(json.dumps(body.get("input", ""))) // CHARS_PER_TOKEN + 1
+        output_tokens = len(text) // CHARS_PER_TOKEN + 1
+        return {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": time.time(),
+            "model": body.get("model"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}]
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0}
+            }
+        }
+
+    def start(self) -> str:
+        """Start serving in a background thread
+
+        Returns:
+            str: the base URL to configure the OpenAI client with
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAIHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self.base_url = self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,158 @@
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+
+# words used to generate fixture documents
+VOCABULARY = (
+    "energy system network model data process value market policy research method result "
+    "cell protein climate water soil carbon city transport health risk theory law history "
+    "language culture memory signal circuit engine material structure pressure current field"
+).split()
+
+# number of words per line of the generated PDF pages
+WORDS_PER_LINE = 12
+
+def generate_pages(rng: random.Random, pages: int, words_per_page: int) -> List[str]:
+    """Generate the pages of a pseudo-random document
+
+    Every document gets its own numbered terms so that documents are never near-duplicates.
+
+    Args:
+        rng (random.Random): The random generator, seeded for reproducible documents
+        pages (int): The number of pages
+        words_per_page (int): The number of words of each page
+
+    Returns:
+        List[str]: the text of each page, with one line per WORDS_PER_LINE words
+    """
+    vocabulary = VOCABULARY + [f"term{rng.randrange(10 ** 6)}" for _ in range(len(VOCABULARY))]
+    result = []
+    for _ in range(pages):
+        words = [rng.choice(vocabulary) for _ in range(words_per_page)]
+        result.append("\n".join(" ".join(words[i:i + WORDS_PER_LINE]) for i in range(0, len(words), WORDS_PER_LINE)))
+    return result
+
+def _escape_pdf_text(text: str) -> bytes:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", errors="replace")
+
+def make_pdf(pages: List[str]) -> bytes:
+    """Build a minimal PDF with one Helvetica text page per string
+
+    Args:
+        pages (List[str]): The text of each page, lines separated by newlines
+
+    Returns:
+        bytes: the PDF file
+    """
+    objects = []
+
+    def add(content: bytes) -> int:
+        objects.append(content)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    # the page tree is added after the content and page objects
+    pages_id = len(objects) + 1 + 2 * len(pages)
+    page_ids = []
+    for text in pages:
+        lines = b" ".join(b"(" + _escape_pdf_text(line) + b") '" for line in text.split("\n"))
+        stream = b"BT /F1 9 Tf 40 800 Td 11 TL " + lines + b" ET"
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for i, content in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % i + content + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_offset)
+    return output
+
+def make_html(title: str, pages: List[str]) -> str:
+    """Build an HTML article with navigation boilerplate around the generated text
+
+    Args:
+        title (str): The title of the page
+        pages (List[str]): The text of the article, one section per page
+
+    Returns:
+        str: the HTML document
+    """
+    sections = "".join(
+        f"<section><h2>Part {i}</h2>" + "".join(f"<p>{line}</p>" for line in page.split("\n")) + "</section>"
+        for i, page in enumerate(pages, 1)
+    )
+    navigation = "".join(f'<li><a href="/topic/{word}">{word}</a></li>' for word in VOCABULARY[:10])
+    return (
+        f"<html><head><title>{title}</title></head><body>"
+        f"<nav><ul>{navigation}</ul></nav>"
+        f"<article><h1>{title}</h1>{sections}</article>"
+        f"<footer>fixture site, all rights reserved</footer>"
+        f"</body></html>"
+    )
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """Handler serving the pages of a FixtureHttpServer"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.owner.pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FixtureHttpServer:
+    """Local HTTP server serving generated HTML pages"""
+
+    def __init__(self, pages: Optional[Dict[str, str]] = None):
+        """Initialize the server
+
+        Args:
+            pages (Dict[str, str], optional): HTML of each path, can be extended after start
+        """
+        self.pages = pages if pages is not None else {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.base_url = ""
+
+    def start(self) -> str:
+        """Start serving in a background thread
+
+        Returns:
+            str: the base URL of the server
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FixtureHttpServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
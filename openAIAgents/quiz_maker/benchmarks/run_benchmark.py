@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Dict, List, Optional
+from agents import set_tracing_disabled
+from ai_agent import QuizGenerator, PIPELINES, PIPELINE_AUTO
+from excel_converter import QuizExcelConverter
+from metrics import MetricsRecorder, _percentile
+from scheduler import configure_openai_client
+from url_fetcher import UrlFetcher
+from artifact_store import ArtifactStore, KIND_RAW_TEXT
+from utils import extract_text_from_pdf_bytes
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import FixtureHttpServer, generate_pages, make_pdf, make_html
+
+# interval between two memory samples, in seconds
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+def _rss_mb() -> Optional[float]:
+    """Resident memory of the current process, None where /proc is not available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class PeakMemorySampler:
+    """Sample the resident memory of the process in a background thread and keep the peak"""
+
+    def __init__(self):
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while True:
+            rss = _rss_mb()
+            if rss is not None:
+                self.peak_mb = max(self.peak_mb or 0.0, rss)
+            if self._stop.wait(MEMORY_SAMPLE_INTERVAL):
+                return
+
+    def __enter__(self) -> "PeakMemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+def create_documents(work_dir: str, fixtures: FixtureHttpServer, batch_size: int, args: argparse.Namespace) -> List[dict]:
+    """Generate the PDF files and HTML pages of a batch
+
+    Args:
+        work_dir (str): Directory the PDF files are written to
+        fixtures (FixtureHttpServer): The server the HTML pages are added to
+        batch_size (int): The number of documents
+        args (argparse.Namespace): The benchmark arguments
+
+    Returns:
+        List[dict]: the documents, each with a "kind" ("pdf" or "url") and a "source" path or URL
+    """
+    rng = random.Random(args.seed)
+    pdf_count = round(batch_size * args.pdf_ratio)
+    documents = []
+    for i in range(batch_size):
+        pages = generate_pages(rng, args.pages, args.words_per_page)
+        if i < pdf_count:
+            pdf_path = os.path.join(work_dir, f"document_{i}.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(make_pdf(pages))
+            documents.append({"kind": "pdf", "source": pdf_path})
+        else:
+            fixtures.pages[f"/article/{i}"] = make_html(f"Article {i}", pages)
+            documents.append({"kind": "url", "source": f"{fixtures.base_url}/article/{i}"})
+    return documents
+
+async def run_configuration(
+    documents: List[dict],
+    concurrency: int,
+    work_dir: str,
+    args: argparse.Namespace
+) -> Dict:
+    """Process a batch the way the app does and measure it
+
+    Args:
+        documents (List[dict]): The documents of the batch
+        concurrency (int): The number of documents processed at the same time
+        work_dir (str): Directory for the outputs of this run
+        args (argparse.Namespace): The benchmark arguments
+
+    Returns:
+        Dict: throughput, per-stage latency percentiles and peak memory of the run
+    """
+    store = ArtifactStore(os.path.join(work_dir, "artifacts.sqlite"))
+    excel_converter = QuizExcelConverter(work_dir)
+    metrics = MetricsRecorder(os.path.join(work_dir, "agent_metrics.jsonl"))
+    # no cache: every document reaches the fake server
+    quiz_generator = QuizGenerator(
+        args.model,
+        chunk_tokens=args.chunk_tokens,
+        metrics=metrics,
+        pipeline=args.pipeline,
+        direct_max_tokens=args.direct_max_tokens,
+        store=store
+    )
+    url_fetcher = UrlFetcher(os.path.join(work_dir, "http"), max_connections=args.url_connections)
+    stage_times: Dict[str, List[float]] = {}
+    rate_limited = 0
+    retries = 0
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def timed(stage: str, started_at: float) -> None:
+        stage_times.setdefault(stage, []).append(time.perf_counter() - started_at)
+
+    async def process(index: int, document: dict, client) -> None:
+        nonlocal failures
+        async with semaphore:
+            document_started_at = time.perf_counter()
+            base_filename = f"document_{index}"
+            started_at = time.perf_counter()
+            if document["kind"] == "pdf":
+                with open(document["source"], "rb") as f:
+                    pdf_bytes = f.read()
+                text = await asyncio.to_thread(extract_text_from_pdf_bytes, pdf_bytes)
+                timed("extract_pdf", started_at)
+            else:
+                text = await url_fetcher.fetch_text(client, document["source"])
+                timed("fetch_url", started_at)
+            store.add(KIND_RAW_TEXT, text, ArtifactStore.source_hash(text), base_filename)
+
+            first_questions = []
+
+            def on_question(q_index: int, question) -> None:
+                # time the user waits for the first question of the document
+                if not first_questions:
+                    first_questions.append(question)
+                    timed("first_question", document_started_at)
+
+            quiz, base_filename = await quiz_generator.create_quiz_from_text(
+                text, base_filename, args.language, on_question=on_question if args.stream else None
+            )
+            if not quiz:
+                failures += 1
+                return
+
+            started_at = time.perf_counter()
+            await asyncio.to_thread(excel_converter.export_quiz, quiz, base_filename)
+            timed("excel", started_at)
+            timed("document", document_started_at)
+
+    with PeakMemorySampler() as memory:
+        started_at = time.perf_counter()
+        async with url_fetcher.client() as client:
+            await asyncio.gather(*(process(index, document, client) for index, document in enumerate(documents)))
+        store.close()
+        wall_time = time.perf_counter() - started_at
+
+    # agent stages come from the metrics recorded by the generator
+    for run in metrics.runs:
+        rate_limited += run.rate_limited
+        retries += run.retries
+        if not run.cached:
+            stage_times.setdefault(run.stage, []).append(run.wall_time_s)
+
+    return {
+        "documents": len(documents),
+        "concurrency": concurrency,
+        "failures": failures,
+        "wall_time_s": round(wall_time, 2),
+        "docs_per_min": round((len(documents) - failures) / wall_time * 60, 1) if wall_time else None,
+        "peak_rss_mb": round(memory.peak_mb, 1) if memory.peak_mb is not None else None,
+        "rate_limited": rate_limited,
+        "retries": retries,
+        "stages": {
+            stage: {
+                "count": len(times),
+                "p50_s": round(_percentile(times, 50), 3),
+                "p95_s": round(_percentile(times, 95), 3)
+            }
+            for stage, times in sorted(stage_times.items())
+        }
+    }
+
+def print_result(result: Dict) -> None:
+    print(
+        f"\n{result['documents']} documents, concurrency {result['concurrency']}: "
+        f"{result['docs_per_min']} docs/min, {result['wall_time_s']}s, "
+        f"peak RSS {result['peak_rss_mb']} MB, {result['failures']} failures, "
+        f"{result['rate_limited']} rate limited, {result['retries']} retries"
+    )
+    print(f"  {'stage':<16}{'count':>7}{'p50 (s)':>10}{'p95 (s)':>10}")
+    for stage, row in result["stages"].items():
+        print(f"  {stage:<16}{row['count']:>7}{row['p50_s']:>10}{row['p95_s']:>10}")
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments
+
+    Args:
+        argv (List[str], optional): The arguments, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure the quiz pipeline offline against a fake OpenAI server and a local HTTP fixture server."
+    )
+    parser.add_argument("--batch-sizes", type=_int_list, default=[10], help="comma separated batch sizes (default: 10)")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4], help="comma separated concurrency settings (default: 1,4)")
+    parser.add_argument("--pdf-ratio", type=float, default=0.5, help="fraction of the documents that are PDFs, the rest are URLs (default: 0.5)")
+    parser.add_argument("--pages", type=int, default=4, help="pages per document (default: 4)")
+    parser.add_argument("--words-per-page", type=int, default=400, help="words per page (default: 400)")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean latency of the fake model, in seconds (default: 0.5)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="standard deviation of the fake model latency (default: 0.1)")
+    parser.add_argument("--server-rpm", type=float, default=0, help="request quota of the fake model, 0 for none (default: 0)")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0, help="probability of random 429 responses (default: 0)")
+    parser.add_argument("--pipeline", choices=PIPELINES, default=PIPELINE_AUTO, help="the quiz pipeline (default: auto)")
+    parser.add_argument("--chunk-tokens", type=int, default=int(os.getenv("QUIZ_CHUNK_TOKENS", "12000")), help="chunk size of long documents")
+    parser.add_argument("--direct-max-tokens", type=int, default=int(os.getenv("QUIZ_DIRECT_MAX_TOKENS", "6000")), help="direct pipeline limit in auto mode")
+    parser.add_argument("--url-connections", type=int, default=16, help="maximum simultaneous fixture connections (default: 16)")
+    parser.add_argument("--model", default="gpt-4o-mini", help="model name sent to the fake server (default: gpt-4o-mini)")
+    parser.add_argument("--language", default="English", help="quiz language (default: English)")
+    parser.add_argument("--stream", action="store_true", help="stream the quizzes and time the first question of each document")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the documents and latencies (default: 0)")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    set_tracing_disabled(True)
+    results = []
+
+    model_server = FakeOpenAIServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        seed=args.seed,
+        requests_per_minute=args.server_rpm,
+        rate_limit_probability=args.rate_limit_probability
+    )
+    with model_server, FixtureHttpServer() as fixtures:
+        configure_openai_client(base_url=model_server.base_url, api_key="benchmark")
+        for batch_size in args.batch_sizes:
+            for concurrency in args.concurrency:
+                # fresh documents and output directories so that no run reuses another's files
+                with tempfile.TemporaryDirectory(prefix="quiz_benchmark_") as work_dir:
+                    documents = create_documents(work_dir, fixtures, batch_size, args)
+                    requests_before = model_server.requests
+                    result = asyncio.run(run_configuration(documents, concurrency, work_dir, args))
+                    result["model_requests"] = model_server.requests - requests_before
+                results.append(result)
+                print_result(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "output"}, "results": results}, f, indent=2)
+        print(f"\nresults saved in: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
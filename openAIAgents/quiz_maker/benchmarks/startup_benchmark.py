@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+# directory of the app, the working directory of the measured processes
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules of the app whose own import time is reported
+APP_MODULES = [
+    "main", "ai_agent", "artifact_store", "batch_cli", "cache", "dedup", "excel_converter",
+    "metrics", "models", "offline_batch", "question_bank", "scheduler", "stream_parser", "url_fetcher", "utils"
+]
+
+# measured in a fresh interpreter, so that nothing is already imported
+IMPORT_SCRIPT = """
+import time
+started_at = time.perf_counter()
+import main
+print(time.perf_counter() - started_at)
+"""
+
+FIRST_RENDER_SCRIPT = """
+import os, time
+from streamlit.testing.v1 import AppTest
+started_at = time.perf_counter()
+app = AppTest.from_file(os.path.join(os.getcwd(), "main.py"), default_timeout=120).run()
+elapsed = time.perf_counter() - started_at
+assert not app.exception, app.exception
+print(elapsed)
+"""
+
+def _run_python(args: List[str]) -> subprocess.CompletedProcess:
+    # a key is needed to render the whole page, no request is sent
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "startup-benchmark")}
+    return subprocess.run([sys.executable, *args], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+
+def measure_seconds(script: str, repeat: int) -> List[float]:
+    """Run a script printing a duration in fresh interpreters
+
+    Args:
+        script (str): The Python code, its last output line is the duration in seconds
+        repeat (int): The number of runs
+
+    Returns:
+        List[float]: the duration of each run
+    """
+    return [float(_run_python(["-c", script]).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+
+def module_import_times() -> Dict[str, float]:
+    """Measure the cumulative import time of each module imported by main.py, with -X importtime
+
+    Returns:
+        Dict[str, float]: the seconds spent importing each module and its dependencies, slowest first
+    """
+    stderr = _run_python(["-X", "importtime", "-c", "import main"]).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative) / 1_000_000
+        except ValueError:
+            # header line
+            continue
+    return dict(sorted(times.items(), key=lambda item: item[1], reverse=True))
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments
+
+    Args:
+        argv (List[str], optional): The arguments, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Measure the import time and the first render time of the Streamlit app.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each measure, the median is reported (default: 5)")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imported modules listed (default: 15)")
+    parser.add_argument("--max-import-s", type=float, help="fail if the median import time of main.py exceeds this many seconds")
+    parser.add_argument("--max-render-s", type=float, help="fail if the median first render time exceeds this many seconds")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    import_times = measure_seconds(IMPORT_SCRIPT, args.repeat)
+    render_times = measure_seconds(FIRST_RENDER_SCRIPT, args.repeat)
+    modules = module_import_times()
+    result = {
+        "import_s": round(statistics.median(import_times), 3),
+        "first_render_s": round(statistics.median(render_times), 3),
+        "app_modules_s": {name: round(modules[name], 3) for name in APP_MODULES if name in modules},
+        "slowest_modules_s": {name: round(seconds, 3) for name, seconds in list(modules.items())[:args.top]}
+    }
+
+    print(f"import main.py: {result['import_s']}s (median of {args.repeat})")
+    print(f"first render:   {result['first_render_s']}s (median of {args.repeat})")
+    print("\nslowest imports (cumulative):")
+    for name, seconds in result["slowest_modules_s"].items():
+        print(f"  {seconds:>7.3f}s  {name}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nresults saved in: {args.output}")
+
+    failed = False
+    if args.max_import_s is not None and result["import_s"] > args.max_import_s:
+        print(f"import time {result['import_s']}s exceeds {args.max_import_s}s", file=sys.stderr)
+        failed = True
+    if args.max_render_s is not None and result["first_render_s"] > args.max_render_s:
+        print(f"first render time {result['first_render_s']}s exceeds {args.max_render_s}s", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+class AgentResultCache:
+    """Class for caching agent results on disk, keyed by a hash of their inputs"""
+
+    def __init__(self, db_path: str, max_size_mb: float = 256, bypass: bool = False):
+        """Initialize the cache
+
+        Args:
+            db_path (str): The path of the SQLite database file
+            max_size_mb (float): maximum total size of the cached values, oldest used entries are evicted first
+            bypass (bool): if True cached values are never returned, fresh results are still stored
+        """
+        self.db_path = db_path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.bypass = bypass
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS agent_results (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_results_last_access ON agent_results (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(stage: str, text: str, model: str, language: str, instructions: str) -> str:
+        """Build the cache key of an agent run
+
+        Args:
+            stage (str): The pipeline stage (e.g. "summary" or "quiz")
+            text (str): The input text given to the agent
+            model (str): The model used by the agent
+            language (str): The output language
+            instructions (str): The agent instructions
+
+        Returns:
+            str: the hex digest identifying the agent run
+        """
+        digest = hashlib.sha256()
+        for part in (stage, model, language, instructions, text):
+            encoded = part.encode("utf-8")
+            # length prefix so that different splits of the same bytes never collide
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached value
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            Optional[str]: the cached value, or None if missing or bypassed
+        """
+        if self.bypass:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value FROM agent_results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute("UPDATE agent_results SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                return row[0]
+        except sqlite3.Error as e:
+            logging.error(f"Error reading from agent result cache: {str(e)}")
+            return None
+
+    def set(self, key: str, stage: str, value: str) -> None:
+        """Store a value and evict the least recently used entries if the cache is full
+
+        Args:
+            key (str): The cache key
+            stage (str): The pipeline stage that produced the value
+            value (str): The value to store
+        """
+        size = len(value.encode("utf-8"))
+        if size > self.max_size_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO agent_results (key, stage, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, stage, value, size, now, now)
+                )
+                self._evict()
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error writing to agent result cache: {str(e)}")
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries until the cache fits its maximum size"""
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM agent_results").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        evicted_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM agent_results ORDER BY last_access"):
+            if total_size <= self.max_size_bytes:
+                break
+            evicted_keys.append((key,))
+            total_size -= size
+        self._conn.executemany("DELETE FROM agent_results WHERE key = ?", evicted_keys)
+
+    def clear(self) -> None:
+        """Delete all cached values"""
+        with self._lock:
+            self._conn.execute("DELETE FROM agent_results")
+            self._conn.commit()
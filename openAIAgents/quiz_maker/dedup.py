@@ -0,0 +1,361 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from models import Question, Quiz
+
+# number of hash permutations of each MinHash signature
+NUM_PERM = 128
+
+# LSH banding: documents sharing all rows of at least one band are compared
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# number of consecutive words of each document and question shingle
+DOCUMENT_SHINGLE_SIZE = 5
+QUESTION_SHINGLE_SIZE = 2
+
+# number of shingles permuted at once, bounds the memory of the signature computation
+MINHASH_BLOCK_SIZE = 4096
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_random = np.random.RandomState(1)
+_PERM_A = _random.randint(1, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _random.randint(0, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+_BAND_MULTIPLIERS = _random.randint(1, (1 << 63) - 1, size=LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+class DocumentFingerprint(NamedTuple):
+    content_hash: str
+    signature: np.ndarray
+
+class DroppedQuestion(NamedTuple):
+    question: Question
+    source: str
+    kept_question: Question
+    kept_source: str
+    similarity: float
+
+def tokenize(text: str) -> List[str]:
+    """Split a text into lowercase words, ignoring punctuation and whitespace
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        List[str]: the words of the text
+    """
+    return _WORD_PATTERN.findall(text.lower())
+
+def shingle_hashes(words: Sequence[str], size: int) -> np.ndarray:
+    """Hash every sequence of size consecutive words
+
+    Args:
+        words (Sequence[str]): The words of a text
+        size (int): The number of words per shingle
+
+    Returns:
+        np.ndarray: the 32-bit hashes of the distinct shingles, never empty
+    """
+    if len(words) <= size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+def minhash_signatures(hash_sets: List[np.ndarray]) -> np.ndarray:
+    """Compute the MinHash signatures of many shingle sets at once
+
+    All sets are concatenated and permuted block by block, the minimum of each set
+    is taken with a segmented reduction instead of a Python loop over the sets.
+
+    Args:
+        hash_sets (List[np.ndarray]): The non-empty shingle hash arrays
+
+    Returns:
+        np.ndarray: a (len(hash_sets), NUM_PERM) array of signatures
+    """
+    lengths = np.fromiter((len(hashes) for hashes in hash_sets), dtype=np.int64, count=len(hash_sets))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    all_hashes = np.concatenate(hash_sets) if hash_sets else np.empty(0, dtype=np.uint64)
+    signatures = np.full((len(hash_sets), NUM_PERM), _MAX_HASH, dtype=np.uint64)
+
+    for start in range(0, len(all_hashes), MINHASH_BLOCK_SIZE):
+        block = all_hashes[start:start + MINHASH_BLOCK_SIZE]
+        permuted = ((block[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+
+        # index of the set each row belongs to, rows of a set are contiguous
+        set_ids = np.searchsorted(offsets, np.arange(start, start + len(block)), side="right") - 1
+        boundaries = np.flatnonzero(np.concatenate(([True], set_ids[1:] != set_ids[:-1])))
+        block_minimums = np.minimum.reduceat(permuted, boundaries, axis=0)
+        ids = set_ids[boundaries]
+        signatures[ids] = np.minimum(signatures[ids], block_minimums)
+
+    return signatures
+
+def estimate_similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two shingle sets from their signatures
+
+    Args:
+        signature_a (np.ndarray): The first signature
+        signature_b (np.ndarray): The second signature
+
+    Returns:
+        float: the fraction of equal signature values
+    """
+    return float(np.mean(signature_a == signature_b))
+
+def band_hashes(signatures: np.ndarray) -> np.ndarray:
+    """Hash every LSH band of many signatures at once
+
+    Args:
+        signatures (np.ndarray): A (n, NUM_PERM) array of signatures
+
+    Returns:
+        np.ndarray: a (n, LSH_BANDS) array of 64-bit band hashes
+    """
+    bands = signatures.reshape(len(signatures), LSH_BANDS, LSH_ROWS)
+    # multiply-add with wrap-around, a cheap universal hash of the band values
+    return (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64)
+
+def lsh_buckets(signature: np.ndarray) -> List[str]:
+    """Get the LSH bucket of each band of a signature
+
+    Args:
+        signature (np.ndarray): The signature
+
+    Returns:
+        List[str]: one bucket id per band, prefixed by the band number
+    """
+    return [f"{band}:{value:016x}" for band, value in enumerate(band_hashes(signature[None, :])[0].tolist())]
+
+def fingerprint_texts(texts: List[str]) -> List[DocumentFingerprint]:
+    """Fingerprint documents for exact and near-duplicate detection
+
+    Args:
+        texts (List[str]): The extracted texts
+
+    Returns:
+        List[DocumentFingerprint]: the hash of the normalized words and the MinHash signature of each text
+    """
+    word_lists = [tokenize(text) for text in texts]
+    signatures = minhash_signatures([shingle_hashes(words, DOCUMENT_SHINGLE_SIZE) for words in word_lists])
+    return [
+        DocumentFingerprint(hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest(), signature)
+        for words, signature in zip(word_lists, signatures)
+    ]
+
+def _question_quality(question: Question) -> tuple:
+    """Rank questions so that the best instance of a duplicate group is kept
+
+    Args:
+        question (Question): The question
+
+    Returns:
+        tuple: higher is better, well-formed questions first, then the most detailed ones
+    """
+    scores = [answer.score for answer in question.answers]
+    well_formed = len(question.answers) == 4 and scores.count(max(scores, default=0)) == 1
+    return (well_formed, len(question.question_text), sum(len(answer.text) for answer in question.answers))
+
+def deduplicate_questions(
+    quizzes: List[Tuple[Quiz, str]],
+    threshold: float = 0.7
+) -> Tuple[List[Tuple[Quiz, str]], List[DroppedQuestion]]:
+    """Remove near-duplicate questions across quizzes
+
+    Questions are compared on their text and their (unordered) answers. Signatures are
+    computed for all questions at once and only questions sharing an LSH band are compared,
+    so the cost grows with the number of questions rather than the number of pairs.
+
+    Args:
+        quizzes (List[Tuple[Quiz, str]]): list of (Quiz, filename) tuples
+        threshold (float): minimum estimated Jaccard similarity of duplicate questions
+
+    Returns:
+        Tuple[List[Tuple[Quiz, str]], List[DroppedQuestion]]: the quizzes without duplicates, in the
+        original order, and the dropped questions with the instance that was kept instead
+    """
+    entries = [
+        (quiz_index, question, filename)
+        for quiz_index, (quiz, filename) in enumerate(quizzes)
+        for question in quiz.questions
+    ]
+    if not entries:
+        return quizzes, []
+
+    signatures = minhash_signatures([
+        shingle_hashes(
+            tokenize(question.question_text) + tokenize(" ".join(sorted(answer.text for answer in question.answers))),
+            QUESTION_SHINGLE_SIZE
+        )
+        for _, question, _ in entries
+    ])
+    hashes = band_hashes(signatures).tolist()
+
+    # best instances first, so that every duplicate group keeps its best question
+    order = sorted(range(len(entries)), key=lambda i: _question_quality(entries[i][1]), reverse=True)
+    buckets = [{} for _ in range(LSH_BANDS)]
+    kept = [False] * len(entries)
+    dropped = []
+    for index in order:
+        candidates = {candidate for band, value in enumerate(hashes[index]) for candidate in buckets[band].get(value, ())}
+        match = None
+        for candidate in sorted(candidates):
+            similarity = estimate_similarity(signatures[index], signatures[candidate])
+            if similarity >= threshold:
+                match = (candidate, similarity)
+                break
+        if match:
+            candidate, similarity = match
+            dropped.append(DroppedQuestion(entries[index][1], entries[index][2], entries[candidate][1], entries[candidate][2], similarity))
+            continue
+        kept[index] = True
+        for band, value in enumerate(hashes[index]):
+            buckets[band].setdefault(value, []).append(index)
+
+    kept_questions = [[] for _ in quizzes]
+    for index, (quiz_index, question, _) in enumerate(entries):
+        if kept[index]:
+            kept_questions[quiz_index].append(question)
+    deduplicated = [(Quiz(questions=questions), filename) for questions, (_, filename) in zip(kept_questions, quizzes)]
+    return deduplicated, dropped
+
+class DuplicateDetector:
+    """Class for detecting duplicate documents within a batch and against previously processed documents"""
+
+    def __init__(self, db_path: str, threshold: float = 0.8):
+        """Initialize the detector
+
+        Args:
+            db_path (str): The path of the SQLite database of processed documents
+            threshold (float): minimum estimated Jaccard similarity of near-duplicate documents
+        """
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                language TEXT NOT NULL,
+                model TEXT NOT NULL,
+                pipeline TEXT NOT NULL,
+                name TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                quiz TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (content_hash, language, model, pipeline);
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                bucket TEXT NOT NULL,
+                document_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (bucket);
+        """)
+        self._conn.commit()
+
+    def find_in_batch(self, fingerprints: List[DocumentFingerprint]) -> List[Optional[int]]:
+        """Find the documents of a batch that duplicate an earlier document of the same batch
+
+        Args:
+            fingerprints (List[DocumentFingerprint]): The fingerprints of the batch, in input order
+
+        Returns:
+            List[Optional[int]]: for each document, the index of the earlier document it duplicates, or None
+        """
+        duplicate_of: List[Optional[int]] = [None] * len(fingerprints)
+        first_by_hash = {}
+        buckets = {}
+        for index, fingerprint in enumerate(fingerprints):
+            if fingerprint.content_hash in first_by_hash:
+                duplicate_of[index] = first_by_hash[fingerprint.content_hash]
+                continue
+            first_by_hash[fingerprint.content_hash] = index
+
+            document_buckets = lsh_buckets(fingerprint.signature)
+            candidates = sorted({candidate for bucket in document_buckets for candidate in buckets.get(bucket, ())})
+            for candidate in candidates:
+                if estimate_similarity(fingerprint.signature, fingerprints[candidate].signature) >= self.threshold:
+                    duplicate_of[index] = candidate
+                    break
+            else:
+                # only unique documents are indexed, duplicates point to their original
+                for bucket in document_buckets:
+                    buckets.setdefault(bucket, []).append(index)
+        return duplicate_of
+
+    def find_previous(
+        self,
+        fingerprint: DocumentFingerprint,
+        language: str,
+        model: str,
+        pipeline: str
+    ) -> Optional[Tuple[str, Quiz]]:
+        """Find a previously processed document duplicated by a new one
+
+        Args:
+            fingerprint (DocumentFingerprint): The fingerprint of the new document
+            language (str): The quiz language, quizzes in other languages are not reused
+            model (str): The model of the quiz, quizzes of other models are not reused
+            pipeline (str): The pipeline of the quiz, quizzes of other pipelines are not reused
+
+        Returns:
+            Optional[Tuple[str, Quiz]]: the name and quiz of the previous document, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT name, quiz FROM documents
+                   WHERE content_hash = ? AND language = ? AND model = ? AND pipeline = ?
+                   ORDER BY id DESC LIMIT 1""",
+                (fingerprint.content_hash, language, model, pipeline)
+            ).fetchone()
+            if row is None:
+                buckets = lsh_buckets(fingerprint.signature)
+                placeholders = ",".join("?" * len(buckets))
+                candidates = self._conn.execute(
+                    f"""SELECT DISTINCT d.id, d.name, d.quiz, d.signature FROM lsh_buckets b
+                        JOIN documents d ON d.id = b.document_id
+                        WHERE b.bucket IN ({placeholders}) AND d.language = ? AND d.model = ? AND d.pipeline = ?
+                        ORDER BY d.id DESC""",
+                    (*buckets, language, model, pipeline)
+                ).fetchall()
+                for _, name, quiz, signature in candidates:
+                    if estimate_similarity(fingerprint.signature, np.frombuffer(signature, dtype=np.uint64)) >= self.threshold:
+                        row = (name, quiz)
+                        break
+        if row is None:
+            return None
+        return row[0], Quiz.model_validate_json(row[1])
+
+    def add(self, fingerprint: DocumentFingerprint, language: str, model: str, pipeline: str, name: str, quiz: Quiz) -> None:
+        """Index a processed document and its quiz
+
+        Args:
+            fingerprint (DocumentFingerprint): The fingerprint of the document
+            language (str): The quiz language
+            model (str): The model that generated the quiz
+            pipeline (str): The pipeline that generated the quiz
+            name (str): The name of the document
+            quiz (Quiz): The quiz generated for the document
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                """INSERT INTO documents (content_hash, language, model, pipeline, name, signature, quiz, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (fingerprint.content_hash, language, model, pipeline, name, fingerprint.signature.tobytes(), quiz.model_dump_json(), time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO lsh_buckets (bucket, document_id) VALUES (?, ?)",
+                [(bucket, cursor.lastrowid) for bucket in lsh_buckets(fingerprint.signature)]
+            )
+            self._conn.commit()
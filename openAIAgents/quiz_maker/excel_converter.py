@@ -2,205 +2,233 @@ import os
 import logging
 import traceback
 import io
-import pandas as pd
-from typing import List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
 from models import Quiz
 
+# columns of the quiz sheets, "Source" is only written when requested
+QUIZ_COLUMNS = ['Question Number', 'Theme', 'Question', 'Answer Option', 'Answer Text', 'Score']
+SOURCE_COLUMN = 'Source'
+
+# maximum width of a column
+MAX_COLUMN_WIDTH = 50
+
 class QuizExcelConverter:
     """Class for converting quiz JSON files to Excel format"""
-    
+
     def __init__(self, base_dir):
         """Initialize the converter
-        
+
         Args:
             base_dir (str): The base directory for the application
         """
         self.excel_output_dir = os.path.join(base_dir, "excel_question_answers")
         os.makedirs(self.excel_output_dir, exist_ok=True)
-    
-    def json_to_excel(self, quiz: Quiz, filename: str) -> str:
-        """Convert a quiz object to Excel format
+
+    @staticmethod
+    def _iter_quiz_rows(quizzes: Iterable[Tuple[Quiz, str]], include_source: bool) -> Iterator[list]:
+        """Generate the sheet rows of one or more quizzes, numbering questions sequentially
+
+        Args:
+            quizzes (Iterable[Tuple[Quiz, str]]): (Quiz, filename) tuples
+            include_source (bool): whether to add the source filename column
+
+        Yields:
+            list: the values of each row, one row per question followed by one row per answer,
+            empty cells are None so that the write-only sheet skips them
+        """
+        question_counter = 1  # global counter for question numbers
+
+        for quiz, filename in quizzes:
+            for question in quiz.questions:
+                # question
+                row = [question_counter, question.theme, question.question_text, None, None, None]
+                if include_source:
+                    row.append(filename)
+                yield row
+
+                # answers
+                for j, answer in enumerate(question.answers, 1):
+                    row = [None, None, None, f"Option {j}", answer.text, answer.score]
+                    if include_source:
+                        row.append(None)
+                    yield row
+
+                question_counter += 1
+
+    @staticmethod
+    def _write_sheet(workbook, rows: Callable[[], Iterator[list]], columns: List[str], sheet_name: str) -> None:
+        """Add a sheet to a write-only workbook in constant memory
+
+        Column widths have to be set before the first row of a write-only sheet,
+        so the rows are generated twice: once to measure them and once to write them.
+
+        Args:
+            workbook (Workbook): a write-only workbook
+            rows (Callable[[], Iterator[list]]): returns a new iterator over the rows
+            columns (List[str]): the header of the sheet
+            sheet_name (str): the name of the sheet
+        """
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        from openpyxl.utils import get_column_letter
         
+        widths = [len(column) for column in columns]
+        for row in rows():
+            for i, value in enumerate(row):
+                if value is not None:
+                    widths[i] = max(widths[i], len(str(value)))
+
+        worksheet = workbook.create_sheet(sheet_name)
+        for i, width in enumerate(widths, 1):
+            worksheet.column_dimensions[get_column_letter(i)].width = min(width + 2, MAX_COLUMN_WIDTH)  # Limit width to 50
+
+        header_font = Font(bold=True)
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=column)
+            cell.font = header_font
+            header.append(cell)
+        worksheet.append(header)
+
+        for row in rows():
+            worksheet.append(row)
+
+    @classmethod
+    def _render_workbook(cls, rows: Callable[[], Iterator[list]], columns: List[str], sheet_name: str, output) -> None:
+        """Write rows to a single sheet write-only workbook in constant memory
+
+        Args:
+            rows (Callable[[], Iterator[list]]): returns a new iterator over the rows
+            columns (List[str]): the header of the sheet
+            sheet_name (str): the name of the sheet
+            output: a file path or a binary file object to save the workbook to
+        """
+        # imported on first export, openpyxl is not needed to start the app
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        cls._write_sheet(workbook, rows, columns, sheet_name)
+        workbook.save(output)
+
+    def render_quizzes(self, quizzes: List[Tuple[Quiz, str]], include_source: bool, sheet_name: str) -> io.BytesIO:
+        """Render one or more quizzes to an in-memory Excel file
+
+        Args:
+            quizzes (List[Tuple[Quiz, str]]): list of (Quiz, filename) tuples
+            include_source (bool): whether to add the source filename column
+            sheet_name (str): the name of the sheet
+
+        Returns:
+            io.BytesIO: a buffer containing the Excel file
+        """
+        columns = QUIZ_COLUMNS + [SOURCE_COLUMN] if include_source else QUIZ_COLUMNS
+        buffer = io.BytesIO()
+        self._render_workbook(lambda: self._iter_quiz_rows(quizzes, include_source), columns, sheet_name, buffer)
+        buffer.seek(0)
+        return buffer
+
+    def export_quiz(self, quiz: Quiz, filename: str) -> Tuple[str, io.BytesIO]:
+        """Render a quiz once, save it to the Excel output directory and return it for download
+
         Args:
             quiz (Quiz): the quiz object to convert
             filename (str): the base filename to use for the Excel file
-            
+
         Returns:
-            str: the path to the created Excel file
+            Tuple[str, io.BytesIO]: the path of the created Excel file and a buffer with its content
         """
         try:
             excel_path = os.path.join(self.excel_output_dir, f"{filename}_quiz.xlsx")
-            
-            # DataFrame to store the quiz
-            data = []
-            
-            # add each question and its answers to the DataFrame
-            for i, question in enumerate(quiz.questions, 1):
-                # question
-                data.append({
-                    'Question Number': i,
-                    'Theme': question.theme,
-                    'Question': question.question_text,
-                    'Answer Option': '',
-                    'Answer Text': '',
-                    'Score': '',
-                    'Source': filename
-                })
-                
-                # answers
-                for j, answer in enumerate(question.answers, 1):
-                    data.append({
-                        'Question Number': '',
-                        'Theme': '',
-                        'Question': '',
-                        'Answer Option': f"Option {j}",
-                        'Answer Text': answer.text,
-                        'Score': answer.score,
-                        'Source': ''
-                    })
-            
-            df = pd.DataFrame(data)
-            
-            # write to Excel
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Quiz')
-                
-                # column widths
-                workbook = writer.book
-                worksheet = workbook.active
-                for i, col in enumerate(df.columns):
-                    column_width = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.column_dimensions[chr(65 + i)].width = min(column_width, 50)  # Limit width to 50
-            
-            return excel_path
-            
+            buffer = self.render_quizzes([(quiz, filename)], include_source=True, sheet_name='Quiz')
+
+            with open(excel_path, "wb") as f:
+                f.write(buffer.getbuffer())
+
+            return excel_path, buffer
+
         except Exception as e:
             logging.error(f"Error converting quiz to Excel: {str(e)}")
             logging.error(traceback.format_exc())
-            return ""
-    
+            return "", io.BytesIO()
+
+    def export_quiz_languages(self, quizzes: Dict[str, Quiz], filename: str) -> Tuple[str, io.BytesIO]:
+        """Save the quizzes of one document in several languages to a single Excel file, one sheet per language
+
+        Args:
+            quizzes (Dict[str, Quiz]): the quiz of each language
+            filename (str): the base filename to use for the Excel file
+
+        Returns:
+            Tuple[str, io.BytesIO]: the path of the created Excel file and a buffer with its content
+        """
+        try:
+            from openpyxl import Workbook
+
+            excel_path = os.path.join(self.excel_output_dir, f"{filename}_quizzes.xlsx")
+            workbook = Workbook(write_only=True)
+            for language, quiz in quizzes.items():
+                # sheet names are limited to 31 characters
+                self._write_sheet(
+                    workbook, lambda quiz=quiz: self._iter_quiz_rows([(quiz, filename)], include_source=False),
+                    QUIZ_COLUMNS, language[:31]
+                )
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+            buffer.seek(0)
+
+            with open(excel_path, "wb") as f:
+                f.write(buffer.getbuffer())
+
+            return excel_path, buffer
+
+        except Exception as e:
+            logging.error(f"Error converting quizzes to Excel: {str(e)}")
+            logging.error(traceback.format_exc())
+            return "", io.BytesIO()
+
+    def json_to_excel(self, quiz: Quiz, filename: str) -> str:
+        """Convert a quiz object to Excel format
+
+        Args:
+            quiz (Quiz): the quiz object to convert
+            filename (str): the base filename to use for the Excel file
+
+        Returns:
+            str: the path to the created Excel file
+        """
+        excel_path, _ = self.export_quiz(quiz, filename)
+        return excel_path
+
     def get_excel_download_buffer(self, quiz: Quiz) -> io.BytesIO:
         """Get a BytesIO buffer containing the Excel file for download
-        
+
         Args:
             quiz (Quiz): the quiz object to convert
-            
+
         Returns:
             io.BytesIO: a buffer containing the Excel file
         """
         try:
-            buffer = io.BytesIO()
-            
-            # DataFrame to store the quiz
-            data = []
-            
-            # add each question and its answers to the DataFrame
-            for i, question in enumerate(quiz.questions, 1):
-                # question
-                data.append({
-                    'Question Number': i,
-                    'Theme': question.theme,
-                    'Question': question.question_text,
-                    'Answer Option': '',
-                    'Answer Text': '',
-                    'Score': ''
-                })
-                
-                # answers
-                for j, answer in enumerate(question.answers, 1):
-                    data.append({
-                        'Question Number': '',
-                        'Theme': '',
-                        'Question': '',
-                        'Answer Option': f"Option {j}",
-                        'Answer Text': answer.text,
-                        'Score': answer.score
-                    })
-            
-            # DataFrame
-            df = pd.DataFrame(data)
-            
-            # write to Excel buffer
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Quiz')
-                
-                # column widths
-                workbook = writer.book
-                worksheet = workbook.active
-                for i, col in enumerate(df.columns):
-                    column_width = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.column_dimensions[chr(65 + i)].width = min(column_width, 50)  # Limit width to 50
-            
-            buffer.seek(0)
-            return buffer
-            
+            return self.render_quizzes([(quiz, '')], include_source=False, sheet_name='Quiz')
+
         except Exception as e:
             logging.error(f"Error creating Excel download buffer: {str(e)}")
             logging.error(traceback.format_exc())
             return io.BytesIO()
-    
+
     def combine_quizzes_to_excel(self, quizzes: List[Tuple[Quiz, str]]) -> io.BytesIO:
         """Combine multiple quizzes into a single Excel file
-        
+
         Args:
             quizzes (List[Tuple[Quiz, str]]): list of (Quiz, filename) tuples
-            
+
         Returns:
             io.BytesIO: a buffer containing the combined Excel file
         """
         try:
-            buffer = io.BytesIO()
-            
-            # DataFrame to store all quizzes
-            all_data = []
-            
-            # process each quiz
-            question_counter = 1  # global counter for question numbers
-            
-            for quiz, _ in quizzes: 
-                # add each question and its answers to the df
-                for question in quiz.questions:
-                    # question
-                    all_data.append({
-                        'Question Number': question_counter,
-                        'Theme': question.theme,
-                        'Question': question.question_text,
-                        'Answer Option': '',
-                        'Answer Text': '',
-                        'Score': ''
-                    })
-                    
-                    # answers
-                    for j, answer in enumerate(question.answers, 1):
-                        all_data.append({
-                            'Question Number': '',
-                            'Theme': '',
-                            'Question': '',
-                            'Answer Option': f"Option {j}",
-                            'Answer Text': answer.text,
-                            'Score': answer.score
-                        })
-                    
-                    # question counter after adding all answers
-                    question_counter += 1
-            
-            df = pd.DataFrame(all_data)
-            
-            # Write to Excel buffer
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Combined Quiz')
-                
-                # column widths
-                workbook = writer.book
-                worksheet = workbook.active
-                for i, col in enumerate(df.columns):
-                    column_width = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.column_dimensions[chr(65 + i)].width = min(column_width, 50)  # Limit width to 50
-            
-            buffer.seek(0)
-            return buffer
-            
+            return self.render_quizzes(quizzes, include_source=False, sheet_name='Combined Quiz')
+
         except Exception as e:
             logging.error(f"Error creating combined Excel file: {str(e)}")
             logging.error(traceback.format_exc())
-            return io.BytesIO() 
\ No newline at end of file
+            return io.BytesIO()
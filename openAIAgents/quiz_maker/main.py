@@ -1,32 +1,291 @@
 import os
-import json
+import uuid
+import queue
+import hashlib
 import logging
+import importlib
+import threading
 import traceback
 import asyncio
-import nest_asyncio
+import concurrent.futures
 import streamlit as st
 from dotenv import load_dotenv
 from excel_converter import QuizExcelConverter
-from ai_agent import QuizGenerator
+from ai_agent import QuizGenerator, PIPELINES
+from cache import AgentResultCache
+from metrics import MetricsRecorder
+from scheduler import configure_openai_client
+from dedup import DuplicateDetector, fingerprint_texts, deduplicate_questions
+from artifact_store import ArtifactStore, KIND_RAW_TEXT, KIND_QUIZ
+from question_bank import QuestionBank
 from utils import (
     setup_logging, 
-    setup_directories, 
-    extract_text_from_pdf, 
-    save_text_to_file, 
-    extract_text_from_url, 
+    extract_text_from_pdf_bytes, 
     get_filename_from_url
 )
+from url_fetcher import UrlFetcher
 
 load_dotenv()
 
-nest_asyncio.apply()
-
 # logging
 log_filename = setup_logging()
 
+# agent run metrics, as JSON lines next to the log files
+METRICS_PATH = os.path.join(os.path.dirname(log_filename), "agent_metrics.jsonl")
+
 # directories
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-RAW_TEXT_DIR, SUMMARY_TEXT_DIR, JSON_OUTPUT_DIR = setup_directories(BASE_DIR)
+
+# raw texts, summaries, quizzes and run metadata
+ARTIFACTS_DB_PATH = os.path.join(BASE_DIR, "cache", "artifacts.sqlite")
+
+# default number of documents processed concurrently
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("QUIZ_MAX_CONCURRENCY", "4"))
+
+# texts longer than this many tokens are summarized in concurrent chunks
+CHUNK_TOKENS = int(os.getenv("QUIZ_CHUNK_TOKENS", "12000"))
+
+# texts up to this many tokens get their summary and quiz from a single call in "auto" pipeline mode
+DIRECT_MAX_TOKENS = int(os.getenv("QUIZ_DIRECT_MAX_TOKENS", "6000"))
+
+# local cache of fetched urls and maximum number of simultaneous connections
+HTTP_CACHE_DIR = os.path.join(BASE_DIR, "cache", "http")
+URL_MAX_CONNECTIONS = int(os.getenv("QUIZ_URL_MAX_CONNECTIONS", "16"))
+
+# on-disk cache of summaries and quizzes
+CACHE_DB_PATH = os.path.join(BASE_DIR, "cache", "agent_results.sqlite")
+CACHE_MAX_SIZE_MB = float(os.getenv("QUIZ_CACHE_MAX_MB", "256"))
+
+# fingerprints of processed documents, and similarity above which documents are duplicates
+FINGERPRINTS_DB_PATH = os.path.join(BASE_DIR, "cache", "fingerprints.sqlite")
+DUPLICATE_THRESHOLD = float(os.getenv("QUIZ_DUPLICATE_THRESHOLD", "0.8"))
+
+# every generated question, indexed for reuse on documents covering the same themes
+QUESTION_BANK_PATH = os.path.join(BASE_DIR, "cache", "question_bank.sqlite")
+
+# similarity above which questions of the combined excel file are duplicates
+QUESTION_DUPLICATE_THRESHOLD = float(os.getenv("QUIZ_QUESTION_DUPLICATE_THRESHOLD", "0.7"))
+
+# number of extracted pdf texts kept in memory across reruns and sessions
+EXTRACTION_CACHE_ENTRIES = int(os.getenv("QUIZ_EXTRACTION_CACHE_ENTRIES", "64"))
+
+# seconds between two progress refreshes while the event loop works
+PROGRESS_REFRESH_INTERVAL = 0.2
+
+# heavy dependencies imported in the background after the first render, instead of on the first click
+WARM_UP_MODULES = ["agents", "openpyxl", "pypdf", "html2text"]
+
+@st.cache_resource
+def warm_up():
+    """Import the heavy dependencies in a background thread, once per process"""
+    def import_modules():
+        for name in WARM_UP_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logging.error(f"Error importing {name}: {str(e)}")
+    
+    threading.Thread(target=import_modules, name="quiz-warm-up", daemon=True).start()
+
+@st.cache_resource
+def get_event_loop():
+    """Start the event loop shared by all sessions in a background thread
+    
+    Clients created by the agents stay bound to a single loop, and work already sent
+    to the loop completes (and fills the caches) even if a rerun interrupts the script.
+    
+    Returns:
+        asyncio.AbstractEventLoop: the running loop
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="quiz-event-loop", daemon=True).start()
+    return loop
+
+def run_async(coro, refresh=None):
+    """Run a coroutine on the shared event loop and wait for its result
+    
+    Args:
+        coro (Coroutine): the coroutine to run
+        refresh (Callable, optional): called periodically from the script thread while waiting,
+            to update streamlit elements that cannot be updated from the loop thread
+    
+    Returns:
+        the result of the coroutine
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    while True:
+        try:
+            result = future.result(timeout=PROGRESS_REFRESH_INTERVAL)
+        except concurrent.futures.TimeoutError:
+            if refresh:
+                refresh()
+            continue
+        if refresh:
+            refresh()
+        return result
+
+@st.cache_resource
+def configure_agents():
+    """Hand the retries of model requests to the rate limit schedulers, once per process"""
+    configure_openai_client()
+
+@st.cache_resource
+def get_excel_converter():
+    return QuizExcelConverter(BASE_DIR)
+
+@st.cache_resource
+def get_agent_cache(bypass):
+    return AgentResultCache(CACHE_DB_PATH, max_size_mb=CACHE_MAX_SIZE_MB, bypass=bypass)
+
+@st.cache_resource
+def get_duplicate_detector():
+    return DuplicateDetector(FINGERPRINTS_DB_PATH, threshold=DUPLICATE_THRESHOLD)
+
+@st.cache_resource
+def get_artifact_store():
+    return ArtifactStore(ARTIFACTS_DB_PATH)
+
+@st.cache_resource
+def get_question_bank():
+    return QuestionBank(QUESTION_BANK_PATH)
+
+@st.cache_resource
+def get_url_fetcher():
+    return UrlFetcher(HTTP_CACHE_DIR, max_connections=URL_MAX_CONNECTIONS)
+
+@st.cache_data(max_entries=EXTRACTION_CACHE_ENTRIES, show_spinner=False)
+def extract_pdf_text(content_hash, _pdf_bytes):
+    """Extract the text of an uploaded pdf, once per content across reruns and sessions
+    
+    Args:
+        content_hash (str): sha256 of the pdf bytes, the cache key
+        _pdf_bytes (bytes): the pdf file, not hashed by streamlit
+    
+    Returns:
+        str: the extracted text
+    """
+    return extract_text_from_pdf_bytes(_pdf_bytes)
+
+def result_key(text, model, language, pipeline):
+    """Key of a generated quiz in the session results
+    
+    Args:
+        text (str): the extracted text
+        model (str): the model used
+        language (str): the quiz language
+        pipeline (str): the pipeline mode
+    
+    Returns:
+        str: a key that changes whenever the text or a setting affecting the quiz changes
+    """
+    return f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}:{model}:{language}:{pipeline}"
+
+def question_markdown(number, question):
+    """Format a question and its scored answers
+    
+    Args:
+        number (int): the number of the question, starting from 1
+        question (Question): the question
+    
+    Returns:
+        str: the question as markdown
+    """
+    answers = "\n".join(f"- ({answer.score} points) {answer.text}" for answer in question.answers)
+    return f"**question {number}:** {question.question_text}\n\n{answers}"
+
+def render_quiz(entry, combine_excel, excel_converter):
+    """Display a generated quiz in streamlit
+    
+    Args:
+        entry (dict): the result of one document, with its quiz, base filename, display name
+            and the document it duplicates, if any
+        combine_excel (bool): whether the quiz goes only into the combined excel file
+        excel_converter (QuizExcelConverter): the converter used for excel outputs
+    """
+    quiz = entry["quiz"]
+    base_filename = entry["base_filename"]
+    
+    if entry["reused_from"]:
+        st.info(f"Duplicate of {entry['reused_from']}, its quiz was reused")
+    else:
+        # notify about summary
+        st.info(f"Summary and quiz of {base_filename} stored in: {ARTIFACTS_DB_PATH}")
+    
+    if not combine_excel:
+        # convert to excel (individual file) once, reruns reuse the rendered file
+        if "excel" not in entry:
+            excel_path, excel_buffer = excel_converter.export_quiz(quiz, base_filename)
+            entry["excel"] = (excel_path, excel_buffer.getvalue())
+        excel_path, excel_data = entry["excel"]
+        if excel_path:
+            st.info(f"Excel quiz saved in: {excel_path}")
+            
+            # download button
+            st.download_button(
+                label=f"Download {base_filename} Quiz (Excel)",
+                data=excel_data,
+                file_name=f"{base_filename}_quiz.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key=f"download_{entry['id']}"
+            )
+    
+    # display quiz in streamlit
+    st.write(f"### quiz for {entry['display_name']}")
+    for question_index, question in enumerate(quiz.questions, 1):
+        st.write(question_markdown(question_index, question))
+    
+    st.write("---")
+
+def render_combined_excel(batch, dedupe_questions, excel_converter):
+    """Display the combined excel file of a batch, rendering it once per option
+    
+    Args:
+        batch (dict): the last generated batch
+        dedupe_questions (bool): whether near-duplicate questions are removed
+        excel_converter (QuizExcelConverter): the converter used for excel outputs
+    """
+    all_quizzes = [(entry["quiz"], entry["base_filename"]) for entry in batch["entries"] if entry["quiz"]]
+    if not all_quizzes:
+        return
+    
+    combined = batch["combined"]
+    if dedupe_questions not in combined:
+        dropped = []
+        if dedupe_questions:
+            all_quizzes, dropped = deduplicate_questions(all_quizzes, QUESTION_DUPLICATE_THRESHOLD)
+        combined_buffer = excel_converter.combine_quizzes_to_excel(all_quizzes)
+        
+        # also save to file system
+        combined_path = os.path.join(excel_converter.excel_output_dir, "quiz.xlsx")
+        with open(combined_path, "wb") as f:
+            f.write(combined_buffer.getbuffer())
+        combined[dedupe_questions] = (combined_buffer.getvalue(), dropped, combined_path)
+    combined_data, dropped, combined_path = combined[dedupe_questions]
+    
+    if dropped:
+        with st.expander(f"{len(dropped)} duplicate questions removed from the combined file"):
+            st.dataframe(
+                [
+                    {
+                        "Removed question": item.question.question_text,
+                        "Source": item.source,
+                        "Kept question": item.kept_question.question_text,
+                        "Kept from": item.kept_source,
+                        "Similarity": round(item.similarity, 2),
+                    }
+                    for item in dropped
+                ],
+                use_container_width=True
+            )
+    
+    # download button for combined file
+    st.download_button(
+        label="Download Combined Quiz (Excel)",
+        data=combined_data,
+        file_name="quiz.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    st.info(f"Sequential numbered quiz saved in: {combined_path}")
 
 def main():
     st.title("Quiz Generator")
@@ -35,7 +294,7 @@ def main():
     Instructions:
     1. Upload PDF files or enter a list of URLs to generate quizzes from
     2. Files are analyzed and summarized
-    3. Quizzes are generated in JSON format and available in Excel format for download
+    3. Texts, summaries and quizzes are saved in the artifact store, quizzes are available in Excel format for download
     """)
     
     st.write("---")
@@ -48,13 +307,13 @@ def main():
             "upload pdf files", 
             type="pdf", 
             accept_multiple_files=True,
-            help="you can upload multiple pdf files. they will be processed one at a time."
+            help="you can upload multiple pdf files. they will be processed concurrently."
         )
     
     with tab2:
         urls = st.text_area(
             "enter urls (one per line)",
-            help="enter multiple urls, one per line. they will be processed one at a time."
+            help="enter multiple urls, one per line. they will be processed concurrently."
         )
         urls_list = [url.strip() for url in urls.split('\n') if url.strip()]
         
@@ -74,9 +333,57 @@ def main():
         index=0  # default English
     )
     
+    # pipeline selection
+    pipeline = st.selectbox(
+        "Select pipeline:",
+        PIPELINES,
+        index=0,  # default auto
+        help="two_stage summarizes then writes the quiz from the summary, direct does both in a single call, "
+             "auto uses direct for short documents."
+    )
+    
     # option for combined excel file
     combine_excel = st.checkbox("Create a single Excel file with all quizzes", value=True)
     
+    # option to drop repeated questions from the combined file
+    dedupe_questions = st.checkbox(
+        "Remove near-duplicate questions from the combined file",
+        value=True,
+        disabled=not combine_excel,
+        help="questions with nearly the same text and answers are kept once, the most complete instance is kept."
+    )
+    
+    # number of documents processed at the same time
+    max_concurrency = st.number_input(
+        "Documents processed concurrently:",
+        min_value=1,
+        max_value=32,
+        value=DEFAULT_MAX_CONCURRENCY,
+        help="documents are summarized and turned into quizzes in parallel, up to this limit."
+    )
+    
+    # option to stream the questions while the quizzes are generated
+    stream_questions = st.checkbox(
+        "Show questions as they are generated",
+        value=True,
+        help="each question is displayed as soon as the model completes it, the full quizzes follow at the end."
+    )
+    
+    # option to reuse banked questions
+    use_question_bank = st.checkbox(
+        "Reuse questions from the question bank",
+        value=True,
+        help="questions generated for other documents are reused when the document covers their theme, "
+             "only the missing questions are generated."
+    )
+    
+    # option to bypass the cache of previous results
+    use_cache = st.checkbox(
+        "Reuse cached results for unchanged documents",
+        value=True,
+        help="uncheck to regenerate summaries and quizzes even if the same or a nearly identical text was already processed."
+    )
+    
     st.write("---")
     
     # verify api key
@@ -84,189 +391,244 @@ def main():
         st.error("set OPENAI_API_KEY")
         return
     
+    excel_converter = get_excel_converter()
+    
+    # quizzes generated in this session by content hash and settings, they survive reruns
+    session_results = st.session_state.setdefault("quiz_results", {})
+    
     if st.button("Generate Quiz"):
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        # create event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        configure_agents()
+        metrics = MetricsRecorder(METRICS_PATH)
+        duplicate_detector = get_duplicate_detector()
+        store = get_artifact_store()
+        store.start_run(metrics.batch_id, source="streamlit", model=model, language=language, pipeline=pipeline)
+        quiz_generator = QuizGenerator(
+            model,
+            cache=get_agent_cache(not use_cache),
+            chunk_tokens=CHUNK_TOKENS,
+            metrics=metrics,
+            pipeline=pipeline,
+            direct_max_tokens=DIRECT_MAX_TOKENS,
+            store=store,
+            question_bank=get_question_bank() if use_question_bank else None
+        )
         
-        excel_converter = QuizExcelConverter(BASE_DIR)
-        quiz_generator = QuizGenerator(model, SUMMARY_TEXT_DIR)
+        # documents to process as (text, filename, display name)
+        documents = []
         
-        # store all quizzes for combined export
-        all_quizzes = []
+        # result of each document, in input order
+        batch_id = uuid.uuid4().hex
+        entries = []
         
         try:
-            # process pdfs if present
+            # extract text from pdfs if present
             if uploaded_files:
                 total_files = len(uploaded_files)
                 for file_index, pdf_file in enumerate(uploaded_files):
-                    status_text.text(f"processing pdf {file_index+1} of {total_files}: {pdf_file.name}")
-                    progress_bar.progress(file_index / total_files)
+                    status_text.text(f"extracting pdf {file_index+1} of {total_files}: {pdf_file.name}")
                     
-                    # temporary save of uploaded file
-                    temp_path = f"temp_{pdf_file.name}"
-                    with open(temp_path, "wb") as f:
-                        f.write(pdf_file.getbuffer())
+                    # extract text from the uploaded bytes, once per file content
+                    pdf_bytes = pdf_file.getvalue()
+                    pdf_text = extract_pdf_text(hashlib.sha256(pdf_bytes).hexdigest(), pdf_bytes)
+                    if not pdf_text:
+                        st.error(f"impossible to extract text from {pdf_file.name}")
+                        continue
                     
-                    try:
-                        # extract text from pdf
-                        pdf_text = extract_text_from_pdf(temp_path)
-                        if not pdf_text:
-                            st.error(f"impossible to extract text from {pdf_file.name}")
-                            continue
-                        
-                        # save raw text
-                        base_filename = pdf_file.name.replace('.pdf', '')
-                        raw_text_path = os.path.join(RAW_TEXT_DIR, f"{base_filename}.txt")
-                        save_text_to_file(pdf_text, raw_text_path)
-                        
-                        # process text with agents
-                        quiz, base_filename = loop.run_until_complete(
-                            quiz_generator.create_quiz_from_text(pdf_text, pdf_file.name, language)
-                        )
-                        
-                        if quiz:
-                            # save quiz for combined export
-                            all_quizzes.append((quiz, base_filename))
-                            
-                            # save quiz in json
-                            output_path = os.path.join(JSON_OUTPUT_DIR, f"{base_filename}_quiz.json")
-                            with open(output_path, "w") as f:
-                                json.dump(quiz.model_dump(), f, indent=2, ensure_ascii=False)
-                            
-                            # notify about summary
-                            st.info(f"Summary saved in: {os.path.join(SUMMARY_TEXT_DIR, f'{base_filename}_summary.txt')}")
-                            
-                            if not combine_excel:
-                                # convert to excel (individual file)
-                                excel_path = excel_converter.json_to_excel(quiz, base_filename)
-                                if excel_path:
-                                    st.info(f"Excel quiz saved in: {excel_path}")
-                                    
-                                    # download button
-                                    excel_buffer = excel_converter.get_excel_download_buffer(quiz)
-                                    st.download_button(
-                                        label=f"Download {base_filename} Quiz (Excel)",
-                                        data=excel_buffer,
-                                        file_name=f"{base_filename}_quiz.xlsx",
-                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                    )
-                            
-                            # display quiz in streamlit
-                            st.write(f"### quiz for {base_filename}")
-                            for question_index, question in enumerate(quiz.questions, 1):
-                                st.write(f"\n**question {question_index}:** {question.question_text}")
-                                for answer in question.answers:
-                                    st.write(f"- ({answer.score} points) {answer.text}")
-                            
-                            st.write("---")
+                    # store raw text
+                    base_filename = pdf_file.name.replace('.pdf', '')
+                    store.add(KIND_RAW_TEXT, pdf_text, ArtifactStore.source_hash(pdf_text), base_filename, run_id=metrics.batch_id)
                     
-                    finally:
-                        # cleanup temporary file
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
+                    documents.append((pdf_text, pdf_file.name, base_filename))
             
-            # process urls if present
+            # fetch and extract text from urls concurrently if present
             if urls_list:
                 total_urls = len(urls_list)
-                for url_index, url in enumerate(urls_list):
-                    status_text.text(f"processing url {url_index+1} of {total_urls}: {url}")
-                    progress_bar.progress(url_index / total_urls)
+                fetched = []
+                status_text.text(f"fetching {total_urls} urls...")
+                
+                def on_url_fetched(index, text):
+                    # runs in the event loop thread, the script thread displays the progress
+                    fetched.append(index)
+                
+                def show_fetch_progress():
+                    if fetched:
+                        status_text.text(f"fetched url {len(fetched)} of {total_urls}: {urls_list[fetched[-1]]}")
+                
+                url_texts = run_async(
+                    get_url_fetcher().fetch_texts(urls_list, on_complete=on_url_fetched),
+                    refresh=show_fetch_progress
+                )
+                
+                for url, url_text in zip(urls_list, url_texts):
+                    if not url_text:
+                        st.error(f"impossible to extract text from {url}")
+                        continue
                     
-                    try:
-                        # extract text from url
-                        url_text = extract_text_from_url(url)
-                        if not url_text:
-                            st.error(f"impossible to extract text from {url}")
-                            continue
-                        
-                        # extract filename from url
-                        base_filename = get_filename_from_url(url)
-                        
-                        # save raw text
-                        raw_text_path = os.path.join(RAW_TEXT_DIR, f"{base_filename}.txt")
-                        save_text_to_file(url_text, raw_text_path)
-                        
-                        # process text with agents
-                        quiz, base_filename = loop.run_until_complete(
-                            quiz_generator.create_quiz_from_text(url_text, base_filename, language)
-                        )
-                        
-                        if quiz:
-                            # save quiz for combined export
-                            all_quizzes.append((quiz, base_filename))
-                            
-                            # save quiz in json
-                            output_path = os.path.join(JSON_OUTPUT_DIR, f"{base_filename}_quiz.json")
-                            with open(output_path, "w") as f:
-                                json.dump(quiz.model_dump(), f, indent=2, ensure_ascii=False)
-                            
-                            # notify about summary
-                            st.info(f"Summary saved in: {os.path.join(SUMMARY_TEXT_DIR, f'{base_filename}_summary.txt')}")
-                            
-                            if not combine_excel:
-                                # convert to excel (individual file)
-                                excel_path = excel_converter.json_to_excel(quiz, base_filename)
-                                if excel_path:
-                                    st.info(f"Excel quiz saved in: {excel_path}")
-                                    
-                                    # download button
-                                    excel_buffer = excel_converter.get_excel_download_buffer(quiz)
-                                    st.download_button(
-                                        label=f"Download {base_filename} Quiz (Excel)",
-                                        data=excel_buffer,
-                                        file_name=f"{base_filename}_quiz.xlsx",
-                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                    )
-                            
-                            # display quiz
-                            st.write(f"### quiz for {url}")
-                            for question_index, question in enumerate(quiz.questions, 1):
-                                st.write(f"\n**question {question_index}:** {question.question_text}")
-                                for answer in question.answers:
-                                    st.write(f"- ({answer.score} points) {answer.text}")
-                            
-                            st.write("---")
+                    # extract filename from url
+                    base_filename = get_filename_from_url(url)
+                    
+                    # store raw text
+                    store.add(KIND_RAW_TEXT, url_text, ArtifactStore.source_hash(url_text), base_filename, run_id=metrics.batch_id)
                     
-                    except Exception as e:
-                        st.error(f"error processing url {url}: {str(e)}")
-                        logging.error(f"error processing url {url}: {str(e)}")
-                        logging.error(traceback.format_exc())
+                    documents.append((url_text, base_filename, url))
             
-            # create combined excel file if requested and there are quizzes
-            if combine_excel and all_quizzes:
-                combined_buffer = excel_converter.combine_quizzes_to_excel(all_quizzes)
+            # process all documents with agents concurrently
+            if documents:
+                keys = [result_key(text, model, language, pipeline) for text, _, _ in documents]
                 
-                # download button for combined file
-                st.download_button(
-                    label="Download Combined Quiz (Excel)",
-                    data=combined_buffer,
-                    file_name="quiz.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                # documents duplicating an earlier document of the batch or a previously processed one reuse its quiz
+                status_text.text(f"looking for duplicates among {len(documents)} documents...")
+                fingerprints = fingerprint_texts([text for text, _, _ in documents])
+                duplicate_of = duplicate_detector.find_in_batch(fingerprints)
+                reused = {}
+                for index, fingerprint in enumerate(fingerprints):
+                    if duplicate_of[index] is not None or not use_cache:
+                        continue
+                    if keys[index] in session_results:
+                        # generated earlier in this session with the same settings
+                        reused[index] = (None, session_results[keys[index]])
+                        continue
+                    previous = duplicate_detector.find_previous(fingerprint, language, model, pipeline)
+                    if previous:
+                        reused[index] = previous
+                unique_indices = [index for index in range(len(documents)) if duplicate_of[index] is None and index not in reused]
+                
+                total_documents = len(unique_indices)
+                completed = []
+                status_text.text(f"generating quizzes for {total_documents} documents...")
+                progress_bar.progress(0.0)
+                
+                # questions streamed by the event loop thread, displayed by the script thread
+                streamed_questions = queue.SimpleQueue()
+                live_area = st.empty()
+                live_quizzes = live_area.container()
+                live_documents = {}
+                live_questions = {}
+                
+                def on_complete(index, result):
+                    # runs in the event loop thread, the script thread displays the progress
+                    completed.append(index)
+                
+                def on_question(index, question_index, question):
+                    streamed_questions.put((index, question_index, question))
+                
+                def show_streamed_questions():
+                    while not streamed_questions.empty():
+                        index, question_index, question = streamed_questions.get()
+                        if index not in live_documents:
+                            with live_quizzes:
+                                st.write(f"### quiz for {documents[unique_indices[index]][2]} (generating...)")
+                                live_documents[index] = st.container()
+                        # a retried run sends its questions again from the first one
+                        if (index, question_index) not in live_questions:
+                            live_questions[(index, question_index)] = live_documents[index].empty()
+                        live_questions[(index, question_index)].markdown(question_markdown(question_index + 1, question))
+                
+                def show_progress():
+                    show_streamed_questions()
+                    if completed:
+                        status_text.text(f"generated {len(completed)} of {total_documents}: {documents[unique_indices[completed[-1]]][2]}")
+                        progress_bar.progress(len(completed) / total_documents)
                 
-                # also save to file system
-                combined_path = os.path.join(excel_converter.excel_output_dir, "quiz.xlsx")
-                with open(combined_path, "wb") as f:
-                    f.write(combined_buffer.getbuffer())
-                st.info(f"Sequential numbered quiz saved in: {combined_path}")
+                unique_results = run_async(
+                    quiz_generator.create_quizzes_from_texts(
+                        [documents[index][:2] for index in unique_indices],
+                        language,
+                        max_concurrency=max_concurrency,
+                        on_complete=on_complete,
+                        on_question=on_question if stream_questions else None
+                    ),
+                    refresh=show_progress
+                ) if unique_indices else []
+                
+                # the complete quizzes are displayed below
+                live_area.empty()
+                results = dict(zip(unique_indices, unique_results))
+                
+                # remember the new quizzes for future duplicates
+                for index, (quiz, base_filename) in results.items():
+                    if quiz:
+                        duplicate_detector.add(fingerprints[index], language, model, pipeline, base_filename, quiz)
+                        session_results[keys[index]] = quiz
+                
+                # collect results in input order
+                quizzes = {}
+                for index, (text, filename, display_name) in enumerate(documents):
+                    reused_from = None
+                    if index in results:
+                        quiz, base_filename = results[index]
+                    else:
+                        base_filename = filename.replace('.pdf', '')
+                        if index in reused:
+                            reused_from, quiz = reused[index]
+                        else:
+                            # duplicates always point to an earlier document of the batch
+                            quiz = quizzes[duplicate_of[index]]
+                            reused_from = documents[duplicate_of[index]][2]
+                    quizzes[index] = quiz
+                    
+                    if not quiz:
+                        st.error(f"error generating quiz for {display_name}")
+                        continue
+                    
+                    if index not in results:
+                        # generated quizzes are stored by the generator, reused ones are recorded for this source too
+                        store.add(
+                            KIND_QUIZ, quiz.model_dump_json(), ArtifactStore.source_hash(text), base_filename,
+                            model=model, language=language, run_id=metrics.batch_id, metadata={"reused_from": reused_from}
+                        )
+                    entries.append({
+                        "id": f"{batch_id}_{len(entries)}",
+                        "quiz": quiz,
+                        "base_filename": base_filename,
+                        "display_name": display_name,
+                        "reused_from": reused_from
+                    })
             
+            store.finish_run(metrics.batch_id, documents=len(documents), quizzes=len(entries), metrics=metrics.summary())
             status_text.text("processing completed!")
             progress_bar.progress(1.0)
             
+            # the batch is displayed again on every rerun until the next generation
+            st.session_state["last_batch"] = {
+                "id": batch_id,
+                "entries": entries,
+                "combined": {},
+                "metrics": metrics.summary(),
+                "metrics_batch_id": metrics.batch_id
+            }
+            
+            st.success("all files have been processed!")
+            
         except Exception as e:
             st.error(f"an error occurred: {str(e)}")
             logging.error(f"error in main processing loop: {str(e)}")
             logging.error(traceback.format_exc())
-        
         finally:
-            # close event loop
-            loop.close()
+            # artifacts of the documents processed before an error are kept too
+            store.flush()
+    
+    # display the last batch, changing display options does not generate anything again
+    batch = st.session_state.get("last_batch")
+    if batch:
+        for entry in batch["entries"]:
+            render_quiz(entry, combine_excel, excel_converter)
+        
+        # create combined excel file if requested and there are quizzes
+        if combine_excel:
+            render_combined_excel(batch, dedupe_questions, excel_converter)
         
-        st.success("all files have been processed!")
+        # per-stage summary of the agent runs of the batch
+        if batch["metrics"]:
+            st.write(f"### agent runs (batch {batch['metrics_batch_id']})")
+            st.table(batch["metrics"])
+            st.info(f"Agent run metrics saved in: {METRICS_PATH}")
+    
+    # the page is rendered, load what the first generation needs
+    warm_up()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,140 @@
+import os
+import math
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+# USD price per million input and output tokens, used to estimate the cost of each run
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# name of the document being processed, inherited by the tasks spawned while processing it
+current_document: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_document", default=None)
+
+class AgentRunMetrics(BaseModel):
+    batch_id: str = Field(..., description="the batch the run belongs to")
+    document: Optional[str] = Field(None, description="the document being processed")
+    stage: str = Field(..., description="the pipeline stage (summary, chunk_summary, reduce_summary, quiz...)")
+    model: str = Field(..., description="the model used by the agent")
+    started_at: float = Field(..., description="unix timestamp of the start of the run")
+    wall_time_s: float = Field(..., description="duration of the run including retries, in seconds")
+    time_to_first_token_s: Optional[float] = Field(None, description="time until the first output token, for streamed runs")
+    time_to_first_question_s: Optional[float] = Field(None, description="time until the first complete question, for streamed quizzes")
+    input_tokens: int = Field(0, description="input tokens of all model requests")
+    output_tokens: int = Field(0, description="output tokens of all model requests")
+    requests: int = Field(0, description="number of model requests")
+    retries: int = Field(0, description="number of attempts after the first one")
+    rate_limited: int = Field(0, description="number of requests rejected with a rate limit error")
+    wait_time_s: float = Field(0.0, description="time spent waiting for the rate limits and concurrency of the model")
+    validation_failures: int = Field(0, description="number of outputs that did not match the expected structure")
+    cached: bool = Field(False, description="whether the output came from the cache")
+    cost_usd: Optional[float] = Field(None, description="estimated cost, None for models without a known price")
+    error: Optional[str] = Field(None, description="the error that made the run fail")
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+    """Estimate the cost of a run from its token usage
+
+    Args:
+        model (str): The model used
+        input_tokens (int): The number of input tokens
+        output_tokens (int): The number of output tokens
+
+    Returns:
+        Optional[float]: the cost in USD, or None if the model price is unknown
+    """
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = math.ceil(percentile / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+class MetricsRecorder:
+    """Class for recording agent run metrics of a batch as JSON lines"""
+
+    def __init__(self, path: str, batch_id: Optional[str] = None):
+        """Initialize the recorder
+
+        Args:
+            path (str): The JSON lines file the metrics are appended to
+            batch_id (str, optional): The id of the batch, a random one is generated by default
+        """
+        self.path = path
+        self.batch_id = batch_id or uuid.uuid4().hex[:12]
+        self.runs: List[AgentRunMetrics] = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, stage: str, model: str, started_at: float, **fields) -> AgentRunMetrics:
+        """Record the metrics of an agent run
+
+        Args:
+            stage (str): The pipeline stage
+            model (str): The model used
+            started_at (float): The time.time() at the start of the run
+            **fields: the other AgentRunMetrics fields
+
+        Returns:
+            AgentRunMetrics: the recorded metrics
+        """
+        fields.setdefault("wall_time_s", time.time() - started_at)
+        fields.setdefault("document", current_document.get())
+        metrics = AgentRunMetrics(batch_id=self.batch_id, stage=stage, model=model, started_at=started_at, **fields)
+        if metrics.cost_usd is None and not metrics.cached:
+            metrics.cost_usd = estimate_cost(model, metrics.input_tokens, metrics.output_tokens)
+
+        with self._lock:
+            self.runs.append(metrics)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(metrics.model_dump_json() + "\n")
+            except OSError as e:
+                logging.error(f"Error writing metrics: {str(e)}")
+        return metrics
+
+    def summary(self) -> List[Dict]:
+        """Summarize the runs of the batch per stage
+
+        Returns:
+            List[Dict]: one row per stage with counts, latency percentiles, tokens and cost
+        """
+        stages: Dict[str, List[AgentRunMetrics]] = {}
+        for run in self.runs:
+            stages.setdefault(run.stage, []).append(run)
+
+        rows = []
+        for stage, runs in stages.items():
+            live_runs = [run for run in runs if not run.cached]
+            wall_times = [run.wall_time_s for run in live_runs]
+            first_token_times = [run.time_to_first_token_s for run in live_runs if run.time_to_first_token_s is not None]
+            first_question_times = [run.time_to_first_question_s for run in live_runs if run.time_to_first_question_s is not None]
+            costs = [run.cost_usd for run in live_runs if run.cost_usd is not None]
+            rows.append({
+                "stage": stage,
+                "runs": len(runs),
+                "cached": len(runs) - len(live_runs),
+                "errors": sum(1 for run in runs if run.error),
+                "p50 time (s)": round(_percentile(wall_times, 50), 2) if wall_times else None,
+                "p95 time (s)": round(_percentile(wall_times, 95), 2) if wall_times else None,
+                "p50 first token (s)": round(_percentile(first_token_times, 50), 2) if first_token_times else None,
+                "p50 first question (s)": round(_percentile(first_question_times, 50), 2) if first_question_times else None,
+                "input tokens": sum(run.input_tokens for run in runs),
+                "output tokens": sum(run.output_tokens for run in runs),
+                "retries": sum(run.retries for run in runs),
+                "rate limited": sum(run.rate_limited for run in runs),
+                "p95 wait (s)": round(_percentile([run.wait_time_s for run in live_runs], 95), 2) if live_runs else None,
+                "validation failures": sum(run.validation_failures for run in runs),
+                "cost (USD)": round(sum(costs), 4) if costs else None,
+            })
+        return rows
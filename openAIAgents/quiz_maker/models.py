@@ -13,6 +13,13 @@ class Question(BaseModel):
         description="list of 4 possible answers",
     )
 
+class SummarizedQuiz(BaseModel):
+    summary: str = Field(..., description="comprehensive summary of the source text")
+    questions: List[Question] = Field(
+        ..., 
+        description="list of quiz questions"
+    )
+
 class Quiz(BaseModel):
     questions: List[Question] = Field(
         ..., 
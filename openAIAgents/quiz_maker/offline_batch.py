@@ -0,0 +1,531 @@
+import os
+import sys
+import uuid
+import json
+import asyncio
+import logging
+import argparse
+import traceback
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from ai_agent import (
+    QuizGenerator, PIPELINES, PIPELINE_AUTO, QUESTION_COUNT, MAX_REDUCE_DEPTH, SUMMARIZER_INSTRUCTIONS,
+    CHUNK_SUMMARIZER_INSTRUCTIONS, REDUCE_SUMMARIES_INSTRUCTIONS, QUIZ_GENERATOR_INSTRUCTIONS, DIRECT_QUIZ_INSTRUCTIONS
+)
+from artifact_store import ArtifactStore, KIND_RAW_TEXT, KIND_SUMMARY, KIND_QUIZ
+from cache import AgentResultCache
+from excel_converter import QuizExcelConverter
+from models import Question, Quiz, SummarizedQuiz
+from question_bank import QuestionBank
+from url_fetcher import UrlFetcher
+from utils import setup_logging, extract_text_from_pdf, get_filename_from_url, estimate_tokens, split_text_into_chunks
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# state of a batch and the request file of each round, in the work directory
+STATE_FILENAME = "state.json"
+REQUESTS_FILENAME = "requests_round_{round}.jsonl"
+
+# directory of the extracted texts of the documents, in the work directory
+RAW_TEXT_DIRNAME = "raw_text"
+
+# endpoint of every request of the batch files
+BATCH_ENDPOINT = "/v1/responses"
+
+# attempts of a request whose result is an error or does not validate, before its document fails
+MAX_ATTEMPTS = 2
+
+# structured outputs of the pipeline stages, by name in the state file
+OUTPUT_TYPES = {"Quiz": Quiz, "SummarizedQuiz": SummarizedQuiz}
+
+class BatchRequest(NamedTuple):
+    key: str
+    stage: str
+    instructions: str
+    text: str
+    output_type: Optional[str]
+
+class OfflineBatch:
+    """Class for generating quizzes through batch request files instead of live agent calls
+
+    Every round writes the requests the documents need next as a JSON lines file in the
+    format of the OpenAI Batch API (Responses endpoint). Once the provider completes it,
+    the result file is ingested: outputs are validated, and documents either move on to
+    their next stage (two-stage documents need a summary round before their quiz round,
+    long documents a chunk round before) or are finished with the usual outputs.
+
+    Requests are identified by the key of the agent result cache, so identical requests of
+    different documents are sent once, cached results are never requested, and ingested
+    results are cached for live runs too.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        quiz_generator: QuizGenerator,
+        excel_converter: QuizExcelConverter,
+        cache: Optional[AgentResultCache] = None
+    ):
+        """Initialize the batch, loading its state if the work directory has one
+
+        Args:
+            work_dir (str): Directory of the state file and of the request files
+            quiz_generator (QuizGenerator): provides the pipeline settings, the store and the question bank
+            excel_converter (QuizExcelConverter): The converter used for excel outputs
+            cache (AgentResultCache, optional): cache of agent results, read before requesting and filled on ingest
+        """
+        self.work_dir = work_dir
+        self.quiz_generator = quiz_generator
+        self.excel_converter = excel_converter
+        self.cache = cache
+        self.state_path = os.path.join(work_dir, STATE_FILENAME)
+        self.state = {"round": 0, "language": None, "run_id": quiz_generator.run_id, "documents": [], "outputs": {}, "attempts": {}, "requests": {}, "round_requests": []}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        os.makedirs(work_dir, exist_ok=True)
+
+    def save(self) -> None:
+        """Write the state, replacing the previous one only once it is complete"""
+        temporary_path = self.state_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(temporary_path, self.state_path)
+
+    def add_documents(self, documents: List[Tuple[str, str, str]], language: str) -> None:
+        """Add the documents of the batch
+
+        Args:
+            documents (List[Tuple[str, str, str]]): (text, base filename, source) tuples
+            language (str): The language of the quizzes
+        """
+        generator = self.quiz_generator
+        self.state["language"] = language
+        raw_text_dir = os.path.join(self.work_dir, RAW_TEXT_DIRNAME)
+        os.makedirs(raw_text_dir, exist_ok=True)
+        for text, base_filename, source in documents:
+            source_hash = ArtifactStore.source_hash(text)
+            if generator.store:
+                generator.store.add(KIND_RAW_TEXT, text, source_hash, base_filename, run_id=self.state["run_id"])
+            # the state only keeps the path of the text, it is read again by each round
+            text_path = os.path.join(raw_text_dir, f"{base_filename}_{source_hash[:12]}.txt")
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            self.state["documents"].append({
+                "source": source,
+                "base_filename": base_filename,
+                "source_hash": source_hash,
+                "text_path": text_path,
+                "direct": generator.uses_direct_pipeline(text),
+                "status": "pending",
+                "error": None
+            })
+
+    @staticmethod
+    def _text(document: dict) -> str:
+        """The extracted text of a document"""
+        with open(document["text_path"], "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _request(self, stage: str, instructions: str, text: str, output_type: Optional[type] = None) -> BatchRequest:
+        key = AgentResultCache.make_key(stage, text, self.quiz_generator.model, self.state["language"], instructions)
+        return BatchRequest(key, stage, instructions, text, output_type.__name__ if output_type else None)
+
+    def _output(self, request: BatchRequest) -> Optional[str]:
+        """The validated output of a request, from this batch or from the cache"""
+        output = self.state["outputs"].get(request.key)
+        if output is None and self.cache:
+            output = self.cache.get(request.key)
+            if output is not None:
+                self.state["outputs"][request.key] = output
+        return output
+
+    def _plan_summary(self, text: str, depth: int = 0) -> Tuple[Optional[str], List[BatchRequest]]:
+        """Follow the summary steps of QuizGenerator.summarize_text
+
+        Returns:
+            Tuple[Optional[str], List[BatchRequest]]: the summary, or None and the requests it still needs
+        """
+        language = self.state["language"]
+        chunk_tokens = self.quiz_generator.chunk_tokens
+        if estimate_tokens(text) <= chunk_tokens:
+            request = self._request("summary", SUMMARIZER_INSTRUCTIONS.format(language=language), text)
+            output = self._output(request)
+            return (output, []) if output is not None else (None, [request])
+
+        # map: every chunk is summarized in the same round
+        chunk_instructions = CHUNK_SUMMARIZER_INSTRUCTIONS.format(language=language)
+        chunk_requests = [self._request("chunk_summary", chunk_instructions, chunk) for chunk in split_text_into_chunks(text, chunk_tokens)]
+        chunk_summaries = [self._output(request) for request in chunk_requests]
+        missing = [request for request, output in zip(chunk_requests, chunk_summaries) if output is None]
+        if missing:
+            return None, missing
+
+        # reduce: in the next round, chunking again if the partial summaries are still too long
+        combined = "\n\n".join(chunk_summaries)
+        if estimate_tokens(combined) > chunk_tokens and depth < MAX_REDUCE_DEPTH:
+            return self._plan_summary(combined, depth + 1)
+        request = self._request("reduce_summary", REDUCE_SUMMARIES_INSTRUCTIONS.format(language=language), combined)
+        output = self._output(request)
+        return (output, []) if output is not None else (None, [request])
+
+    def _plan(self, document: dict) -> Tuple[Optional[dict], List[BatchRequest]]:
+        """Find the next step of a document
+
+        Args:
+            document (dict): The document state
+
+        Returns:
+            Tuple[Optional[dict], List[BatchRequest]]: the summary, banked and generated questions once all
+            outputs are available, else None and the requests needed next
+        """
+        generator = self.quiz_generator
+        language = self.state["language"]
+        text = self._text(document)
+
+        if document["direct"]:
+            # the banked questions are looked up once and kept, so that every round asks for the same questions
+            if "banked" not in document:
+                document["banked"] = [question.model_dump() for question in generator.banked_questions(text, language)]
+            banked = [Question.model_validate(question) for question in document["banked"]]
+            if len(banked) < QUESTION_COUNT:
+                request = self._request(
+                    "direct_quiz", generator.quiz_instructions(DIRECT_QUIZ_INSTRUCTIONS, language, banked),
+                    text, SummarizedQuiz
+                )
+                output = self._output(request)
+                if output is None:
+                    return None, [request]
+                result = SummarizedQuiz.model_validate_json(output)
+                return {"summary": result.summary, "banked": banked, "questions": result.questions}, []
+
+        summary, requests = self._plan_summary(text)
+        if summary is None:
+            return None, requests
+        if "banked" not in document:
+            document["banked"] = [question.model_dump() for question in generator.banked_questions(summary, language)]
+        banked = [Question.model_validate(question) for question in document["banked"]]
+        if len(banked) >= QUESTION_COUNT:
+            return {"summary": summary, "banked": banked, "questions": []}, []
+
+        request = self._request("quiz", generator.quiz_instructions(QUIZ_GENERATOR_INSTRUCTIONS, language, banked), summary, Quiz)
+        output = self._output(request)
+        if output is None:
+            return None, [request]
+        return {"summary": summary, "banked": banked, "questions": Quiz.model_validate_json(output).questions}, []
+
+    def _finish(self, document: dict, result: dict) -> None:
+        """Save the summary and quiz of a completed document and export its Excel file"""
+        generator = self.quiz_generator
+        language = self.state["language"]
+        quiz = Quiz(questions=result["banked"] + result["questions"])
+        generator.bank_questions(result["questions"], self._text(document), document["base_filename"], language)
+        if generator.store:
+            stored = {
+                "source_hash": document["source_hash"],
+                "filename": document["base_filename"],
+                "model": generator.model,
+                "language": language,
+                "run_id": self.state["run_id"]
+            }
+            generator.store.add(KIND_SUMMARY, result["summary"], **stored)
+            generator.store.add(KIND_QUIZ, quiz.model_dump_json(), metadata={"banked_questions": len(result["banked"]), "offline_batch": True}, **stored)
+        excel_path, _ = self.excel_converter.export_quiz(quiz, document["base_filename"])
+        document["status"] = "done"
+        document["excel_path"] = excel_path
+
+    def advance(self) -> Optional[str]:
+        """Finish the documents whose outputs are all available and write the requests of the next round
+
+        Returns:
+            Optional[str]: the path of the new request file, None when no request is left
+        """
+        requests: Dict[str, BatchRequest] = {}
+        for document in self.state["documents"]:
+            if document["status"] != "pending":
+                continue
+            try:
+                result, needed = self._plan(document)
+                if result is not None:
+                    self._finish(document, result)
+                    continue
+                exhausted = [request for request in needed if self.state["attempts"].get(request.key, 0) >= MAX_ATTEMPTS]
+                if exhausted:
+                    raise ValueError(f"{exhausted[0].stage} request failed {MAX_ATTEMPTS} times: {self.state['requests'][exhausted[0].key]['error']}")
+                for request in needed:
+                    # identical requests of several documents are sent once
+                    requests[request.key] = request
+            except Exception as e:
+                logging.error(f"error processing {document['source']}: {str(e)}")
+                logging.error(traceback.format_exc())
+                document["status"] = "failed"
+                document["error"] = str(e)
+
+        if self.quiz_generator.store:
+            self.quiz_generator.store.flush()
+        if not requests:
+            self.save()
+            return None
+
+        self.state["round"] += 1
+        path = os.path.join(self.work_dir, REQUESTS_FILENAME.format(round=self.state["round"]))
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests.values():
+                f.write(json.dumps(self._batch_line(request), ensure_ascii=False) + "\n")
+                self.state["requests"].setdefault(request.key, {"stage": request.stage, "output_type": request.output_type, "error": None})
+        self.state["round_requests"] = list(requests)
+        self.save()
+        return path
+
+    def _batch_line(self, request: BatchRequest) -> dict:
+        """Build the Batch API line of a request, with the structured output format the agents SDK would send"""
+        body = {
+            "model": self.quiz_generator.model,
+            "instructions": request.instructions,
+            "input": request.text
+        }
+        if request.output_type:
+            from agents import AgentOutputSchema
+
+            schema = AgentOutputSchema(OUTPUT_TYPES[request.output_type])
+            body["text"] = {
+                "format": {
+                    "type": "json_schema",
+                    "name": "final_output",
+                    "schema": schema.json_schema(),
+                    "strict": schema.is_strict_json_schema()
+                }
+            }
+        return {"custom_id": request.key, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+    @staticmethod
+    def _output_text(line: dict) -> str:
+        """Extract the output text of a Batch API result line, raising ValueError for failed requests"""
+        if line.get("error"):
+            raise ValueError(line["error"].get("message", str(line["error"])))
+        response = line.get("response") or {}
+        if response.get("status_code") != 200:
+            raise ValueError(f"status code {response.get('status_code')}")
+        texts = [
+            content["text"]
+            for item in response["body"].get("output", []) if item.get("type") == "message"
+            for content in item.get("content", []) if content.get("type") == "output_text"
+        ]
+        if not texts:
+            raise ValueError("no output text")
+        return "".join(texts)
+
+    def ingest(self, results_path: str) -> Dict[str, int]:
+        """Read a completed result file, keeping the outputs that are valid
+
+        Args:
+            results_path (str): The Batch API result file of the last round
+
+        Returns:
+            Dict[str, int]: the number of "valid" and "invalid" results, of "missing" requests of the round,
+            and the "input_tokens" and "output_tokens" used
+        """
+        counts = {"valid": 0, "invalid": 0, "missing": 0, "input_tokens": 0, "output_tokens": 0}
+        answered = set()
+        with open(results_path, "r", encoding="utf-8") as f:
+            for raw_line in f:
+                if not raw_line.strip():
+                    continue
+                line = json.loads(raw_line)
+                key = line.get("custom_id")
+                request = self.state["requests"].get(key)
+                if request is None:
+                    logging.warning(f"result of an unknown request ignored: {key}")
+                    continue
+                answered.add(key)
+                usage = ((line.get("response") or {}).get("body") or {}).get("usage") or {}
+                counts["input_tokens"] += usage.get("input_tokens", 0)
+                counts["output_tokens"] += usage.get("output_tokens", 0)
+                try:
+                    output = self._output_text(line)
+                    if request["output_type"]:
+                        # the structured output must match its model, like ModelBehaviorError in live runs
+                        output = OUTPUT_TYPES[request["output_type"]].model_validate_json(output).model_dump_json()
+                except (ValueError, ValidationError) as e:
+                    self.state["attempts"][key] = self.state["attempts"].get(key, 0) + 1
+                    request["error"] = str(e)[:500]
+                    counts["invalid"] += 1
+                    continue
+                self.state["outputs"][key] = output
+                if self.cache:
+                    self.cache.set(key, request["stage"], output)
+                counts["valid"] += 1
+
+        # requests without a result line, e.g. expired or only in the error file, count as a failed attempt too
+        for key in self.state["round_requests"]:
+            if key not in answered and key not in self.state["outputs"]:
+                self.state["attempts"][key] = self.state["attempts"].get(key, 0) + 1
+                self.state["requests"][key]["error"] = "no result in the result file"
+                counts["missing"] += 1
+        self.state["round_requests"] = []
+        self.save()
+        return counts
+
+    def status(self) -> Dict[str, int]:
+        """Count the documents of the batch by status
+
+        Returns:
+            Dict[str, int]: the number of "pending", "done" and "failed" documents
+        """
+        counts = {"pending": 0, "done": 0, "failed": 0}
+        for document in self.state["documents"]:
+            counts[document["status"]] += 1
+        return counts
+
+def extract_documents(pdf_dir: Optional[str], urls_file: Optional[str]) -> List[Tuple[str, str, str]]:
+    """Extract the texts of the documents of a batch
+
+    Args:
+        pdf_dir (str, optional): Directory containing the PDF files
+        urls_file (str, optional): Text file with one URL per line, lines starting with # are ignored
+
+    Returns:
+        List[Tuple[str, str, str]]: (text, base filename, source) of every document with text
+    """
+    # imported here, batch_cli is only needed to list the documents
+    from batch_cli import collect_documents
+
+    documents = collect_documents(pdf_dir, urls_file)
+    urls = [document["source"] for document in documents if document["kind"] == "url"]
+    url_texts = dict(zip(urls, asyncio.run(UrlFetcher(os.path.join(BASE_DIR, "cache", "http")).fetch_texts(urls)))) if urls else {}
+
+    extracted = []
+    for document in documents:
+        if document["kind"] == "pdf":
+            text = extract_text_from_pdf(document["source"])
+            base_filename = os.path.basename(document["source"]).replace('.pdf', '')
+        else:
+            text = url_texts.get(document["source"])
+            base_filename = get_filename_from_url(document["source"])
+        if not text:
+            print(f"impossible to extract text from {document['source']}", file=sys.stderr)
+            continue
+        extracted.append((text, base_filename, document["source"]))
+    return extracted
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments
+
+    Args:
+        argv (List[str], optional): The arguments, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate quizzes through Batch API request files: prepare writes the first round of requests, "
+                    "each ingest of a completed result file writes the next round until every quiz is done."
+    )
+    parser.add_argument("command", choices=["prepare", "ingest", "status"], help="the step to run")
+    parser.add_argument("--work-dir", required=True, help="directory of the batch state and request files")
+    parser.add_argument("--pdf-dir", help="prepare: directory containing the PDF files to process")
+    parser.add_argument("--urls-file", help="prepare: text file with one URL per line")
+    parser.add_argument("--results", help="ingest: the completed result file of the last round")
+    parser.add_argument("--model", default="gpt-4o-mini", help="prepare: the OpenAI model to use (default: gpt-4o-mini)")
+    parser.add_argument("--language", default="English", help="prepare: the language of the quizzes (default: English)")
+    parser.add_argument("--pipeline", choices=PIPELINES, default=PIPELINE_AUTO, help="prepare: the quiz pipeline (default: auto)")
+    parser.add_argument("--combine", action="store_true", help="ingest: once every document is done, also create a single Excel file")
+    parser.add_argument(
+        "--store",
+        default=os.path.join(BASE_DIR, "cache", "artifacts.sqlite"),
+        help="SQLite file storing raw texts, summaries, quizzes and run metadata (default: cache/artifacts.sqlite)"
+    )
+    parser.add_argument("--no-question-bank", action="store_true", help="generate every question, without reusing banked ones")
+    parser.add_argument("--no-cache", action="store_true", help="request every output, even those already cached")
+    args = parser.parse_args(argv)
+    if args.command == "prepare" and not args.pdf_dir and not args.urls_file:
+        parser.error("prepare needs at least one of --pdf-dir and --urls-file")
+    if args.command == "ingest" and not args.results:
+        parser.error("ingest needs --results")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    log_filename = setup_logging()
+    print(f"logging to {log_filename}")
+
+    state_path = os.path.join(args.work_dir, STATE_FILENAME)
+    if args.command == "prepare" and os.path.exists(state_path):
+        print(f"{args.work_dir} already holds a batch, use a new work directory", file=sys.stderr)
+        return 2
+    if args.command != "prepare" and not os.path.exists(state_path):
+        print(f"no batch in {args.work_dir}, run prepare first", file=sys.stderr)
+        return 2
+
+    # the settings of a batch are chosen at prepare time and kept in settings.json, next to its state
+    settings_path = os.path.join(args.work_dir, "settings.json")
+    if args.command == "prepare":
+        os.makedirs(args.work_dir, exist_ok=True)
+        settings = {"model": args.model, "pipeline": args.pipeline}
+        with open(settings_path, "w", encoding="utf-8") as f:
+            json.dump(settings, f)
+    else:
+        with open(settings_path, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+
+    store = ArtifactStore(args.store)
+    question_bank = None if args.no_question_bank else QuestionBank(os.path.join(BASE_DIR, "cache", "question_bank.sqlite"))
+    cache = AgentResultCache(
+        os.path.join(BASE_DIR, "cache", "agent_results.sqlite"),
+        max_size_mb=float(os.getenv("QUIZ_CACHE_MAX_MB", "256")),
+        bypass=args.no_cache
+    )
+    quiz_generator = QuizGenerator(
+        settings["model"],
+        chunk_tokens=int(os.getenv("QUIZ_CHUNK_TOKENS", "12000")),
+        pipeline=settings["pipeline"],
+        direct_max_tokens=int(os.getenv("QUIZ_DIRECT_MAX_TOKENS", "6000")),
+        store=store,
+        run_id=uuid.uuid4().hex[:12] if args.command == "prepare" else None,
+        question_bank=question_bank
+    )
+    excel_converter = QuizExcelConverter(BASE_DIR)
+    batch = OfflineBatch(args.work_dir, quiz_generator, excel_converter, cache)
+    quiz_generator.run_id = batch.state["run_id"]
+
+    if args.command == "prepare":
+        store.start_run(batch.state["run_id"], source="offline_batch", model=settings["model"], language=args.language, pipeline=settings["pipeline"])
+        batch.add_documents(extract_documents(args.pdf_dir, args.urls_file), args.language)
+        requests_path = batch.advance()
+    elif args.command == "ingest":
+        counts = batch.ingest(args.results)
+        print(f"{counts['valid']} valid results, {counts['invalid']} failed or invalid, {counts['missing']} missing, "
+              f"{counts['input_tokens']} input tokens, {counts['output_tokens']} output tokens")
+        requests_path = batch.advance()
+    else:
+        requests_path = None
+
+    counts = batch.status()
+    print(f"round {batch.state['round']}: {counts['done']} done, {counts['failed']} failed, {counts['pending']} pending")
+    if requests_path:
+        with open(requests_path, "r", encoding="utf-8") as f:
+            print(f"{sum(1 for _ in f)} requests to submit: {requests_path}")
+    elif args.command != "status":
+        store.finish_run(batch.state["run_id"], documents=len(batch.state["documents"]), failures=counts["failed"])
+        if args.combine:
+            quizzes = [
+                (Quiz.model_validate_json(quiz_json), document["base_filename"])
+                for document in batch.state["documents"] if document["status"] == "done"
+                for quiz_json in [store.latest(KIND_QUIZ, source_hash=document["source_hash"], run_id=batch.state["run_id"])] if quiz_json
+            ]
+            if quizzes:
+                combined_path = os.path.join(excel_converter.excel_output_dir, "quiz.xlsx")
+                with open(combined_path, "wb") as f:
+                    f.write(excel_converter.combine_quizzes_to_excel(quizzes).getbuffer())
+                print(f"Sequential numbered quiz saved in: {combined_path}")
+
+    store.close()
+    if question_bank:
+        question_bank.close()
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
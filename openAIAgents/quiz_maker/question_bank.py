@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from collections import Counter
+from typing import List, NamedTuple, Optional
+from models import Question
+from dedup import tokenize
+
+# shorter words are mostly articles, prepositions and conjunctions in every language
+MIN_TERM_LENGTH = 4
+
+# most frequent words of a source used to look for matching themes
+QUERY_TERMS = 200
+
+# candidates ranked by the full-text index before checking their coverage
+MAX_CANDIDATES = 200
+
+# share of the words of a banked question and its correct answer that must appear in the source
+MIN_QUESTION_COVERAGE = float(os.getenv("QUIZ_BANK_MIN_COVERAGE", "0.6"))
+
+# bm25 weights of the theme, question and answers columns
+THEME_WEIGHT = 4.0
+QUESTION_WEIGHT = 1.0
+ANSWERS_WEIGHT = 0.5
+
+class BankedQuestion(NamedTuple):
+    id: int
+    question: Question
+    language: str
+    model: Optional[str]
+    filename: Optional[str]
+    created_at: float
+
+def _terms(text: str) -> List[str]:
+    """Words of a text long enough to carry meaning"""
+    return [word for word in tokenize(text) if len(word) >= MIN_TERM_LENGTH]
+
+def _match_any(terms: List[str]) -> str:
+    """FTS5 query matching any of the terms, quoted so that no word is read as an operator"""
+    return " OR ".join(f'"{term}"' for term in terms)
+
+def _correct_answer(question: Question) -> str:
+    return max(question.answers, key=lambda answer: answer.score).text if question.answers else ""
+
+class QuestionBank:
+    """Class for keeping every generated question in a SQLite database with a full-text index
+
+    Themes, questions and answers are indexed with FTS5. Before a quiz is generated, the
+    questions whose theme and content are covered by the source are reused, one per theme,
+    so that the model is only asked for the missing questions.
+    """
+
+    def __init__(self, db_path: str, min_question_coverage: float = MIN_QUESTION_COVERAGE):
+        """Initialize the bank
+
+        Args:
+            db_path (str): The path of the SQLite database file
+            min_question_coverage (float): share of the words of a question and its correct answer
+                that must appear in the source for the question to be reused
+        """
+        self.db_path = db_path
+        self.min_question_coverage = min_question_coverage
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                theme TEXT NOT NULL,
+                question_text TEXT NOT NULL,
+                answers TEXT NOT NULL,
+                language TEXT NOT NULL,
+                model TEXT,
+                source_hash TEXT,
+                filename TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_text ON questions (language, question_text);
+            CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(theme, question_text, answers);
+        """)
+        self._conn.commit()
+
+    def add(
+        self,
+        questions: List[Question],
+        language: str,
+        model: Optional[str] = None,
+        source_hash: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> int:
+        """Add generated questions to the bank, questions already banked are skipped
+
+        Args:
+            questions (List[Question]): The questions
+            language (str): The language of the questions
+            model (str, optional): The model that generated them
+            source_hash (str, optional): The hash of the source text
+            filename (str, optional): The base filename of the source
+
+        Returns:
+            int: the number of questions added
+        """
+        added = 0
+        now = time.time()
+        try:
+            with self._lock:
+                for question in questions:
+                    answers = json.dumps([answer.model_dump() for answer in question.answers], ensure_ascii=False)
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO questions (theme, question_text, answers, language, model, source_hash, filename, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (question.theme, question.question_text, answers, language, model, source_hash, filename, now)
+                    )
+                    if cursor.rowcount:
+                        self._conn.execute(
+                            "INSERT INTO questions_fts (rowid, theme, question_text, answers) VALUES (?, ?, ?, ?)",
+                            (cursor.lastrowid, question.theme, question.question_text, " ".join(answer.text for answer in question.answers))
+                        )
+                        added += 1
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error writing to the question bank: {str(e)}")
+        return added
+
+    def _select(self, match: str, language: Optional[str], limit: int) -> List[BankedQuestion]:
+        """Run a full-text query, best matches first"""
+        sql = (
+            "SELECT q.id, q.theme, q.question_text, q.answers, q.language, q.model, q.filename, q.created_at "
+            "FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid "
+            "WHERE questions_fts MATCH ?"
+        )
+        params: list = [match]
+        if language:
+            sql += " AND q.language = ?"
+            params.append(language)
+        sql += " ORDER BY bm25(questions_fts, ?, ?, ?) LIMIT ?"
+        params += [THEME_WEIGHT, QUESTION_WEIGHT, ANSWERS_WEIGHT, limit]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            BankedQuestion(
+                id=row[0],
+                question=Question(theme=row[1], question_text=row[2], answers=json.loads(row[3])),
+                language=row[4],
+                model=row[5],
+                filename=row[6],
+                created_at=row[7]
+            )
+            for row in rows
+        ]
+
+    def search(self, query: str, language: Optional[str] = None, limit: int = 20) -> List[BankedQuestion]:
+        """Find the questions containing every word of a query in their theme, text or answers
+
+        Args:
+            query (str): The words to look for
+            language (str, optional): only questions in this language
+            limit (int): maximum number of questions
+
+        Returns:
+            List[BankedQuestion]: the matching questions, best matches first
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        try:
+            return self._select(" AND ".join(f'"{word}"' for word in words), language, limit)
+        except sqlite3.Error as e:
+            logging.error(f"Error searching the question bank: {str(e)}")
+            return []
+
+    def find_covered(self, text: str, language: str, max_questions: int) -> List[Question]:
+        """Find banked questions on themes covered by a source text, at most one per theme
+
+        Args:
+            text (str): The source text (or its summary)
+            language (str): The language of the quiz
+            max_questions (int): maximum number of questions to return
+
+        Returns:
+            List[Question]: the reusable questions, best matches first
+        """
+        source_terms = Counter(_terms(text))
+        if not source_terms or max_questions <= 0:
+            return []
+        try:
+            candidates = self._select(
+                _match_any([term for term, _ in source_terms.most_common(QUERY_TERMS)]), language, MAX_CANDIDATES
+            )
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the question bank: {str(e)}")
+            return []
+
+        covered = []
+        seen_themes = set()
+        for candidate in candidates:
+            question = candidate.question
+            theme_key = " ".join(tokenize(question.theme))
+            if theme_key in seen_themes:
+                continue
+            # every significant word of the theme is in the source
+            theme_terms = set(_terms(question.theme))
+            if not theme_terms or not theme_terms.issubset(source_terms.keys()):
+                continue
+            # and most of what the question asks
+            content_terms = set(_terms(f"{question.question_text} {_correct_answer(question)}"))
+            if content_terms and len(content_terms & source_terms.keys()) / len(content_terms) < self.min_question_coverage:
+                continue
+            seen_themes.add(theme_key)
+            covered.append(question)
+            if len(covered) >= max_questions:
+                break
+        return covered
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Search the questions of the quiz maker question bank.")
+    parser.add_argument("query", help="words that must appear in the theme, question or answers")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "question_bank.sqlite"), help="the bank file")
+    parser.add_argument("--language", help="only questions in this language")
+    parser.add_argument("--limit", type=int, default=20, help="maximum number of questions (default: 20)")
+    args = parser.parse_args(argv)
+
+    bank = QuestionBank(args.db)
+    for banked in bank.search(args.query, args.language, args.limit):
+        print(f"{banked.id}\t{banked.language}\t{banked.filename or ''}\t[{banked.question.theme}] {banked.question.question_text}")
+        for answer in banked.question.answers:
+            print(f"\t\t({answer.score}) {answer.text}")
+    bank.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
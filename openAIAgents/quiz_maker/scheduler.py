@@ -0,0 +1,285 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import weakref
+import functools
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# per-model pacing, 0 disables the corresponding bucket
+REQUESTS_PER_MINUTE = float(os.getenv("QUIZ_REQUESTS_PER_MINUTE", "0"))
+TOKENS_PER_MINUTE = float(os.getenv("QUIZ_TOKENS_PER_MINUTE", "0"))
+
+# seconds of quota that can be spent at once, quotas are enforced over short windows too
+BURST_SECONDS = 1.0
+
+# bounds and starting point of the adaptive number of in-flight requests per model
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("QUIZ_MAX_INFLIGHT_REQUESTS", "32"))
+INITIAL_CONCURRENCY = 8
+
+# multiplicative decrease on congestion, and minimum time between two decreases
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN_S = 2.0
+
+# retries of rate-limited, timed out and failed requests
+MAX_RETRIES = int(os.getenv("QUIZ_MAX_RETRIES", "8"))
+BASE_BACKOFF_S = 1.0
+MAX_BACKOFF_S = 60.0
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[tuple, tuple]:
+    """Get the OpenAI errors retried by the schedulers, importing the client on first use
+
+    Returns:
+        Tuple[tuple, tuple]: the errors signalling that the service is saturated, which also reduce
+        the concurrency, and the errors worth retrying without reducing the concurrency
+    """
+    import openai
+    return (openai.RateLimitError, openai.APITimeoutError), (openai.APIConnectionError, openai.InternalServerError)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the delay requested by the server in the headers of an API error
+
+    Args:
+        error (Exception): The error raised by the OpenAI client
+
+    Returns:
+        Optional[float]: the delay in seconds, None if the server did not send one
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # http dates are not used by the API
+        return None
+    return None
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute, holding at most BURST_SECONDS of quota"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, amount: float) -> float:
+        """Time to wait until amount can be taken
+
+        Args:
+            amount (float): The amount to take, capped to the capacity
+
+        Returns:
+            float: the delay in seconds, 0 if amount is available now
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        """Take amount from the bucket, a negative balance delays the next requests"""
+        self._refill()
+        self.tokens -= amount
+
+class RateLimitScheduler:
+    """Class for pacing, limiting and retrying the model requests of one model
+
+    Requests are paced by token buckets of requests and tokens per minute, the number of
+    requests in flight adapts with additive increase and multiplicative decrease (AIMD) on
+    rate limits and timeouts, and failed requests are retried with exponential backoff that
+    honors the Retry-After header. A Retry-After pauses every request of the model, since the
+    quota is shared.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        initial_concurrency: int = INITIAL_CONCURRENCY,
+        min_concurrency: int = MIN_CONCURRENCY,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        base_backoff_s: float = BASE_BACKOFF_S,
+        max_backoff_s: float = MAX_BACKOFF_S
+    ):
+        """Initialize the scheduler
+
+        Args:
+            requests_per_minute (float): request quota, 0 for no pacing
+            tokens_per_minute (float): token quota, 0 for no pacing
+            initial_concurrency (int): number of requests allowed in flight at first
+            min_concurrency (int): lower bound of the adaptive concurrency
+            max_concurrency (int): upper bound of the adaptive concurrency
+            max_retries (int): number of retries of a request before its error is raised
+            base_backoff_s (float): backoff of the first retry, doubled at each retry
+            max_backoff_s (float): maximum backoff
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.max_retries = max_retries
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def _acquire(self, estimated_tokens: int) -> None:
+        """Wait for a free slot, the end of any pause and enough quota, then take them"""
+        async with self._condition:
+            while True:
+                if self.in_flight >= int(self.concurrency):
+                    await self._condition.wait()
+                    continue
+                delay = self.paused_until - time.monotonic()
+                if self.request_bucket:
+                    delay = max(delay, self.request_bucket.delay(1))
+                if self.token_bucket:
+                    delay = max(delay, self.token_bucket.delay(estimated_tokens))
+                if delay <= 0:
+                    break
+                try:
+                    # woken early when a slot frees up or the limits change
+                    await asyncio.wait_for(self._condition.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            self.in_flight += 1
+            if self.request_bucket:
+                self.request_bucket.take(1)
+            if self.token_bucket:
+                self.token_bucket.take(estimated_tokens)
+
+    async def _release(self, succeeded: bool, congested: bool = False, pause_s: Optional[float] = None) -> None:
+        """Free a slot and adapt the concurrency to the outcome of the request, only successes increase it"""
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if congested:
+                # a burst of errors from the same window only counts once
+                if now - self._last_decrease >= DECREASE_COOLDOWN_S:
+                    self.concurrency = max(self.min_concurrency, self.concurrency * DECREASE_FACTOR)
+                    self._last_decrease = now
+                    logging.info(f"rate limited, concurrency reduced to {int(self.concurrency)}")
+                if pause_s:
+                    self.paused_until = max(self.paused_until, now + pause_s)
+            elif succeeded:
+                # about one more slot per window of successful requests
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._condition.notify_all()
+
+    def settle_tokens(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage of a request is known
+
+        Args:
+            estimated_tokens (int): The tokens taken before the request
+            actual_tokens (int): The tokens the request actually used, 0 when unknown or failed
+        """
+        if self.token_bucket:
+            self.token_bucket.take(actual_tokens - estimated_tokens)
+
+    def backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Delay before a retry
+
+        Args:
+            attempt (int): The number of the retry, starting from 0
+            retry_after (float, optional): The delay requested by the server
+
+        Returns:
+            float: the delay in seconds, the server delay if any, else an exponential backoff with full jitter
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff_s)
+        return random.uniform(0, min(self.max_backoff_s, self.base_backoff_s * 2 ** attempt))
+
+    async def run(self, call: Callable[[], Awaitable[T]], estimated_tokens: int = 0, stats: Optional[Dict] = None) -> T:
+        """Run a model request under the limits of the scheduler, retrying transient failures
+
+        Args:
+            call (Callable[[], Awaitable[T]]): creates the request, called again for each retry
+            estimated_tokens (int): expected input plus output tokens of the request
+            stats (dict, optional): incremented with the "retries", "rate_limited" and
+                "wait_time_s" of the request
+
+        Returns:
+            T: the result of the request
+        """
+        stats = stats if stats is not None else {}
+        for key in ("retries", "rate_limited", "wait_time_s"):
+            stats.setdefault(key, 0)
+
+        congestion_errors, transient_errors = retryable_errors()
+        attempt = 0
+        while True:
+            waiting_since = time.monotonic()
+            await self._acquire(estimated_tokens)
+            stats["wait_time_s"] += time.monotonic() - waiting_since
+            try:
+                result = await call()
+            except congestion_errors + transient_errors as e:
+                congested = isinstance(e, congestion_errors)
+                retry_after = retry_after_seconds(e)
+                await self._release(False, congested, retry_after)
+                if getattr(e, "status_code", None) == 429:
+                    stats["rate_limited"] += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                logging.warning(f"{type(e).__name__}, retry {attempt + 1} of {self.max_retries} in {delay:.1f}s")
+                attempt += 1
+                stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                await self._release(False)
+                raise
+            await self._release(True)
+            return result
+
+# schedulers of each model, per event loop since asyncio primitives cannot be shared across loops
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, RateLimitScheduler]]" = weakref.WeakKeyDictionary()
+
+def get_scheduler(model: str) -> RateLimitScheduler:
+    """Get the scheduler shared by all agent runs of a model in the running event loop
+
+    Args:
+        model (str): The model name
+
+    Returns:
+        RateLimitScheduler: the scheduler, created with the QUIZ_REQUESTS_PER_MINUTE and
+        QUIZ_TOKENS_PER_MINUTE quotas on first use
+    """
+    schedulers = _schedulers.setdefault(asyncio.get_running_loop(), {})
+    if model not in schedulers:
+        schedulers[model] = RateLimitScheduler(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+    return schedulers[model]
+
+def configure_openai_client(**client_options) -> None:
+    """Make the agents use an OpenAI client without its own retries, so that the
+    schedulers see every rate limit and own the retry policy
+
+    Args:
+        **client_options: additional AsyncOpenAI options (base_url, api_key...)
+    """
+    import openai
+    from agents import set_default_openai_client
+    
+    set_default_openai_client(openai.AsyncOpenAI(max_retries=0, **client_options))
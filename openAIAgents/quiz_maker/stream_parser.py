@@ -0,0 +1,102 @@
+import json
+import logging
+from typing import List
+from pydantic import ValidationError
+from models import Question
+
+class QuestionStreamParser:
+    """Class for extracting the questions of a quiz from its JSON output while it is streamed
+
+    The text is scanned once, character by character, tracking strings and nesting.
+    Each element of the top level "questions" array is parsed and validated as soon as
+    its closing brace arrives, so that questions can be shown before the output is complete.
+    """
+
+    def __init__(self):
+        self.questions: List[Question] = []
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string = None
+        self._current_key = None
+        self._array_depth = None
+        self._item_start = None
+
+    def feed(self, delta: str) -> List[Question]:
+        """Add a chunk of the streamed output
+
+        Args:
+            delta (str): The text received since the previous call
+
+        Returns:
+            List[Question]: the questions completed by this chunk, in output order
+        """
+        self._buffer += delta
+        completed = []
+        buffer = self._buffer
+        for i in range(self._position, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buffer[self._string_start:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif char == ":" and self._depth == 1:
+                # keys of the top level object
+                self._current_key = self._last_string
+            elif char == "[":
+                if self._depth == 1 and self._current_key == "questions":
+                    self._array_depth = self._depth + 1
+                self._depth += 1
+            elif char == "{":
+                if self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if char == "]" and self._depth + 1 == self._array_depth:
+                    self._array_depth = None
+                elif char == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    question = self._parse_item(buffer[self._item_start:i + 1])
+                    self._item_start = None
+                    if question:
+                        self.questions.append(question)
+                        completed.append(question)
+        self._position = len(buffer)
+        self._compact()
+        return completed
+
+    def _parse_item(self, item: str):
+        """Validate one element of the questions array, None if it is not a valid question"""
+        try:
+            return Question.model_validate(json.loads(item))
+        except (ValueError, ValidationError) as e:
+            # the final output is validated again as a whole, and retried if needed
+            logging.warning(f"invalid streamed question: {str(e)}")
+            return None
+
+    def _compact(self) -> None:
+        """Drop the part of the buffer that is no longer needed, keeping the open string or question"""
+        keep_from = self._position
+        if self._item_start is not None:
+            keep_from = self._item_start
+        elif self._in_string:
+            keep_from = self._string_start
+        if keep_from:
+            self._buffer = self._buffer[keep_from:]
+            self._position -= keep_from
+            self._string_start -= keep_from
+            if self._item_start is not None:
+                self._item_start -= keep_from
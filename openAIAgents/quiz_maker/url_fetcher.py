@@ -0,0 +1,171 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+import httpx
+from utils import get_process_pool, reset_process_pool, html_to_text
+
+class UrlFetcher:
+    """Class for fetching the text of many URLs concurrently, with a local HTTP cache"""
+
+    def __init__(self, cache_dir: str, max_connections: int = 16, timeout: float = 30.0):
+        """Initialize the fetcher
+
+        Args:
+            cache_dir (str): Directory where responses and their validators (ETag, Last-Modified) are cached
+            max_connections (int): maximum number of simultaneous connections
+            timeout (float): timeout of each request, in seconds
+        """
+        self.cache_dir = cache_dir
+        self.max_connections = max_connections
+        self.timeout = timeout
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _cache_paths(self, url: str) -> Dict[str, str]:
+        """Get the paths of the cached metadata and text of a URL
+
+        Args:
+            url (str): The URL
+
+        Returns:
+            Dict[str, str]: the "meta" and "text" file paths
+        """
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return {
+            "meta": os.path.join(self.cache_dir, f"{digest}.json"),
+            "text": os.path.join(self.cache_dir, f"{digest}.txt")
+        }
+
+    def _load_cached(self, url: str) -> Optional[Dict]:
+        """Load the cached response of a URL
+
+        Args:
+            url (str): The URL
+
+        Returns:
+            Optional[Dict]: the cached metadata with the extracted text under "text", or None
+        """
+        paths = self._cache_paths(url)
+        try:
+            with open(paths["meta"], "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(paths["text"], "r", encoding="utf-8") as f:
+                meta["text"] = f.read()
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _store_cached(self, url: str, response: httpx.Response, text: str) -> None:
+        """Store the extracted text of a response with its validators
+
+        Args:
+            url (str): The requested URL
+            response (httpx.Response): The response
+            text (str): The text extracted from the response
+        """
+        meta = {
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified")
+        }
+        if not meta["etag"] and not meta["last_modified"]:
+            # nothing to revalidate with, the response cannot be reused
+            return
+        paths = self._cache_paths(url)
+        try:
+            # write to temporary files and rename, concurrent sessions never read partial files
+            for key, content in (("text", text), ("meta", json.dumps(meta))):
+                temp_path = f"{paths[key]}.{os.getpid()}.{id(response)}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(temp_path, paths[key])
+        except OSError as e:
+            logging.error(f"Error caching response of {url}: {str(e)}")
+
+    async def _convert(self, response: httpx.Response) -> str:
+        """Convert a response body to text, parsing HTML in the process pool
+
+        Args:
+            response (httpx.Response): The response
+
+        Returns:
+            str: the text of the response
+        """
+        if "html" not in response.headers.get("content-type", "text/html"):
+            return response.text
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(get_process_pool(), html_to_text, response.text)
+        except BrokenProcessPool:
+            logging.error("process pool broke, converting html in the event loop thread")
+            reset_process_pool()
+            return html_to_text(response.text)
+
+    def client(self) -> httpx.AsyncClient:
+        """Create a pooled HTTP client, to be used as an async context manager
+
+        Returns:
+            httpx.AsyncClient: the client
+        """
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        headers = {"User-Agent": os.getenv("USER_AGENT", "quiz-maker/1.0")}
+        return httpx.AsyncClient(limits=limits, timeout=self.timeout, headers=headers, follow_redirects=True)
+
+    async def fetch_text(self, client: httpx.AsyncClient, url: str) -> str:
+        """Fetch a URL and extract its text, revalidating cached responses
+
+        Args:
+            client (httpx.AsyncClient): The pooled HTTP client
+            url (str): The URL to fetch
+
+        Returns:
+            str: The text extracted from the URL, empty on errors
+        """
+        try:
+            cached = self._load_cached(url)
+            headers = {}
+            if cached:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+            response = await client.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                return cached["text"]
+            response.raise_for_status()
+
+            text = await self._convert(response)
+            self._store_cached(url, response, text)
+            return text
+        except Exception as e:
+            logging.error(f"Error extracting text from URL {url}: {str(e)}")
+            logging.error(traceback.format_exc())
+            return ""
+
+    async def fetch_texts(self, urls: List[str], on_complete: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Fetch many URLs concurrently over pooled connections
+
+        Args:
+            urls (List[str]): The URLs to fetch
+            on_complete (Callable, optional): called with (index, text) each time a URL finishes
+
+        Returns:
+            List[str]: the text of each URL in input order, empty for URLs that failed
+        """
+        # requests wait on the semaphore rather than on the pool, so queued URLs never hit pool timeouts
+        semaphore = asyncio.Semaphore(self.max_connections)
+        async with self.client() as client:
+
+            async def fetch(index: int, url: str) -> str:
+                async with semaphore:
+                    text = await self.fetch_text(client, url)
+                if on_complete:
+                    on_complete(index, text)
+                return text
+
+            return await asyncio.gather(*(fetch(index, url) for index, url in enumerate(urls)))
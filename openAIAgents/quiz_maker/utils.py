@@ -1,9 +1,33 @@
 import os
+import io
+import json
 import logging
 import datetime
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
 from urllib.parse import urlparse
-from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
-from langchain_community.document_transformers import Html2TextTransformer
+
+# pypdf, html2text and langchain are imported by the functions using them: the app and the
+# process pool workers start without loading parsers a given run may never need
+
+# rough number of characters per token, used to size chunks without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# boundaries used to split long texts, from the coarsest to the finest
+CHUNK_SEPARATORS = ["\f", "\n\n", "\n", ". ", " "]
+
+# PDFs with at least this many pages are parsed in a process pool
+PARALLEL_PDF_MIN_PAGES = int(os.getenv("QUIZ_PARALLEL_PDF_MIN_PAGES", "32"))
+
+# number of pages parsed by each process pool task
+PDF_PAGES_PER_TASK = 8
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
 
 def setup_logging():
     """Set up logging configuration
@@ -39,22 +63,209 @@ def setup_directories(base_dir):
         
     return RAW_TEXT_DIR, SUMMARY_TEXT_DIR, JSON_OUTPUT_DIR
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+def _extract_pdf_page_range(shm_name: str, size: int, start: int, end: int) -> List[str]:
+    """Extract the text of a range of pages from a PDF held in shared memory (process pool worker)
+    
+    Args:
+        shm_name (str): The name of the shared memory block containing the PDF
+        size (int): The size of the PDF in bytes
+        start (int): The index of the first page to extract
+        end (int): The index after the last page to extract
+
+    Returns:
+        List[str]: the text of each page in the range
+    """
+    from pypdf import PdfReader
+    
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        reader = PdfReader(io.BytesIO(bytes(shm.buf[:size])))
+        return [reader.pages[index].extract_text() for index in range(start, end)]
+    finally:
+        shm.close()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the process pool shared by CPU-bound extraction work, creating it on first use
+    
+    Returns:
+        ProcessPoolExecutor: the process pool
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn instead of fork, the app process runs several threads
+            _process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+def reset_process_pool() -> None:
+    """Discard the shared process pool so that the next extraction creates a new one"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+def iter_pdf_pages(pdf_bytes: bytes) -> Iterator[str]:
+    """Extract the text of a PDF page by page, in page order
+    
+    PDFs with at least PARALLEL_PDF_MIN_PAGES pages are parsed across a process pool,
+    smaller ones in the calling thread.
+    
+    Args:
+        pdf_bytes (bytes): The content of the PDF file
+
+    Yields:
+        str: the text of each page
+    """
+    from pypdf import PdfReader
+    
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+    
+    if page_count < PARALLEL_PDF_MIN_PAGES:
+        for page in reader.pages:
+            yield page.extract_text()
+        return
+    
+    # workers read the PDF from shared memory instead of receiving a copy per task
+    shm = shared_memory.SharedMemory(create=True, size=len(pdf_bytes))
+    try:
+        shm.buf[:len(pdf_bytes)] = pdf_bytes
+        pool = get_process_pool()
+        futures = [
+            pool.submit(_extract_pdf_page_range, shm.name, len(pdf_bytes), start, min(start + PDF_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_TASK)
+        ]
+        extracted = 0
+        try:
+            for future in futures:
+                for page_text in future.result():
+                    extracted += 1
+                    yield page_text
+        except BrokenProcessPool:
+            logging.error("process pool broke, extracting the remaining pages in the calling thread")
+            reset_process_pool()
+            for index in range(extracted, page_count):
+                yield reader.pages[index].extract_text()
+        finally:
+            for future in futures:
+                future.cancel()
+            wait(futures)
+    finally:
+        shm.close()
+        shm.unlink()
+
+def extract_text_from_pdf_bytes(pdf_bytes: bytes, raw_text_path: Optional[str] = None) -> str:
+    """Extract text from the content of a PDF file
+    
+    Args:
+        pdf_bytes (bytes): The content of the PDF file
+        raw_text_path (str, optional): if set, the text is written to this file page by page while it is extracted
+
+    Returns:
+        str: The text extracted from the PDF, with pages separated by form feeds
+    """
+    try:
+        pages = []
+        raw_text_file = open(raw_text_path, "w", encoding="utf-8") if raw_text_path else None
+        try:
+            for page_text in iter_pdf_pages(pdf_bytes):
+                if raw_text_file:
+                    if pages:
+                        raw_text_file.write("\f")
+                    raw_text_file.write(page_text)
+                pages.append(page_text)
+        finally:
+            if raw_text_file:
+                raw_text_file.close()
+        # pages are separated by form feeds so they can be used as chunk boundaries
+        return "\f".join(pages)
+    except Exception as e:
+        logging.error(f"Error extracting text from PDF: {str(e)}")
+        return ""
+
+def extract_text_from_pdf(pdf_path: str, raw_text_path: Optional[str] = None) -> str:
     """Extract text from PDF
     
     Args:
         pdf_path (str): The path of the PDF file to extract text from
+        raw_text_path (str, optional): if set, the text is written to this file page by page while it is extracted
 
     Returns:
         str: The text extracted from the PDF
     """
     try:
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load()
-        return "\n".join([page.page_content for page in pages])
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
     except Exception as e:
         logging.error(f"Error extracting text from PDF: {str(e)}")
         return ""
+    return extract_text_from_pdf_bytes(pdf_bytes, raw_text_path)
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text
+    
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: the approximate number of tokens (about 4 characters per token)
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_text_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split a text into chunks of at most max_tokens tokens
+    
+    The text is split at page breaks first, then at paragraphs, lines, sentences
+    and words, and consecutive pieces are merged back while they fit in a chunk.
+    
+    Args:
+        text (str): The text to split
+        max_tokens (int): The maximum number of tokens of each chunk
+
+    Returns:
+        List[str]: the chunks, in document order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    
+    def split(piece: str, separators: List[str]) -> List[str]:
+        if len(piece) <= max_chars:
+            return [piece]
+        if not separators:
+            # no boundary left, hard split
+            return [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+        
+        separator, remaining = separators[0], separators[1:]
+        chunks = []
+        current = ""
+        for part in piece.split(separator):
+            for sub_part in split(part, remaining):
+                if current and len(current) + len(separator) + len(sub_part) > max_chars:
+                    chunks.append(current)
+                    current = sub_part
+                else:
+                    current = f"{current}{separator}{sub_part}" if current else sub_part
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    return [chunk for chunk in split(text, CHUNK_SEPARATORS) if chunk.strip()]
+
+def html_to_text(html: str) -> str:
+    """Convert an HTML page to plain text (runs in the process pool for batch URL ingestion)
+    
+    Args:
+        html (str): The HTML content
+
+    Returns:
+        str: the text of the page, without links and images
+    """
+    import html2text
+    
+    converter = html2text.HTML2Text()
+    converter.ignore_links = True
+    converter.ignore_images = True
+    return converter.handle(html)
 
 def save_text_to_file(text: str, file_path: str) -> None:
     """Save text to file
@@ -69,6 +280,16 @@ def save_text_to_file(text: str, file_path: str) -> None:
     except Exception as e:
         logging.error(f"Error saving text to file: {str(e)}")
 
+def save_quiz_to_json(quiz, file_path: str) -> None:
+    """Save a quiz to a JSON file
+    
+    Args:
+        quiz (Quiz): The quiz to save
+        file_path (str): The path of the JSON file
+    """
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(quiz.model_dump(), f, indent=2, ensure_ascii=False)
+
 def extract_text_from_url(url: str) -> str:
     """Extract text from URL
     
@@ -79,6 +300,9 @@ def extract_text_from_url(url: str) -> str:
         str: The text extracted from the URL
     """
     try:
+        from langchain_community.document_loaders import WebBaseLoader
+        from langchain_community.document_transformers import Html2TextTransformer
+        
         loader = WebBaseLoader(url)
         docs = loader.load()
         